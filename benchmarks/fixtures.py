@@ -0,0 +1,200 @@
+import json
+import os
+import random
+
+# Market counts of the fixture corpus, from a quiet pre-match page to a very
+# large live /all page
+FIXTURE_SIZES = {
+    "small": 10,
+    "medium": 60,
+    "large": 250,
+    "huge": 800,
+}
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+LEGENDS = [
+    "Match Winner", "Map {part} Winner", "Total Rounds Map {part}", "Handicap Map {part}",
+    "First Blood Map {part}", "Correct Score", "Total Maps", "Round {part} Winner",
+]
+
+
+def _market_layout(num_markets, seed):
+    """Deterministic market ids, legends and outcome names"""
+    rng = random.Random(seed)
+    markets = []
+    for i in range(num_markets):
+        part = rng.randint(1, 3)
+        legend = rng.choice(LEGENDS).format(part=part)
+        outcome_count = rng.choice((2, 2, 3, 4, 6))
+        outcomes = [f"Outcome {chr(65 + j)} {rng.randint(10, 99)}.5" if outcome_count > 3
+                    else ("Team A", "Team B", "Draw")[j] for j in range(outcome_count)]
+        markets.append((str(100000 + i), str(part), legend, outcomes))
+    return markets
+
+
+def _initial_odds(layout, seed):
+    """Deterministic starting odds of every outcome"""
+    return [[random.Random(f"{seed}:{m}:{o}").uniform(1.05, 9.0) for o in range(len(outcomes))]
+            for m, (_, _, _, outcomes) in enumerate(layout)]
+
+
+class OddsState:
+    """
+    Current odds of one fixture page, moved by one round of changes at a time
+
+    Keeping the odds makes every round cost the same, however many rounds
+    came before.
+    """
+
+    def __init__(self, num_markets, seed=1, mutation_rate=0.05):
+        """
+        Initialize the page state
+
+        Args:
+            num_markets (int): Number of market articles
+            seed (int): Layout seed
+            mutation_rate (float): Share of outcomes changed per round
+        """
+        self.num_markets = num_markets
+        self.seed = seed
+        self.mutation_rate = mutation_rate
+        self.rounds = 0
+        self.layout = _market_layout(num_markets, seed)
+        self.odds = _initial_odds(self.layout, seed)
+        self.last_changes = []
+        self._rng = random.Random(f"{seed}:mutations")
+
+    def mutate(self):
+        """Apply the next round of odds changes"""
+        rng = self._rng
+        changes = []
+        for m, outcomes in enumerate(self.odds):
+            for i, value in enumerate(outcomes):
+                if rng.random() < self.mutation_rate:
+                    outcomes[i] = max(1.01, value * rng.uniform(0.9, 1.1))
+                    changes.append((m, i))
+        self.last_changes = changes
+        self.rounds += 1
+
+    def markets_frame(self):
+        """
+        Every market with its current odds as a feed frame, in the format of
+        scraper_feed.SelectionFeedDecoder
+
+        Returns:
+            str: Frame JSON
+        """
+        markets = [
+            {"id": int(market_id), "part": int(part), "name": legend,
+             "selections": [{"id": _selection_id(market_id, o), "name": text,
+                             "odds": float(f"{self.odds[m][o]:.2f}"), "status": "open"}
+                            for o, text in enumerate(outcomes)]}
+            for m, (market_id, part, legend, outcomes) in enumerate(self.layout)
+        ]
+        return json.dumps({"type": "markets", "markets": markets})
+
+    def odds_frame(self):
+        """
+        The odds changed by the last mutate() as a feed frame
+
+        Returns:
+            str: Frame JSON
+        """
+        changes = [{"selectionId": _selection_id(self.layout[m][0], o), "odds": float(f"{self.odds[m][o]:.2f}"),
+                    "status": "open"} for m, o in self.last_changes]
+        return json.dumps({"type": "odds", "changes": changes})
+
+    def render(self):
+        """Page HTML with the current odds"""
+        return render_page(self.num_markets, self.seed, self.odds)
+
+
+def _selection_id(market_id, outcome_index):
+    return int(market_id) * 10 + outcome_index
+
+
+def mutated_pages(num_markets, rounds, seed=1, mutation_rate=0.05):
+    """
+    Successive versions of a page, starting with the unchanged one
+
+    Returns:
+        list: rounds page HTMLs
+    """
+    state = OddsState(num_markets, seed, mutation_rate)
+    pages = []
+    for _ in range(rounds):
+        pages.append(state.render())
+        state.mutate()
+    return pages
+
+
+def render_page(num_markets, seed=1, odds=None):
+    """
+    Render a TippmixPro-like /all page
+
+    Args:
+        num_markets (int): Number of market articles
+        seed (int): Layout seed
+        odds (list): Odds per market and outcome, e.g. OddsState.odds; None for the
+            starting odds
+
+    Returns:
+        str: Page HTML
+    """
+    layout = _market_layout(num_markets, seed)
+    if odds is None:
+        odds = _initial_odds(layout, seed)
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>TippmixPro</title>",
+        "<link rel='stylesheet' href='/static/app.css'></head><body>",
+        "<header class='Header'><nav class='Header__Nav'>",
+        "".join(f"<a class='Header__Link' href='/sport/{i}'><img src='/static/icon{i}.png'>Sport {i}</a>"
+                for i in range(20)),
+        "</nav></header><main class='EventView'><div class='EventView__Scoreboard'>",
+        "<span class='Team'>Team A</span><span class='Score'>1 : 0</span><span class='Team'>Team B</span>",
+        "</div><div class='MarketGroups'>",
+    ]
+    for m, (market_id, part, legend, outcomes) in enumerate(layout):
+        parts.append(
+            f"<div class='MarketGroupsItem'><article class='Market Market--Id-{market_id} "
+            f"Market--Part-{part} Market--Expanded' data-market='{market_id}'>"
+            f"<header class='Market__Header'><div class='Market__Legend'><span>{legend}</span>"
+            f"</div><svg class='Market__Toggle' viewBox='0 0 10 10'><path d='M0 0L5 5L10 0'/></svg>"
+            f"</header><div class='Market__OddsGroups'><div class='Market__OddsGroup'>"
+        )
+        for o, text in enumerate(outcomes):
+            parts.append(
+                f"<div class='Market__OddsGroupItem'><button class='OddsButton' type='button'>"
+                f"<span class='OddsButton__Text'>{text}</span>"
+                f"<span class='OddsButton__Odds'> {odds[m][o]:.2f} </span></button></div>"
+            )
+        parts.append("</div></div></article></div>")
+    parts.append("</div></main><footer class='Footer'>")
+    parts.append("".join(f"<p class='Footer__Text'>Responsible gaming notice {i}</p>" for i in range(10)))
+    parts.append("</footer><script src='/static/app.js'></script></body></html>")
+    return "".join(parts)
+
+
+def body_inner_html(page):
+    """The part of a page scrape_market_titles transfers: the body's innerHTML"""
+    start = page.index("<body>") + len("<body>")
+    return page[start:page.rindex("</body>")]
+
+
+def ensure_fixtures():
+    """
+    Write the fixture corpus to benchmarks/fixtures if it is missing
+
+    Returns:
+        dict: Fixture name -> file path
+    """
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    paths = {}
+    for name, size in FIXTURE_SIZES.items():
+        path = os.path.join(FIXTURE_DIR, f"{name}.html")
+        if not os.path.exists(path):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(render_page(size))
+        paths[name] = path
+    return paths
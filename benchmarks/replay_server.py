@@ -0,0 +1,133 @@
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.fixtures import FIXTURE_SIZES, OddsState
+
+
+class ReplayRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves /<fixture>/<event id>/all pages; every request to the same page
+    gets the next round of synthetic odds changes. /<fixture>/<event id>/feed
+    serves the same page's odds as feed frames (a JSON list): all markets on
+    the first request, then the changes of one more round per request.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = [p for p in self.path.split("?", 1)[0].split("/") if p]
+        if len(parts) != 3 or parts[2] not in ("all", "feed") or parts[0] not in FIXTURE_SIZES:
+            # Assets and anything else: cheap 404 so pages load fast
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if parts[2] == "feed":
+            body = self.server.next_frames(parts[0], parts[1]).encode("utf-8")
+            content_type = "application/json"
+        else:
+            body = self.server.next_page(parts[0], parts[1]).encode("utf-8")
+            content_type = "text/html; charset=utf-8"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ReplayServer:
+    """
+    Local stand-in for the TippmixPro site serving the benchmark fixtures
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, mutation_rate=0.05):
+        """
+        Initialize the replay server
+
+        Args:
+            host (str): Interface to listen on
+            port (int): TCP port, 0 picks a free one
+            mutation_rate (float): Share of outcomes whose odds change per request
+        """
+        self.host = host
+        self.port = port
+        self.mutation_rate = mutation_rate
+        self.httpd = None
+        self._pages = {}
+        self._feeds = set()
+        self._lock = threading.Lock()
+
+    def next_page(self, fixture, event_id):
+        """The page's HTML with one more round of odds changes than the last request got"""
+        with self._lock:
+            state = self._state(fixture, event_id, advance=True)
+            return state.render()
+
+    def current_page(self, fixture, event_id):
+        """The page's HTML as the last request got it, without a new round of changes"""
+        with self._lock:
+            return self._state(fixture, event_id).render()
+
+    def next_frames(self, fixture, event_id):
+        """The page's feed frames: all markets the first time, then one more round of changes"""
+        with self._lock:
+            key = (fixture, event_id)
+            if key not in self._feeds:
+                self._feeds.add(key)
+                return "[" + self._state(fixture, event_id).markets_frame() + "]"
+            return "[" + self._state(fixture, event_id, advance=True).odds_frame() + "]"
+
+    def _state(self, fixture, event_id, advance=False):
+        """OddsState of a page, created on first use and otherwise mutated if advance (lock held)"""
+        key = (fixture, event_id)
+        state = self._pages.get(key)
+        if state is None:
+            seed = int(event_id) if event_id.isdigit() else 1
+            state = self._pages[key] = OddsState(FIXTURE_SIZES[fixture], seed, self.mutation_rate)
+        elif advance:
+            state.mutate()
+        return state
+
+    def url_for(self, fixture, event_id="279204529400057856"):
+        """URL of a fixture page on this server"""
+        return f"http://{self.host}:{self.port}/{fixture}/{event_id}/all"
+
+    def feed_url_for(self, fixture, event_id="279204529400057856"):
+        """URL of a fixture page's feed frames on this server"""
+        return f"http://{self.host}:{self.port}/{fixture}/{event_id}/feed"
+
+    def start(self):
+        """Start serving on a background thread"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port), ReplayRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.next_page = self.next_page
+        self.httpd.next_frames = self.next_frames
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        """Stop serving"""
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the benchmark fixtures as a local stand-in site")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--mutation-rate", type=float, default=0.05)
+    args = parser.parse_args()
+    server = ReplayServer(port=args.port, mutation_rate=args.mutation_rate)
+    server.start()
+    for fixture in FIXTURE_SIZES:
+        print(server.url_for(fixture))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from benchmarks.fixtures import FIXTURE_SIZES, body_inner_html, ensure_fixtures
+from benchmarks.replay_server import ReplayServer
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def measure(func, repeat):
+    """
+    Run func repeatedly
+
+    Returns:
+        dict: median and min in milliseconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": round(statistics.median(timings), 3), "min_ms": round(min(timings), 3)}
+
+
+def peak_memory_kb(func):
+    """Peak Python heap allocation of one call, in KB"""
+    tracemalloc.start()
+    try:
+        func()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def bench_parse(fixtures, repeat):
+    """Parse-only time of every parser engine on every fixture"""
+    from scraper_parsers import PARSER_ENGINES
+
+    results = {}
+    for name, path in fixtures.items():
+        with open(path, encoding="utf-8") as f:
+            html = body_inner_html(f.read())
+        for engine_name, engine_cls in PARSER_ENGINES.items():
+            engine = engine_cls()
+            result = measure(lambda: engine.parse(html), repeat)
+            result["peak_kb"] = peak_memory_kb(lambda: engine.parse(html))
+            result["markets"] = len(engine.parse(html))
+            results[f"parse/{engine_name}/{name}"] = result
+    return results
+
+
+def bench_serialize(fixtures, repeat):
+    """Cost of turning a parsed page into the output file, as save_data does, and of loading it back"""
+    from scraper_model import ColumnarSnapshot, serialize_binary_snapshot
+    from scraper_parsers import get_market_parser
+    from scraper_output import serialize_snapshot, write_snapshot
+
+    parser = get_market_parser("lxml")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        target = os.path.join(tmp, "out.json")
+        for name, path in fixtures.items():
+            with open(path, encoding="utf-8") as f:
+                data = parser.parse(body_inner_html(f.read()))
+            results[f"serialize/indent/{name}"] = measure(lambda: serialize_snapshot(data), repeat)
+            results[f"serialize/compact/{name}"] = measure(lambda: serialize_snapshot(data, compact=True), repeat)
+            results[f"write/atomic/{name}"] = measure(lambda: write_snapshot(data, target), repeat)
+            results[f"serialize/binary/{name}"] = measure(lambda: serialize_binary_snapshot(data), repeat)
+            json_payload = serialize_snapshot(data, compact=True)
+            binary_payload = serialize_binary_snapshot(data)
+            results[f"load/json/{name}"] = measure(lambda: json.loads(json_payload), repeat)
+            results[f"load/binary/{name}"] = measure(lambda: ColumnarSnapshot.decode(binary_payload), repeat)
+    return results
+
+
+def bench_parse_pipeline(fixtures, repeat, events=8, snapshots_per_event=5):
+    """
+    Parse throughput of a burst of snapshots from many events: on one thread
+    versus a ParsePipeline with an increasing number of worker processes
+    """
+    from scraper_parsers import get_market_parser
+    from scraper_pipeline import ParsePipeline
+
+    with open(fixtures["large"], encoding="utf-8") as f:
+        html = body_inner_html(f.read())
+    total = events * snapshots_per_event
+    repeat = max(1, min(repeat, 5))
+    results = {}
+
+    parser = get_market_parser("lxml")
+
+    def inline():
+        for _ in range(total):
+            parser.parse(html)
+
+    results["pipeline/inline/large"] = measure(inline, repeat)
+
+    worker_counts = sorted({1, 2, 4, os.cpu_count() or 1})
+    for workers in worker_counts:
+        pipeline = ParsePipeline(max_workers=workers, parser_engine="lxml")
+        try:
+            def burst():
+                for n in range(total):
+                    pipeline.submit(f"event{n % events}", html, lambda markets: None)
+                pipeline.drain()
+
+            burst()  # warm up the worker processes
+            results[f"pipeline/workers-{workers}/large"] = measure(burst, repeat)
+        finally:
+            pipeline.close()
+
+    for result in results.values():
+        result["snapshots_per_s"] = round(total / (result["median_ms"] / 1000), 1)
+    return results
+
+
+def bench_replay(repeat, rounds=40, fixture="large"):
+    """
+    Recording cost, compression and offline replay throughput of a recorded
+    session (rounds snapshots of one event with moving odds)
+    """
+    from benchmarks.fixtures import mutated_pages
+    from scraper_recording import SnapshotRecorder, SnapshotReplayer
+
+    snapshots = [body_inner_html(page) for page in mutated_pages(FIXTURE_SIZES[fixture], rounds)]
+    url = "https://sports2.tippmixpro.hu/hu/elo-esemenyek/bench/279204529400057856/all"
+    repeat = max(1, min(repeat, 5))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = os.path.join(tmp, "session.tmpr")
+
+        def record():
+            if os.path.exists(archive):
+                os.remove(archive)
+            recorder = SnapshotRecorder(archive)
+            for n, html in enumerate(snapshots):
+                recorder.record(url, html, timestamp=float(n))
+            recorder.close()
+            return recorder
+
+        results[f"replay/record/{fixture}"] = measure(record, repeat)
+        stats = record().stats()
+        results[f"replay/record/{fixture}"]["ratio"] = round(stats["ratio"], 1)
+
+        replayer = SnapshotReplayer(archive, speed=0)
+        result = measure(lambda: replayer.run(lambda event_id, markets: None), repeat)
+        result["snapshots_per_s"] = round(rounds / (result["median_ms"] / 1000), 1)
+        results[f"replay/full-speed/{fixture}"] = result
+    return results
+
+
+def bench_analytics(fixtures, repeat, events=40):
+    """
+    Vectorized analytics tick over the outcomes of many events (skipped without NumPy)
+    """
+    from scraper_analytics import OddsAnalytics, np
+
+    if np is None:
+        return {}
+    from scraper_parsers import get_market_parser
+    from benchmarks.fixtures import mutated_pages
+
+    parser = get_market_parser("lxml")
+    rounds = [parser.parse(body_inner_html(page)) for page in mutated_pages(FIXTURE_SIZES["large"], 2)]
+    analytics = OddsAnalytics()
+    for event in range(events):
+        analytics.update(f"event{event}", rounds[0])
+    analytics.tick()
+    outcomes = analytics.stats()["rows"]
+
+    state = {"round": 0}
+
+    def update_all():
+        state["round"] ^= 1
+        for event in range(events):
+            analytics.update(f"event{event}", rounds[state["round"]])
+
+    results = {"analytics/update/large": measure(update_all, repeat)}
+    # Every tick sees a fresh round of moves, but only the tick itself is timed
+    timings = []
+    for _ in range(repeat):
+        update_all()
+        start = time.perf_counter()
+        analytics.tick()
+        timings.append((time.perf_counter() - start) * 1000)
+    results["analytics/tick/large"] = {"median_ms": round(statistics.median(timings), 3),
+                                       "min_ms": round(min(timings), 3)}
+    for result in results.values():
+        result["outcomes"] = outcomes
+    return results
+
+
+def bench_http_cycle(server, repeat):
+    """End-to-end cycle over plain HTTP against the replay server (no browser)"""
+    from scraper_core import TippmixProScraper
+
+    results = {}
+    for name in FIXTURE_SIZES:
+        scraper = TippmixProScraper(use_selenium=False)
+        scraper.open_page(server.url_for(name))
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[f"cycle/http/{name}"] = measure(scraper.scrape_market_titles, repeat)
+        scraper.close()
+    return results
+
+
+def bench_chrome_cycle(server, repeat):
+    """
+    End-to-end cycle through headless Chrome for each extraction mode
+
+    The replay pages are static, so after the first cycle the incremental html
+    mode serves every market from its parse cache.
+    """
+    from scraper_core import TippmixProScraper
+
+    results = {}
+    variants = {
+        "html": {"extraction_mode": "html"},
+        "html-full": {"extraction_mode": "html", "incremental": False},
+        "script": {"extraction_mode": "script"},
+    }
+    for label, options in variants.items():
+        scraper = TippmixProScraper(use_selenium=True, **options)
+        try:
+            for name in FIXTURE_SIZES:
+                scraper.open_page(server.url_for(name))
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results[f"cycle/chrome-{label}/{name}"] = measure(scraper.scrape_market_titles, repeat)
+        finally:
+            scraper.close()
+    return results
+
+
+def bench_cluster(server, workers=2, events=8, interval=0.5, duration=5):
+    """
+    Sharded scraping with local HTTP worker processes against the replay
+    server: result throughput at the coordinator, and how long the events of
+    a killed worker go without a worker
+    """
+    import subprocess
+    from scraper_cluster import ClusterCoordinator
+
+    received = []
+    coordinator = ClusterCoordinator(port=0, interval=interval, heartbeat_timeout=3,
+                                     callback=lambda event_id, markets: received.append(event_id),
+                                     log=lambda message: None)
+    coordinator.start([server.url_for("medium", str(100 + n)) for n in range(events)])
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    processes = [
+        subprocess.Popen([sys.executable, "scraper_cli.py", "--join", f"127.0.0.1:{coordinator.port}", "--http",
+                          "-i", str(interval), "--worker-id", f"bench{n}"],
+                         cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for n in range(workers)
+    ]
+    try:
+        deadline = time.monotonic() + 30
+        while len(coordinator.status()["workers"]) < workers and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(1)
+        start, count = time.perf_counter(), len(received)
+        time.sleep(duration)
+        results = {"cluster/throughput/medium": {
+            "results_per_s": round((len(received) - count) / (time.perf_counter() - start), 1),
+            "workers": workers, "events": events,
+        }}
+
+        processes[0].kill()
+        killed = time.perf_counter()
+        while time.perf_counter() - killed < 15:
+            status = coordinator.status()
+            if len(status["workers"]) == workers - 1 and not status["unassigned"] and all(
+                    w["worker_id"] != "bench0" for w in status["workers"]):
+                break
+            time.sleep(0.005)
+        results["cluster/failover/medium"] = {"median_ms": round((time.perf_counter() - killed) * 1000, 3)}
+        return results
+    finally:
+        coordinator.stop()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns:
+        list: Human-readable regressions of median_ms beyond the tolerance; results
+            without a median_ms (e.g. throughput figures) are not compared
+    """
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if not reference or "median_ms" not in result or "median_ms" not in reference:
+            continue
+        if result["median_ms"] > reference["median_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: {result['median_ms']:.3f} ms vs baseline {reference['median_ms']:.3f} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scraping hot path")
+    parser.add_argument("--repeat", type=int, default=20, help="Repetitions per measurement")
+    parser.add_argument("--chrome", action="store_true", help="Also run the end-to-end headless Chrome cycles")
+    parser.add_argument("--cluster", action="store_true",
+                        help="Also run the sharded scraping benchmark with local worker processes")
+    parser.add_argument("--output", help="Write the results JSON to this file")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline results to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before failing (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    fixtures = ensure_fixtures()
+    results = {}
+    results.update(bench_parse(fixtures, args.repeat))
+    results.update(bench_serialize(fixtures, args.repeat))
+    results.update(bench_parse_pipeline(fixtures, args.repeat))
+    results.update(bench_replay(args.repeat))
+    results.update(bench_analytics(fixtures, args.repeat))
+
+    server = ReplayServer()
+    server.start()
+    try:
+        results.update(bench_http_cycle(server, args.repeat))
+        if args.chrome:
+            results.update(bench_chrome_cycle(server, args.repeat))
+        if args.cluster:
+            results.update(bench_cluster(server))
+    finally:
+        server.stop()
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            f.write(text)
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions against baseline:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+# Lets the tests import the scraper modules and the benchmarks package from the repository root
@@ -0,0 +1,315 @@
+import json
+import threading
+from scraper_model import market_columns
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class OddsAnalytics:
+    """
+    Vectorized odds analytics across every outcome of every tracked event
+
+    Each outcome (event, market, part, text) gets a row in contiguous NumPy
+    arrays holding its current and previous odds and its market. update()
+    only copies a snapshot's odds into the rows of its event; tick() then
+    computes, for all rows at once, the implied probabilities, the overround
+    (bookmaker margin) of every market and the percentage move since the
+    previous tick, and calls the alert callbacks with just the rows that
+    moved by at least move_threshold percent.
+
+    Rows stay put while their outcome is on the page: an event whose market
+    layout is unchanged since its last snapshot is mapped onto its rows
+    without any lookups. Rows of outcomes that left the page or of removed
+    events, and market slots without rows, go on free lists and are reused,
+    so a long session does not keep growing the arrays. Requires NumPy.
+    """
+
+    def __init__(self, move_threshold=5.0, capacity=4096):
+        """
+        Initialize the analytics engine
+
+        Args:
+            move_threshold (float): Smallest odds move, in percent, that raises an alert
+            capacity (int): Initial number of outcome rows, grown as needed
+        """
+        if np is None:
+            raise ImportError("Odds analytics require NumPy (pip install numpy)")
+        self.move_threshold = move_threshold
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._rows = {}
+        self._row_keys = []
+        self._markets = {}
+        self._market_keys = []
+        self._market_rows = []
+        self._free_rows = []
+        self._free_markets = []
+        self._layouts = {}
+        self._size = 0
+        self.current = np.full(capacity, np.nan)
+        self.previous = np.full(capacity, np.nan)
+        self.market_of = np.zeros(capacity, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.implied = np.full(capacity, np.nan)
+        self.move_pct = np.full(capacity, np.nan)
+        self.overround = np.full(0, np.nan)
+        self.ticks = 0
+        self.alerts = 0
+
+    def add_alert_callback(self, callback):
+        """
+        Register a callback for odds moves over the threshold
+
+        Args:
+            callback (callable): Called after a tick with a list of alert dicts (event_id,
+                market_id, market_part, text, previous, odds, move_pct, implied, overround)
+        """
+        self._callbacks.append(callback)
+
+    def _grow(self, needed):
+        capacity = len(self.current)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        extra = capacity - len(self.current)
+        self.current = np.concatenate([self.current, np.full(extra, np.nan)])
+        self.previous = np.concatenate([self.previous, np.full(extra, np.nan)])
+        self.market_of = np.concatenate([self.market_of, np.zeros(extra, dtype=np.int64)])
+        self.active = np.concatenate([self.active, np.zeros(extra, dtype=bool)])
+        self.implied = np.concatenate([self.implied, np.full(extra, np.nan)])
+        self.move_pct = np.concatenate([self.move_pct, np.full(extra, np.nan)])
+
+    def _row_indices(self, event_id, layout):
+        """Rows of an event's outcomes in snapshot order, assigning rows to new outcomes"""
+        rows = []
+        for market_id, market_part, text in layout:
+            key = (event_id, market_id, market_part, text)
+            row = self._rows.get(key)
+            if row is None:
+                market_key = (event_id, market_id, market_part)
+                market = self._markets.get(market_key)
+                if market is None:
+                    if self._free_markets:
+                        market = self._free_markets.pop()
+                        self._market_keys[market] = market_key
+                    else:
+                        market = len(self._market_keys)
+                        self._market_keys.append(market_key)
+                        self._market_rows.append(0)
+                    self._markets[market_key] = market
+                if self._free_rows:
+                    row = self._free_rows.pop()
+                    self._row_keys[row] = key
+                else:
+                    row = self._size
+                    self._row_keys.append(key)
+                    self._size += 1
+                    self._grow(self._size)
+                self._rows[key] = row
+                self.market_of[row] = market
+                self._market_rows[market] += 1
+            rows.append(row)
+        return np.array(rows, dtype=np.int64)
+
+    def _free(self, rows):
+        """Release rows for reuse, and the markets left without rows"""
+        self.active[rows] = False
+        self.current[rows] = np.nan
+        self.previous[rows] = np.nan
+        self.implied[rows] = np.nan
+        self.move_pct[rows] = np.nan
+        for row in rows.tolist():
+            key = self._row_keys[row]
+            del self._rows[key]
+            self._row_keys[row] = None
+            self._free_rows.append(row)
+            market = int(self.market_of[row])
+            self._market_rows[market] -= 1
+            if not self._market_rows[market]:
+                del self._markets[self._market_keys[market]]
+                self._market_keys[market] = None
+                if market < len(self.overround):
+                    self.overround[market] = np.nan
+                self._free_markets.append(market)
+
+    def update(self, event_id, markets):
+        """
+        Take an event's latest odds
+
+        Args:
+            event_id (str): Event the markets belong to
+            markets: Markets as returned by scrape_market_titles, or a ColumnarSnapshot
+        """
+        columns = market_columns(markets)
+        # Compared column by column, so an unchanged layout costs no per-outcome work
+        signature = (columns.market_ids, columns.market_parts, columns.outcome_offsets, columns.outcome_texts)
+        odds = np.frombuffer(columns.odds, dtype=np.float64)
+
+        with self._lock:
+            cached = self._layouts.get(event_id)
+            if cached is not None and cached[0] == signature:
+                rows = cached[1]
+            else:
+                layout = []
+                offsets = columns.outcome_offsets
+                for i in range(len(columns)):
+                    market_id, market_part = columns.market_ids[i], columns.market_parts[i]
+                    for j in range(offsets[i], offsets[i + 1]):
+                        layout.append((market_id, market_part, columns.outcome_texts[j]))
+                rows = self._row_indices(event_id, layout)
+                if cached is not None:
+                    # Outcomes that left the page no longer count towards their market
+                    self._free(np.setdiff1d(cached[1], rows))
+                self._layouts[event_id] = (signature, rows)
+                self.active[rows] = True
+            self.current[rows] = odds
+
+    def remove_event(self, event_id):
+        """Stop tracking an event and release its rows for reuse"""
+        with self._lock:
+            cached = self._layouts.pop(event_id, None)
+            if cached is not None:
+                self._free(cached[1])
+
+    def tick(self):
+        """
+        Compute implied probabilities, overrounds and moves for every row and fire alerts
+
+        Returns:
+            list: The alerts of this tick
+        """
+        with self._lock:
+            n = self._size
+            current = self.current[:n]
+            previous = self.previous[:n]
+            active = self.active[:n]
+            market_of = self.market_of[:n]
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                implied = 1.0 / current
+                move_pct = (current / previous - 1.0) * 100.0
+            implied[~active] = np.nan
+            self.implied[:n] = implied
+
+            # A market's overround only counts when all of its outcomes have odds
+            markets = len(self._market_keys)
+            priced = active & ~np.isnan(current)
+            totals = np.bincount(market_of, weights=np.where(priced, implied, 0.0), minlength=markets)
+            outcomes = np.bincount(market_of, weights=active, minlength=markets)
+            complete = np.bincount(market_of, weights=priced, minlength=markets)
+            self.overround = np.where((outcomes > 0) & (complete == outcomes), totals - 1.0, np.nan)
+
+            self.move_pct[:n] = move_pct
+            hits = np.flatnonzero(active & (np.abs(move_pct) >= self.move_threshold))
+            alerts = [self._alert(int(row)) for row in hits]
+
+            # The odds of this tick are the reference of the next one
+            self.previous[:n] = current
+            self.ticks += 1
+            self.alerts += len(alerts)
+            callbacks = list(self._callbacks)
+
+        if alerts:
+            for callback in callbacks:
+                callback(alerts)
+        return alerts
+
+    def _alert(self, row):
+        event_id, market_id, market_part, text = self._row_keys[row]
+        return {
+            "event_id": event_id,
+            "market_id": market_id,
+            "market_part": market_part,
+            "text": text,
+            "previous": float(self.previous[row]),
+            "odds": float(self.current[row]),
+            "move_pct": float(self.move_pct[row]),
+            "implied": float(self.implied[row]),
+            "overround": _optional(self.overround[self.market_of[row]]),
+        }
+
+    def summary(self, event_id=None):
+        """
+        Results of the last tick per market
+
+        Args:
+            event_id (str): Only this event's markets, None for all
+
+        Returns:
+            list: One dict per market with its overround and each outcome's odds,
+                implied probability and last move in percent
+        """
+        with self._lock:
+            if event_id is None:
+                layouts = self._layouts.values()
+            else:
+                layouts = [self._layouts[event_id]] if event_id in self._layouts else []
+            # Only the rows of tracked events, not every row ever assigned
+            result = {}
+            for _, rows in layouts:
+                for row in rows.tolist():
+                    self._summarize_row(result, row)
+            return list(result.values())
+
+    def _summarize_row(self, result, row):
+        """Add one row to the per-market summary being built"""
+        event_id, market_id, market_part, text = self._row_keys[row]
+        market = self.market_of[row]
+        entry = result.get(market)
+        if entry is None:
+            overround = self.overround[market] if market < len(self.overround) else np.nan
+            entry = result[market] = {
+                "event_id": event_id,
+                "market_id": market_id,
+                "market_part": market_part,
+                "overround": _optional(overround),
+                "outcomes": [],
+            }
+        entry["outcomes"].append({
+            "text": text,
+            "odds": _optional(self.current[row]),
+            "implied": _optional(self.implied[row]),
+            "move_pct": _optional(self.move_pct[row]),
+        })
+
+    def stats(self):
+        """
+        Returns:
+            dict: Tracked outcome rows, markets and events, ticks and alerts so far
+        """
+        with self._lock:
+            return {
+                "rows": self._size,
+                "free_rows": len(self._free_rows),
+                "active_rows": int(self.active[:self._size].sum()),
+                "markets": len(self._markets),
+                "events": len(self._layouts),
+                "ticks": self.ticks,
+                "alerts": self.alerts,
+            }
+
+
+def _optional(value):
+    """NaN as None, for JSON"""
+    value = float(value)
+    return None if value != value else value
+
+
+def analytics_route(analytics):
+    """
+    Route handler serving the latest per-market analytics on a SnapshotServer
+
+    Usage: server.add_route("/analytics", analytics_route(analytics))
+
+    Query parameters: event_id to limit the result to one event.
+    """
+    def handle(request, query):
+        values = query.get("event_id")
+        payload = analytics.summary(values[0] if values else None)
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+        request.send_body(200, body)
+    return handle
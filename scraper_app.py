@@ -6,7 +6,17 @@ import threading
 import time
 import os
 import sys
-from scraper_core import TippmixProScraper
+from scraper_browser import DriverManager, ResourcePolicy
+from scraper_core import TippmixProScraper, validate_event_url
+from scraper_output import SnapshotWriter, DeltaJournal
+from scraper_pool import event_id_from_url
+from scraper_server import SnapshotStore, SnapshotServer
+from scraper_metrics import Metrics, metrics_route
+from scraper_schedule import PollSchedule, valid_interval
+from scraper_history import HistoryStore, history_route
+from scraper_watchdog import Watchdog
+from scraper_memory import TabRecycler
+from scraper_recording import SnapshotRecorder
 
 class ScraperApp:
     def __init__(self, root):
@@ -30,10 +40,43 @@ class ScraperApp:
             pass  # Icon file doesn't exist, use default
         self.root.geometry("800x600")
         
+        # Browsers stay warm across stop/start, only the first start pays the cold-start
+        self.driver_manager = DriverManager(log=self.log_message)
+        
+        # Stage timings and counters of the scraping hot path
+        self.metrics = Metrics()
+        
         # Initialize scraper with Selenium enabled by default and optimized timing
-        self.scraper = TippmixProScraper(use_selenium=True)
+        self.scraper = TippmixProScraper(use_selenium=True, driver_manager=self.driver_manager,
+                                         metrics=self.metrics)
         self.scraping_thread = None
         self.is_scraping = False
+        self.stop_event = threading.Event()
+        self.stopping = False
+        self.delta_journal = None
+        self.checkpoint_interval = 60
+        self.compact_output = False
+        self.binary_output = False
+        
+        # Tabs are recycled once their JS heap outgrows this many MB (0 disables)
+        self.tab_memory_budget = 512
+        self.recycler = None
+        
+        # Optional archive of every raw snapshot, for replaying a session offline
+        self.record_file = None
+        
+        # Optional odds history recording every odds move
+        self.history_dir = None
+        self.history = None
+        self.writer = None
+        self.schedule = None
+        self.watchdog = None
+        
+        # Optional local API serving the latest snapshot from memory
+        self.api_port = None
+        self.api_store = SnapshotStore()
+        self.api_server = None
+        self.event_id = None
         
         # Settings file
         self.settings_file = "scraper_settings.json"
@@ -67,6 +110,9 @@ class ScraperApp:
         # Update theme combo box to reflect loaded theme
         self.theme_var.set(self.current_theme)
         self.apply_theme(self.current_theme)
+        self.open_history()
+        self.start_api_server()
+        self.refresh_latency_panel()
         
         # Bind closing event
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -78,8 +124,29 @@ class ScraperApp:
                 settings = json.load(f)
                 self.url_var.set(settings.get('url', 'Valid TippmixPro url ending with /all'))
                 self.interval_var.set(settings.get('interval', '1'))
+                self.adaptive_var.set(settings.get('adaptive_polling', False))
                 self.output_file_var.set(settings.get('output_file', os.path.join(os.path.dirname(__file__), "TippmixPro_API_output.json")))
                 self.current_theme = settings.get('theme', 'dark')
+                extraction_mode = settings.get('extraction_mode', 'html')
+                if extraction_mode not in TippmixProScraper.EXTRACTION_MODES:
+                    self.log_message(f"Unknown extraction mode '{extraction_mode}' in settings, using html")
+                    extraction_mode = 'html'
+                self.scraper.extraction_mode = extraction_mode
+                # The feed mode reads the browser's network log, which is enabled at launch
+                self.scraper.capture_network = self.scraper.extraction_mode == "feed"
+                self.driver_manager.capture_network = self.scraper.capture_network
+                self.update_mode_var.set(settings.get('update_mode', 'poll'))
+                self.output_mode_var.set(settings.get('output_mode', 'snapshot'))
+                self.checkpoint_interval = settings.get('checkpoint_interval', 60)
+                self.compact_output = settings.get('compact_output', False)
+                self.binary_output = settings.get('binary_output', False)
+                self.history_dir = settings.get('history_dir')
+                self.tab_memory_budget = settings.get('tab_memory_budget', 512)
+                self.record_file = settings.get('record_file')
+                self.api_port = settings.get('api_port')
+                self.driver_manager.keep_spare = settings.get('keep_spare_browser', False)
+                if settings.get('lean_loading', False):
+                    self.driver_manager.resource_policy = ResourcePolicy()
         except FileNotFoundError:
             pass
     
@@ -88,20 +155,62 @@ class ScraperApp:
         settings = {
             'url': self.url_var.get(),
             'interval': self.interval_var.get(),
+            'adaptive_polling': self.adaptive_var.get(),
             'output_file': self.output_file_var.get(),
             'theme': self.current_theme,
+            'extraction_mode': self.scraper.extraction_mode,
+            'update_mode': self.update_mode_var.get(),
+            'output_mode': self.output_mode_var.get(),
+            'checkpoint_interval': self.checkpoint_interval,
+            'compact_output': self.compact_output,
+            'binary_output': self.binary_output,
+            'history_dir': self.history_dir,
+            'tab_memory_budget': self.tab_memory_budget,
+            'record_file': self.record_file,
+            'api_port': self.api_port,
+            'keep_spare_browser': self.driver_manager.keep_spare,
+            'lean_loading': self.driver_manager.resource_policy is not None,
         }
         with open(self.settings_file, 'w') as f:
             json.dump(settings, f, indent=2)
             self.log_message("Settings saved to " + self.settings_file)
     
+    def start_api_server(self):
+        """Start the local snapshot API if a port is configured"""
+        if not self.api_port:
+            return
+        try:
+            self.api_server = SnapshotServer(self.api_store, port=int(self.api_port))
+            self.api_server.add_route("/metrics", metrics_route(self.metrics))
+            if self.history:
+                self.api_server.add_route("/history", history_route(self.history))
+            self.api_server.start()
+            self.log_message(f"API server listening on http://127.0.0.1:{self.api_server.port}/events")
+        except Exception as e:
+            self.api_server = None
+            self.log_message(f"Error starting API server: {e}")
+    
+    def open_history(self):
+        """Open the odds history store if a directory is configured"""
+        if not self.history_dir:
+            return
+        try:
+            self.history = HistoryStore(self.history_dir)
+            self.log_message(f"Recording odds history in {self.history_dir}")
+        except Exception as e:
+            self.history = None
+            self.log_message(f"Error opening odds history: {e}")
+    
     def setup_ui(self):
         """Setup the user interface"""
         # Variables
         self.url_var = tk.StringVar(value="Valid TippmixPro url ending with /all")
         self.interval_var = tk.StringVar(value="1")
+        self.adaptive_var = tk.BooleanVar(value=False)
         self.output_file_var = tk.StringVar(value=os.path.join(os.path.dirname(__file__), "TippmixPro_API_output.json"))
         self.theme_var = tk.StringVar(value="dark")
+        self.update_mode_var = tk.StringVar(value="poll")
+        self.output_mode_var = tk.StringVar(value="snapshot")
         
         # Main frame
         main_frame = ttk.Frame(self.root, padding="10")
@@ -119,8 +228,24 @@ class ScraperApp:
         
         # Polling interval
         ttk.Label(main_frame, text="Polling Interval (seconds):").grid(row=1, column=0, sticky=tk.W, pady=5)
-        self.interval_entry = ttk.Entry(main_frame, textvariable=self.interval_var, width=10)
-        self.interval_entry.grid(row=1, column=1, sticky=tk.W, pady=5, padx=(5, 0))
+        interval_frame = ttk.Frame(main_frame)
+        interval_frame.grid(row=1, column=1, sticky=tk.W, pady=5, padx=(5, 0))
+        self.interval_entry = ttk.Entry(interval_frame, textvariable=self.interval_var, width=10)
+        self.interval_entry.grid(row=0, column=0, sticky=tk.W)
+        ttk.Checkbutton(interval_frame, text="Adaptive (faster while odds move)",
+                        variable=self.adaptive_var).grid(row=0, column=1, sticky=tk.W, padx=(10, 0))
+
+        # Update mode
+        ttk.Label(main_frame, text="Update Mode:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        self.update_mode_combo = ttk.Combobox(main_frame, textvariable=self.update_mode_var,
+                                              values=["poll", "push"], state="readonly", width=10)
+        self.update_mode_combo.grid(row=2, column=1, sticky=tk.W, pady=5, padx=(5, 0))
+
+        # Output mode
+        ttk.Label(main_frame, text="Output Mode:").grid(row=3, column=0, sticky=tk.W, pady=5)
+        self.output_mode_combo = ttk.Combobox(main_frame, textvariable=self.output_mode_var,
+                                              values=["snapshot", "delta"], state="readonly", width=10)
+        self.output_mode_combo.grid(row=3, column=1, sticky=tk.W, pady=5, padx=(5, 0))
 
         # Output file
         ttk.Label(main_frame, text="Output JSON File:").grid(row=4, column=0, sticky=tk.W, pady=5)
@@ -140,6 +265,12 @@ class ScraperApp:
         self.theme_combo.grid(row=5, column=1, sticky=tk.W, pady=5, padx=(5, 0))
         self.theme_combo.bind('<<ComboboxSelected>>', self.on_theme_change)
         
+        # Latency panel
+        ttk.Label(main_frame, text="Latency (ms):").grid(row=8, column=0, sticky=(tk.W, tk.N), pady=5)
+        self.latency_var = tk.StringVar(value="No cycles yet")
+        ttk.Label(main_frame, textvariable=self.latency_var, font="TkFixedFont").grid(
+            row=8, column=1, sticky=tk.W, pady=5, padx=(5, 0))
+        
         # Buttons frame
         buttons_frame = ttk.Frame(main_frame)
         buttons_frame.grid(row=9, column=0, columnspan=2, pady=10)
@@ -171,6 +302,35 @@ class ScraperApp:
         # Configure main frame row weights
         main_frame.rowconfigure(11, weight=1)
     
+    def refresh_latency_panel(self):
+        """Show the p50/p95/p99 of each hot-path stage, refreshed every second"""
+        summary = self.metrics.summary()
+        lines = []
+        for stage, stats in summary["stages"].items():
+            lines.append(f"{stage:<10}p50 {stats['p50']:8.1f}  p95 {stats['p95']:8.1f}  p99 {stats['p99']:8.1f}")
+        counters = summary["counters"]
+        if counters:
+            lines.append(f"cycles {counters.get('cycles', 0)}  markets {counters.get('markets', 0)}  "
+                         f"outcomes {counters.get('outcomes', 0)}  errors {counters.get('errors', 0)}  "
+                         f"timeouts {counters.get('timeouts', 0)}")
+        schedule = self.schedule
+        if schedule and self.is_scraping:
+            lines.append(f"interval {schedule.interval:.2f}s  skipped {schedule.skipped}"
+                         + ("  (suspended)" if schedule.suspended else ""))
+        watchdog = self.watchdog
+        if watchdog and self.is_scraping:
+            status = watchdog.status()
+            lines.append(f"downtime {status['downtime']:.1f}s  outages {status['outages']}  recoveries "
+                         + " ".join(f"{step} {count}" for step, count in status["recoveries"].items()))
+        recycler = self.recycler
+        if recycler and recycler.samples and self.is_scraping:
+            sample = recycler.samples[-1]
+            lines.append(f"tab heap {sample['heap_mb']:.0f} MB ({recycler.trend():+.1f} MB/min)  "
+                         f"nodes {sample['nodes']}  recycled {recycler.recycles}")
+        if lines:
+            self.latency_var.set("\n".join(lines))
+        self.root.after(1000, self.refresh_latency_panel)
+    
     def on_theme_change(self, event=None):
         """Handle theme change"""
         self.current_theme = self.theme_var.get()
@@ -237,7 +397,7 @@ class ScraperApp:
     
     def start_scraping(self):
         """Start the scraping process"""
-        if not self.validate_inputs():
+        if self.stopping or not self.validate_inputs():
             return
         # Open the page first
         try:
@@ -249,7 +409,9 @@ class ScraperApp:
                 if converted_url != original_url:
                     self.log_message(f"URL converted to: {converted_url}")
                     self.scraper.open_page(converted_url)
-                    self.log_message("Page opened successfully!")
+                    report = self.scraper.last_page_load
+                    self.log_message(f"Page opened successfully in {report.ready_s:.2f}s "
+                                     f"({report.transferred_bytes / 1024:.0f} KB transferred)!")
             
         except Exception as e:
             self.log_message(f"Error opening page: {e}")
@@ -257,14 +419,46 @@ class ScraperApp:
         
         # Start scraping thread
         self.is_scraping = True
+        self.stop_event = threading.Event()
         self.start_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.NORMAL)
         
-        interval = int(self.interval_var.get())
+        interval = float(self.interval_var.get())
         output_file = self.output_file_var.get()
+        self.event_id = event_id_from_url(self.url_var.get().strip()) or "default"
+        
+        if self.output_mode_var.get() == "delta":
+            self.delta_journal = DeltaJournal(output_file, checkpoint_interval=self.checkpoint_interval,
+                                              compact=self.compact_output, binary=self.binary_output)
+            self.log_message(f"Writing change journal to {self.delta_journal.journal_file}")
+        else:
+            self.delta_journal = None
+        
+        # Disk writes happen on their own thread so they never delay a scrape
+        self.writer = SnapshotWriter(compact=self.compact_output, refresh_interval=self.checkpoint_interval,
+                                     log=self.log_message, metrics=self.metrics, binary=self.binary_output,
+                                     history=self.history)
+        self.writer.start()
+        
+        if self.record_file:
+            try:
+                self.scraper.recorder = SnapshotRecorder(self.record_file, log=self.log_message)
+                self.log_message(f"Recording raw snapshots to {self.record_file}")
+            except Exception as e:
+                self.log_message(f"Error opening recording {self.record_file}: {e}")
+        
+        # Push mode returns nothing while the page is quiet, so only poll mode is watched
+        self.watchdog = None
+        self.recycler = None
+        if self.tab_memory_budget:
+            self.recycler = TabRecycler(self.scraper, heap_budget_mb=self.tab_memory_budget, log=self.log_message)
+        if self.update_mode_var.get() == "push":
+            worker = self.push_scraping_worker
+        else:
+            worker = self.scraping_worker
         
         self.scraping_thread = threading.Thread(
-            target=self.scraping_worker,
+            target=worker,
             args=(interval, output_file),
             daemon=True
         )
@@ -272,20 +466,54 @@ class ScraperApp:
         
         self.log_message("Scraping started")
     
-    def stop_scraping(self):
-        """Stop the scraping process"""
+    def stop_scraping(self, then=None):
+        """
+        Stop the scraping process
+        
+        The scraping thread finishes its cycle before the page, writer and recorder
+        are closed. Both happen on a background thread so the GUI stays responsive.
+        
+        Args:
+            then (callable): Called on the GUI thread once everything is closed
+        """
         self.is_scraping = False
-        self.start_button.config(state=tk.NORMAL)
+        self.stopping = True
+        self.stop_event.set()
+        self.start_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.DISABLED)
+        threading.Thread(target=self._finish_scraping, args=(self.scraping_thread, then), daemon=True).start()
+    
+    def _finish_scraping(self, scraping_thread, then):
+        """Close the page, writer and recorder once the scraping thread is done"""
+        if scraping_thread:
+            scraping_thread.join()
         
         # Close the page
         self.scraper.close_page()
         
+        # Write whatever is still queued; nothing can submit anymore
+        if self.writer:
+            self.writer.stop()
+        if self.scraper.recorder:
+            self.scraper.recorder.close()
+            self.scraper.recorder = None
+        
         self.log_message("Scraping stopped")
+        self.root.after(0, lambda: self._scraping_stopped(then))
+    
+    def _scraping_stopped(self, then):
+        self.stopping = False
+        self.start_button.config(state=tk.NORMAL)
+        if then:
+            then()
     
     def scraping_worker(self, interval, output_file):
-        """Worker thread for scraping"""
+        """Worker thread for scraping, one cycle per schedule deadline"""
+        self.schedule = PollSchedule(interval, adaptive=self.adaptive_var.get())
+        self.watchdog = Watchdog(self.scraper, log=self.log_message)
         while self.is_scraping:
+            data = None
+            error = None
             try:
                 # Scrape current page (gets fresh content from browser)
                 data = self.scraper.scrape_market_titles()
@@ -296,48 +524,62 @@ class ScraperApp:
                 else:
                     self.log_message("No betting options found yet...")
                 
-                # Wait for next interval
-                time.sleep(interval)
+            except Exception as e:
+                error = e
+                self.log_message(f"Error during scraping: {e}")
+            
+            # Reload, reopen or relaunch a page that stopped updating
+            if self.is_scraping:
+                self.watchdog.observe(data, error)
+            if self.is_scraping and self.recycler:
+                self.recycler.check()
+            
+            # Wait for the next deadline, not a full interval after the work
+            skipped = self.schedule.skipped
+            self.schedule.complete(data)
+            if self.schedule.skipped > skipped:
+                self.log_message(f"Cycle overran the interval, skipped {self.schedule.skipped - skipped} cycle(s)")
+            self.schedule.wait(self.stop_event)
+    
+    def push_scraping_worker(self, interval, output_file):
+        """Worker thread for push mode: save as soon as the page reports changed markets"""
+        while self.is_scraping:
+            try:
+                # Blocks until the MutationObserver sees a change or the interval passes
+                data = self.scraper.wait_for_market_changes(timeout=interval)
+                
+                if data:
+                    self.save_data(data, output_file)
+                    self.log_message(f"Changes saved to {output_file}")
                 
             except Exception as e:
                 self.log_message(f"Error during scraping: {e}")
-                time.sleep(interval)
+                self.stop_event.wait(interval)
+            
+            if self.is_scraping and self.recycler:
+                self.recycler.check()
     
     def save_data(self, data, filename):
-        """Save scraped data to JSON file (overwrites existing content)"""
+        """Hand scraped data to the background writer (overwrites existing content)"""
         try:
-            # Create a single dictionary with timestamp
-            data_with_timestamp = {
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                "data": data
-            }
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data_with_timestamp, f, indent=2, ensure_ascii=False)
+            # Journal only the changes in delta mode, the snapshot is rewritten on change or checkpoint
+            self.writer.submit(data, filename, journal=self.delta_journal, event_id=self.event_id)
+            self.api_store.publish(self.event_id, data)
                 
         except Exception as e:
             self.log_message(f"Error saving data: {e}")
     
     def validate_inputs(self):
         """Validate user inputs"""
-        if not self.url_var.get().strip():
-            messagebox.showerror("Error", "Please enter a website URL")
-            return False
-        
-        # Validate URL ends with /all or /all/
-        url = self.url_var.get().strip()
-        if not (url.endswith('/all') or url.endswith('/all/')):
-            messagebox.showerror("Error", "URL must end with '/all' or '/all/'")
-            return False
-
-        if not (url.startswith('https://tippmixpro') or url.startswith('https://www.tippmixpro')):
-            messagebox.showerror("Error", "URL must be a valid TippmixPro url.")
+        url_error = validate_event_url(self.url_var.get())
+        if url_error:
+            messagebox.showerror("Error", url_error)
             return False
         
         try:
-            interval = int(self.interval_var.get())
-            if interval <= 0:
-                messagebox.showerror("Error", "Polling interval must be greater than 0")
+            interval = float(self.interval_var.get())
+            if not valid_interval(interval):
+                messagebox.showerror("Error", "Polling interval must be a finite number greater than 0")
                 return False
         except ValueError:
             messagebox.showerror("Error", "Polling interval must be a valid number")
@@ -378,13 +620,25 @@ class ScraperApp:
             if not result:
                 return  # User cancelled, don't close
         
-        # Stop scraping if active
+        # Stop scraping if active, closing once the scraping thread is done
+        if self.stopping:
+            return
         if self.is_scraping:
-            self.stop_scraping()
-        elif self.scraper.is_page_open:
+            self.stop_scraping(then=self._close_application)
+            return
+        if self.scraper.is_page_open:
             self.scraper.close_page()
+        self._close_application()
+    
+    def _close_application(self):
+        if self.api_server:
+            self.api_server.stop()
+        
+        if self.history:
+            self.history.close()
         
         self.save_settings()
+        self.driver_manager.shutdown()
         self.root.destroy()
 
 def main():
@@ -0,0 +1,447 @@
+import os
+import threading
+import time
+from collections import deque
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# URL patterns (Chrome DevTools wildcard syntax) that the market pages don't need
+DEFAULT_BLOCKED_URL_PATTERNS = [
+    # Images and icons
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    # Fonts
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    # Media
+    "*.mp4", "*.webm", "*.mp3", "*.m3u8",
+    # Analytics and trackers
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*facebook.net*", "*hotjar.com*", "*clarity.ms*",
+]
+
+# Sums what the page has transferred so far, using the Resource Timing API
+TRANSFER_STATS_SCRIPT = """
+var entries = performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'));
+var bytes = 0;
+for (var i = 0; i < entries.length; i++) { bytes += entries[i].transferSize || 0; }
+return {"bytes": bytes, "requests": entries.length};
+"""
+
+# True once a (pre)loading tab has rendered elements matching arguments[0]
+PAGE_READY_SCRIPT = """
+return document.readyState !== 'loading' && document.querySelector(arguments[0]) !== null;
+"""
+
+MB = 1024 * 1024
+
+
+class ResourcePolicy:
+    """
+    Lean page loading: what Chrome may download and when a page counts as loaded
+
+    Images are disabled at launch, further URL patterns are blocked through the
+    DevTools Network domain on every tab before navigating. With an "eager" or
+    "none" page load strategy driver.get() returns early and load_page() waits
+    explicitly for the market container instead.
+    """
+
+    PAGE_LOAD_STRATEGIES = ("normal", "eager", "none")
+
+    def __init__(self, blocked_url_patterns=None, block_images=True, page_load_strategy="eager",
+                 ready_selector="article", ready_timeout=15):
+        """
+        Initialize the resource policy
+
+        Args:
+            blocked_url_patterns (list): URL patterns to block, defaults to DEFAULT_BLOCKED_URL_PATTERNS
+            block_images (bool): Disable image loading in Chrome
+            page_load_strategy (str): "normal", "eager" or "none"
+            ready_selector (str): CSS selector whose presence means the markets are rendered
+            ready_timeout (float): Seconds to wait for ready_selector
+        """
+        if page_load_strategy not in self.PAGE_LOAD_STRATEGIES:
+            raise ValueError(f"Unknown page load strategy: {page_load_strategy}")
+        if blocked_url_patterns is None:
+            blocked_url_patterns = DEFAULT_BLOCKED_URL_PATTERNS
+        self.blocked_url_patterns = list(blocked_url_patterns)
+        self.block_images = block_images
+        self.page_load_strategy = page_load_strategy
+        self.ready_selector = ready_selector
+        self.ready_timeout = ready_timeout
+
+    def configure_options(self, chrome_options):
+        """Apply the launch-time part of the policy to Chrome options"""
+        chrome_options.page_load_strategy = self.page_load_strategy
+        if self.block_images:
+            chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+            chrome_options.add_experimental_option(
+                "prefs", {"profile.managed_default_content_settings.images": 2}
+            )
+
+    def apply(self, driver):
+        """Block the configured URL patterns in the driver's current tab"""
+        if not self.blocked_url_patterns:
+            return
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.blocked_url_patterns})
+
+
+class PageLoadReport:
+    """
+    Timings and transfer size of one page load
+    """
+
+    def __init__(self, url, navigation_s, ready_s, transferred_bytes, requests, ready):
+        self.url = url
+        self.navigation_s = navigation_s
+        self.ready_s = ready_s
+        self.transferred_bytes = transferred_bytes
+        self.requests = requests
+        self.ready = ready
+
+    def as_dict(self):
+        return {
+            "url": self.url,
+            "navigation_s": self.navigation_s,
+            "ready_s": self.ready_s,
+            "transferred_bytes": self.transferred_bytes,
+            "requests": self.requests,
+            "ready": self.ready,
+        }
+
+
+def load_page(driver, url, resource_policy=None):
+    """
+    Navigate the driver's current tab and wait until the markets are rendered
+
+    Args:
+        driver: Selenium WebDriver
+        url (str): URL to load
+        resource_policy (ResourcePolicy): Policy to apply, None loads the page as-is
+
+    Returns:
+        PageLoadReport: Navigation and page-ready times and transferred bytes
+    """
+    start = time.perf_counter()
+    if resource_policy:
+        resource_policy.apply(driver)
+    driver.get(url)
+    navigation_s = time.perf_counter() - start
+
+    ready = True
+    if resource_policy and resource_policy.ready_selector:
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import TimeoutException
+
+        try:
+            WebDriverWait(driver, timeout=resource_policy.ready_timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, resource_policy.ready_selector))
+            )
+        except TimeoutException:
+            ready = False
+    ready_s = time.perf_counter() - start
+
+    try:
+        transfer = driver.execute_script(TRANSFER_STATS_SCRIPT) or {}
+    except Exception:
+        transfer = {}
+    return PageLoadReport(url, navigation_s, ready_s, transfer.get("bytes", 0), transfer.get("requests", 0), ready)
+
+
+def start_page_load(driver, url, resource_policy=None):
+    """
+    Start navigating the driver's current tab without waiting for the page to load
+
+    Unlike load_page() this returns as soon as the navigation is under way, so
+    the caller can go on working in another tab meanwhile.
+    """
+    if resource_policy:
+        resource_policy.apply(driver)
+    driver.execute_cdp_cmd("Page.navigate", {"url": url})
+
+
+def tab_memory(driver):
+    """
+    Memory use of the driver's current tab, from the DevTools Performance domain
+
+    Returns:
+        dict: JS heap used/total in MB and the live DOM node, event listener
+            and document counts
+    """
+    driver.execute_cdp_cmd("Performance.enable", {})
+    metrics = {
+        metric["name"]: metric["value"]
+        for metric in driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]
+    }
+    return {
+        "heap_mb": metrics.get("JSHeapUsedSize", 0) / MB,
+        "heap_total_mb": metrics.get("JSHeapTotalSize", 0) / MB,
+        "nodes": int(metrics.get("Nodes", 0)),
+        "listeners": int(metrics.get("JSEventListeners", 0)),
+        "documents": int(metrics.get("Documents", 0)),
+    }
+
+
+def browser_rss(driver):
+    """
+    Resident memory of a driver's browser, all of its processes together
+
+    Returns:
+        float: RSS in MB, None if psutil is not installed or the processes are unknown
+    """
+    try:
+        import psutil
+    except ImportError:
+        return None
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        processes = [root] + root.children(recursive=True)
+    except Exception:
+        return None
+    total = 0
+    for process in processes:
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            # Renderer processes come and go
+            pass
+    return total / MB
+
+
+def build_chrome_options(resource_policy=None, capture_network=False):
+    """Chrome options shared by every driver the scraper launches"""
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")  # Run in background - DISABLED FOR DEBUGGING
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1200,900")
+    chrome_options.add_argument(f"--user-agent={USER_AGENT}")
+    chrome_options.add_argument("--disable-speech-api")
+    chrome_options.add_argument("--disable-speech-synthesis-api")
+    chrome_options.add_argument("--disable-voice-transcription")
+    chrome_options.add_argument("--silent")
+    chrome_options.add_argument("--disable-logging")
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-logging"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    if resource_policy:
+        resource_policy.configure_options(chrome_options)
+    if capture_network:
+        # DevTools network events end up in driver.get_log("performance")
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return chrome_options
+
+
+def launch_chrome(page_load_timeout=30, resource_policy=None, capture_network=False):
+    """
+    Launch exactly one Chrome instance
+
+    Chromedriver logs go to the null device; if that Service cannot be
+    started, Selenium's default service is used instead.
+
+    Args:
+        page_load_timeout (int): Page load timeout in seconds
+        resource_policy (ResourcePolicy): Launch-time resource restrictions, optional
+        capture_network (bool): Enable the performance log used by the feed capture mode
+
+    Returns:
+        WebDriver: The running driver
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.common.exceptions import WebDriverException
+
+    chrome_options = build_chrome_options(resource_policy, capture_network)
+    try:
+        driver = webdriver.Chrome(service=Service(log_output=os.devnull), options=chrome_options)
+    except WebDriverException:
+        driver = webdriver.Chrome(options=chrome_options)
+    driver.set_page_load_timeout(page_load_timeout)
+    return driver
+
+
+def is_driver_alive(driver):
+    """Check that a driver's browser session still responds"""
+    try:
+        driver.current_window_handle
+        return True
+    except Exception:
+        return False
+
+
+class DriverManager:
+    """
+    Keeps Chrome instances warm across stop/start and URL changes
+
+    Scrapers acquire() a driver instead of launching one and release() it
+    instead of quitting, so only the first start pays the browser cold-start.
+    With keep_spare enabled a spare browser is launched in the background,
+    so even the next new event gets a ready driver.
+    """
+
+    def __init__(self, page_load_timeout=30, keep_spare=False, log=print, resource_policy=None,
+                 capture_network=False):
+        """
+        Initialize the driver manager
+
+        Args:
+            page_load_timeout (int): Page load timeout of launched drivers in seconds
+            keep_spare (bool): Keep one pre-launched driver ready at all times
+            log (callable): Function receiving log messages
+            resource_policy (ResourcePolicy): Lean loading policy for launched drivers, optional
+            capture_network (bool): Launch drivers with the performance log enabled
+        """
+        self.page_load_timeout = page_load_timeout
+        self.resource_policy = resource_policy
+        self.capture_network = capture_network
+        self.keep_spare = keep_spare
+        self.log = log
+        self._idle = []
+        self._in_use = []
+        self._spare = None
+        self._spawning = False
+        self._lock = threading.Lock()
+        self.launch_count = 0
+        self.navigation_count = 0
+        self.launch_times = deque(maxlen=100)
+        self.navigation_times = deque(maxlen=100)
+
+    def _launch(self):
+        start = time.perf_counter()
+        driver = launch_chrome(self.page_load_timeout, self.resource_policy, self.capture_network)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.launch_count += 1
+            self.launch_times.append(elapsed)
+        self.log(f"Browser launched in {elapsed:.2f}s")
+        return driver
+
+    def acquire(self):
+        """
+        Get a running driver: an idle warm one, the spare, or a freshly launched one
+
+        Returns:
+            WebDriver: A driver reserved for the caller until release()
+        """
+        while True:
+            with self._lock:
+                if self._idle:
+                    driver = self._idle.pop()
+                elif self._spare is not None:
+                    driver, self._spare = self._spare, None
+                else:
+                    driver = None
+            if driver is None:
+                driver = self._launch()
+                break
+            if is_driver_alive(driver):
+                break
+            # The warm browser died while parked
+            self._quit(driver)
+        with self._lock:
+            self._in_use.append(driver)
+        self._ensure_spare()
+        return driver
+
+    def release(self, driver):
+        """
+        Give a driver back without quitting it
+
+        Extra tabs are closed and the remaining one is parked on about:blank so the
+        page's scripts stop using CPU while the browser stays warm.
+        """
+        with self._lock:
+            if driver in self._in_use:
+                self._in_use.remove(driver)
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.get("about:blank")
+        except Exception:
+            self._quit(driver)
+            return
+        with self._lock:
+            self._idle.append(driver)
+
+    def discard(self, driver):
+        """Quit a driver that hung or crashed instead of keeping it warm"""
+        with self._lock:
+            if driver in self._in_use:
+                self._in_use.remove(driver)
+        self._quit(driver)
+
+    def navigate(self, driver, url):
+        """
+        Load a URL in the driver's current tab and record how long it took
+
+        Returns:
+            PageLoadReport: Navigation and page-ready times and transferred bytes
+        """
+        report = load_page(driver, url, self.resource_policy)
+        with self._lock:
+            self.navigation_count += 1
+            self.navigation_times.append(report.ready_s)
+        return report
+
+    def _ensure_spare(self):
+        """Launch a spare driver in the background if one is wanted and missing"""
+        with self._lock:
+            if not self.keep_spare or self._spare is not None or self._spawning:
+                return
+            self._spawning = True
+        threading.Thread(target=self._spawn_spare, daemon=True).start()
+
+    def _spawn_spare(self):
+        try:
+            driver = self._launch()
+            with self._lock:
+                if self._spare is None and self.keep_spare:
+                    self._spare = driver
+                    driver = None
+            if driver is not None:
+                self._quit(driver)
+        except Exception as e:
+            self.log(f"Error launching spare browser: {e}")
+        finally:
+            with self._lock:
+                self._spawning = False
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def stats(self):
+        """
+        Returns:
+            dict: Driver counts and launch/navigation timings in seconds
+        """
+        with self._lock:
+            return {
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "spare": self._spare is not None,
+                "launches": self.launch_count,
+                "last_launch_s": self.launch_times[-1] if self.launch_times else None,
+                "avg_launch_s": sum(self.launch_times) / len(self.launch_times) if self.launch_times else None,
+                "navigations": self.navigation_count,
+                "last_navigation_s": self.navigation_times[-1] if self.navigation_times else None,
+                "avg_navigation_s": (sum(self.navigation_times) / len(self.navigation_times)
+                                     if self.navigation_times else None),
+            }
+
+    def shutdown(self):
+        """Quit every driver, including warm and spare ones"""
+        with self._lock:
+            drivers = self._idle + self._in_use + ([self._spare] if self._spare else [])
+            self._idle, self._in_use, self._spare = [], [], None
+            self.keep_spare = False
+        for driver in drivers:
+            self._quit(driver)
@@ -0,0 +1,598 @@
+import argparse
+import json
+import signal
+import sys
+import threading
+import time
+
+# Scraper modules (and through them selenium, requests and the parsers) are
+# imported inside the run functions, so --help and config errors return
+# immediately and only what the chosen mode needs gets loaded.
+
+DEFAULTS = {
+    "urls": [],
+    "interval": 1,
+    "output_file": "TippmixPro_API_output.json",
+    "output_dir": "output",
+    "max_drivers": 2,
+    "extraction_mode": "html",
+    "parser_engine": "lxml",
+    "update_mode": "poll",
+    "output_mode": "snapshot",
+    "checkpoint_interval": 60,
+    "compact_output": False,
+    "binary_output": False,
+    "history_dir": None,
+    "discover": False,
+    "discovery_url": None,
+    "discovery_interval": 30,
+    "max_events": None,
+    "api_port": None,
+    "lean_loading": False,
+    "http": False,
+    "http_workers": 8,
+    "adaptive_polling": False,
+    "min_interval": None,
+    "max_interval": None,
+    "parse_workers": 0,
+    "max_pending_parses": None,
+    "tab_memory_budget": 512,
+    "record": None,
+    "replay": None,
+    "replay_speed": 1,
+    "analytics": False,
+    "alert_threshold": 5.0,
+    "coordinate": None,
+    "join": None,
+    "worker_id": None,
+}
+
+
+def log_message(message):
+    """Print a timestamped log line"""
+    timestamp = time.strftime("%H:%M:%S")
+    print(f"[{timestamp}] {message}", flush=True)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Headless TippmixPro scraper. Scrapes one or more events without the GUI."
+    )
+    parser.add_argument("urls", nargs="*", help="TippmixPro event URLs ending with /all")
+    parser.add_argument("-c", "--config", help="JSON config file (same keys as scraper_settings.json, "
+                                               "plus 'urls' for several events)")
+    parser.add_argument("-i", "--interval", type=float, help="Polling interval in seconds, fractions allowed")
+    parser.add_argument("--adaptive", dest="adaptive_polling", action="store_true", default=None,
+                        help="Poll faster while odds move and slower on quiet or suspended events")
+    parser.add_argument("--min-interval", type=float, help="Fastest adaptive interval (default interval / 4)")
+    parser.add_argument("--max-interval", type=float, help="Slowest adaptive interval (default interval * 8)")
+    parser.add_argument("-o", "--output-file", help="Output JSON file for a single event")
+    parser.add_argument("-d", "--output-dir", help="Output directory when following several events")
+    parser.add_argument("--max-drivers", type=int, help="Chrome instances shared by several events")
+    parser.add_argument("--extraction-mode", choices=["html", "script", "feed"])
+    parser.add_argument("--parser-engine", choices=["lxml", "bs4"])
+    parser.add_argument("--update-mode", choices=["poll", "push"])
+    parser.add_argument("--output-mode", choices=["snapshot", "delta"])
+    parser.add_argument("--checkpoint-interval", type=float)
+    parser.add_argument("--compact-output", action="store_true", default=None)
+    parser.add_argument("--binary-output", action="store_true", default=None,
+                        help="Also write a binary columnar snapshot (.bin) next to each JSON file")
+    parser.add_argument("--discover", action="store_true", default=None,
+                        help="Follow every live event from the live-events listing, starting and retiring "
+                             "watchers as events begin and end")
+    parser.add_argument("--discovery-url", help="Live-events listing page scraped by --discover")
+    parser.add_argument("--discovery-interval", type=float, help="Seconds between two scrapes of the listing")
+    parser.add_argument("--max-events", type=int,
+                        help="Most events --discover follows at once, or a --join worker accepts")
+    parser.add_argument("--history-dir", help="Record every odds move in an odds history store in this directory")
+    parser.add_argument("--record", help="Record every raw page snapshot into this compressed archive")
+    parser.add_argument("--replay", help="Replay a recorded archive through parsing and output, without a browser")
+    parser.add_argument("--replay-speed", type=float,
+                        help="Playback speed of --replay, e.g. 10 for 10x (default 1, 0 as fast as possible)")
+    parser.add_argument("--analytics", action="store_true", default=None,
+                        help="Compute implied probabilities, overrounds and odds moves every cycle (needs NumPy)")
+    parser.add_argument("--alert-threshold", type=float, help="Log odds moves of at least this many percent (default 5)")
+    parser.add_argument("--coordinate", metavar="HOST:PORT",
+                        help="Shard the events across worker processes that connect to this address")
+    parser.add_argument("--join", metavar="HOST:PORT",
+                        help="Run as a worker of the coordinator at this address (with --http for HTTP workers)")
+    parser.add_argument("--worker-id", help="Name of this worker in the coordinator's status")
+    parser.add_argument("--api-port", type=int, help="Serve the latest snapshots on this local port")
+    parser.add_argument("--http", action="store_true", default=None,
+                        help="Fetch pages over plain HTTP instead of Chrome (server-rendered pages only)")
+    parser.add_argument("--http-workers", type=int, help="Parallel HTTP requests in --http mode")
+    parser.add_argument("--parse-workers", type=int,
+                        help="Parse snapshots in this many worker processes (0 parses on the scraping threads)")
+    parser.add_argument("--max-pending-parses", type=int,
+                        help="Snapshots queued for the parse workers before capturing waits (default 2 per worker)")
+    parser.add_argument("--tab-memory-budget", type=float,
+                        help="Recycle a tab once its JS heap exceeds this many MB (default 512, 0 disables)")
+    parser.add_argument("--lean-loading", action="store_true", default=None,
+                        help="Block images, fonts, media and trackers and wait only for the markets")
+    return parser
+
+
+def load_config(args):
+    """
+    Merge defaults, the config file and command-line arguments (in that order)
+
+    Returns:
+        dict: Effective configuration
+    """
+    config = dict(DEFAULTS)
+    if args.config:
+        with open(args.config, 'r') as f:
+            file_config = json.load(f)
+        # The GUI settings file stores a single 'url'
+        if "url" in file_config and "urls" not in file_config:
+            file_config["urls"] = [file_config.pop("url")]
+        config.update(file_config)
+    for key, value in vars(args).items():
+        if key == "config" or value is None or value == []:
+            continue
+        config[key] = value
+    config["interval"] = float(config["interval"])
+    return config
+
+
+def scraper_options(config, metrics=None, recorder=None):
+    """TippmixProScraper arguments derived from the config"""
+    options = {
+        "extraction_mode": config["extraction_mode"],
+        "parser_engine": config["parser_engine"],
+        "metrics": metrics,
+        "recorder": recorder,
+    }
+    if config["lean_loading"]:
+        from scraper_browser import ResourcePolicy
+        options["resource_policy"] = ResourcePolicy()
+    return options
+
+
+def poll_schedule_options(config):
+    """PollSchedule arguments derived from the config"""
+    return {
+        "adaptive": config["adaptive_polling"],
+        "min_interval": config["min_interval"],
+        "max_interval": config["max_interval"],
+    }
+
+
+def open_history(config):
+    """Open the odds history store if configured, None otherwise"""
+    if not config["history_dir"]:
+        return None
+    from scraper_history import HistoryStore
+    history = HistoryStore(config["history_dir"])
+    log_message(f"Recording odds history in {config['history_dir']} ({history.stats()['ticks']} ticks so far)")
+    return history
+
+
+def start_analytics(config):
+    """Create the odds analytics engine, logging large moves, if configured; None otherwise"""
+    if not config["analytics"]:
+        return None
+    from scraper_analytics import OddsAnalytics
+    analytics = OddsAnalytics(move_threshold=config["alert_threshold"])
+
+    def log_alerts(alerts):
+        for alert in alerts[:20]:
+            log_message(f"Odds move {alert['move_pct']:+.1f}%: event {alert['event_id']} market "
+                        f"{alert['market_id']} {alert['text']} {alert['previous']:g} -> {alert['odds']:g}")
+        if len(alerts) > 20:
+            log_message(f"... and {len(alerts) - 20} more moves")
+
+    analytics.add_alert_callback(log_alerts)
+    return analytics
+
+
+def open_recorder(config):
+    """Open the snapshot recorder if configured, None otherwise"""
+    if not config["record"]:
+        return None
+    from scraper_recording import SnapshotRecorder
+    recorder = SnapshotRecorder(config["record"], log=log_message)
+    log_message(f"Recording raw snapshots to {config['record']}")
+    return recorder
+
+
+def close_recorder(recorder):
+    """Write the rest of a recording and log how well it compressed"""
+    if not recorder:
+        return
+    recorder.close()
+    stats = recorder.stats()
+    log_message(f"Recorded {stats['frames']} snapshots ({stats['duplicates']} duplicates dropped), "
+                f"{stats['raw_bytes'] / 1024:.0f} KB -> {stats['compressed_bytes'] / 1024:.0f} KB")
+
+
+def start_parse_pipeline(config, metrics=None):
+    """Start the parse worker processes if configured, None otherwise"""
+    if not config["parse_workers"]:
+        return None
+    from scraper_pipeline import ParsePipeline
+    pipeline = ParsePipeline(max_workers=config["parse_workers"], max_pending=config["max_pending_parses"],
+                             parser_engine=config["parser_engine"], log=log_message, metrics=metrics)
+    log_message(f"Parsing in {pipeline.max_workers} worker processes")
+    return pipeline
+
+
+def open_writer(config, metrics=None, history=None, analytics=None):
+    """Background output writer with the configured format and checkpoint interval"""
+    from scraper_output import SnapshotWriter
+
+    return SnapshotWriter(compact=config["compact_output"], refresh_interval=config["checkpoint_interval"],
+                          log=log_message, metrics=metrics, binary=config["binary_output"], history=history,
+                          analytics=analytics)
+
+
+def output_targets(config, single=False):
+    """
+    Map event ids to their output file and, in delta output mode, their journal
+
+    Args:
+        config (dict): Headless configuration
+        single (bool): Write the one event to output_file instead of a file per event
+
+    Returns:
+        callable: event_id -> (output_file, journal or None)
+    """
+    import os
+    from scraper_output import DeltaJournal
+    from scraper_pool import output_name
+
+    journals = {}
+
+    def target(event_id):
+        if single:
+            output_file = config["output_file"]
+        else:
+            output_file = os.path.join(config["output_dir"], f"TippmixPro_{output_name(event_id)}.json")
+        journal = None
+        if config["output_mode"] == "delta":
+            journal = journals.get(output_file)
+            if journal is None:
+                journal = journals[output_file] = DeltaJournal(
+                    output_file, checkpoint_interval=config["checkpoint_interval"],
+                    compact=config["compact_output"], binary=config["binary_output"])
+        return output_file, journal
+    return target
+
+
+def run_single(config, url, stop_event):
+    """Follow one event in its own browser, like the GUI does"""
+    from scraper_core import TippmixProScraper
+    from scraper_pool import event_id_from_url
+    from scraper_schedule import PollSchedule
+    from scraper_watchdog import Watchdog
+    from scraper_memory import TabRecycler
+
+    interval = config["interval"]
+    event_id = event_id_from_url(url) or "default"
+
+    history = open_history(config)
+    analytics = start_analytics(config)
+    store, server, metrics = start_api(config, history, analytics)
+    recorder = open_recorder(config)
+    scraper = TippmixProScraper(use_selenium=True, **scraper_options(config, metrics, recorder))
+    writer = open_writer(config, metrics, history, analytics)
+    output_file, journal = output_targets(config, single=True)(event_id)
+
+    schedule = PollSchedule(interval, **poll_schedule_options(config))
+    # Push mode returns None whenever nothing changed, so only poll mode is watched
+    watchdog = Watchdog(scraper, log=log_message) if config["update_mode"] != "push" else None
+    recycler = None
+    if config["tab_memory_budget"]:
+        recycler = TabRecycler(scraper, heap_budget_mb=config["tab_memory_budget"], log=log_message)
+    writer.start()
+    try:
+        # Inside the try, so a failed page load still closes the browser and the API server
+        scraper.open_page(url)
+        report = scraper.last_page_load
+        log_message(f"Page opened in {report.ready_s:.2f}s ({report.transferred_bytes / 1024:.0f} KB): "
+                    f"{scraper.current_url}")
+        while not stop_event.is_set():
+            data = None
+            error = None
+            try:
+                if config["update_mode"] == "push":
+                    data = scraper.wait_for_market_changes(timeout=interval)
+                else:
+                    data = scraper.scrape_market_titles()
+                if data:
+                    writer.submit(data, output_file, journal=journal, event_id=event_id)
+                    if store:
+                        store.publish(event_id, data)
+            except Exception as e:
+                error = e
+                log_message(f"Error during scraping: {e}")
+                if config["update_mode"] == "push":
+                    stop_event.wait(interval)
+            if watchdog and not stop_event.is_set():
+                watchdog.observe(data, error)
+            if recycler and not stop_event.is_set():
+                recycler.check()
+            if config["update_mode"] != "push":
+                schedule.complete(data)
+                schedule.wait(stop_event)
+    finally:
+        writer.stop()
+        scraper.close()
+        close_recorder(recorder)
+        if history:
+            history.close()
+        if server:
+            server.stop()
+
+
+def run_pool(config, urls, stop_event):
+    """Follow several events as tabs on a few shared browsers"""
+    from scraper_pool import WatcherPool
+
+    history = open_history(config)
+    analytics = start_analytics(config)
+    store, server, metrics = start_api(config, history, analytics)
+    pipeline = start_parse_pipeline(config, metrics)
+    recorder = open_recorder(config)
+    pool = WatcherPool(config["output_dir"], interval=config["interval"],
+                       max_drivers=config["max_drivers"], log=log_message, store=store,
+                       scraper_options=scraper_options(config, metrics, recorder), parse_pipeline=pipeline,
+                       binary_output=config["binary_output"], history=history, analytics=analytics,
+                       tab_memory_budget_mb=config["tab_memory_budget"] or None,
+                       compact_output=config["compact_output"], output_mode=config["output_mode"],
+                       checkpoint_interval=config["checkpoint_interval"], **poll_schedule_options(config))
+    pool.start(urls)
+    discovery = None
+    if config["discover"]:
+        from scraper_discovery import LiveEventDiscovery, LIVE_EVENTS_URL
+        discovery = LiveEventDiscovery(pool, listing_url=config["discovery_url"] or LIVE_EVENTS_URL,
+                                       interval=config["discovery_interval"], max_events=config["max_events"],
+                                       scraper_options=scraper_options(config), log=log_message)
+        discovery.start()
+    try:
+        stop_event.wait()
+    finally:
+        if discovery:
+            discovery.stop()
+        pool.stop()
+        if pipeline:
+            pipeline.close()
+        close_recorder(recorder)
+        if history:
+            history.close()
+        if server:
+            server.stop()
+
+
+def run_http(config, urls, stop_event):
+    """Poll every event over pooled HTTP connections, without a browser"""
+    import os
+    from scraper_http import ConcurrentFetcher
+
+    history = open_history(config)
+    analytics = start_analytics(config)
+    store, server, metrics = start_api(config, history, analytics)
+    writer = open_writer(config, metrics, history, analytics)
+    pipeline = start_parse_pipeline(config, metrics)
+    recorder = open_recorder(config)
+    fetcher = ConcurrentFetcher(urls, max_workers=config["http_workers"], parser_engine=config["parser_engine"],
+                                metrics=metrics, parse_pipeline=pipeline, recorder=recorder)
+    if len(urls) > 1:
+        os.makedirs(config["output_dir"], exist_ok=True)
+    target = output_targets(config, single=len(urls) == 1)
+
+    def on_markets(event_id, markets):
+        output_file, journal = target(event_id)
+        writer.submit(markets, output_file, journal=journal, event_id=event_id)
+        if store:
+            store.publish(event_id, markets)
+
+    writer.start()
+    try:
+        fetcher.run(config["interval"], on_markets, stop_event, **poll_schedule_options(config))
+    finally:
+        fetcher.close()
+        if pipeline:
+            pipeline.drain(timeout=15)
+            pipeline.close()
+        writer.stop()
+        close_recorder(recorder)
+        if history:
+            history.close()
+        if server:
+            server.stop()
+
+
+def run_replay(config, stop_event):
+    """Feed a recording through parsing and output at the recorded pace times --replay-speed"""
+    import os
+    from scraper_recording import SnapshotReplayer
+
+    history = open_history(config)
+    analytics = start_analytics(config)
+    store, server, metrics = start_api(config, history, analytics)
+    writer = open_writer(config, metrics, history, analytics)
+    pipeline = start_parse_pipeline(config, metrics)
+    replayer = SnapshotReplayer(config["replay"], speed=config["replay_speed"], parser_engine=config["parser_engine"],
+                                parse_pipeline=pipeline, metrics=metrics, log=log_message)
+    stats = replayer.archive.stats()
+    log_message(f"Replaying {stats['frames']} snapshots from {config['replay']} at "
+                + (f"{config['replay_speed']:g}x" if config["replay_speed"] else "full speed"))
+    os.makedirs(config["output_dir"], exist_ok=True)
+    target = output_targets(config)
+
+    def on_markets(event_id, markets):
+        output_file, journal = target(event_id)
+        writer.submit(markets, output_file, journal=journal, event_id=event_id)
+        if store:
+            store.publish(event_id, markets)
+
+    writer.start()
+    try:
+        result = replayer.run(on_markets, stop_event)
+        log_message(f"Replayed {result['frames']} snapshots in {result['elapsed_s']:.2f}s"
+                    + (f" ({result['realtime_factor']:.0f}x real time)" if result["realtime_factor"] else ""))
+    finally:
+        if pipeline:
+            pipeline.close()
+        writer.stop()
+        if history:
+            history.close()
+        if server:
+            server.stop()
+
+
+def run_coordinator(config, urls, stop_event):
+    """Own the event list and write the results that the worker processes stream back"""
+    import os
+    from scraper_cluster import ClusterCoordinator, parse_address
+
+    history = open_history(config)
+    analytics = start_analytics(config)
+    store, server, metrics = start_api(config, history, analytics)
+    writer = open_writer(config, metrics, history, analytics)
+    os.makedirs(config["output_dir"], exist_ok=True)
+    target = output_targets(config)
+
+    def on_markets(event_id, markets):
+        output_file, journal = target(event_id)
+        writer.submit(markets, output_file, journal=journal, event_id=event_id)
+        if store:
+            store.publish(event_id, markets)
+
+    host, port = parse_address(config["coordinate"])
+    coordinator = ClusterCoordinator(host, port, interval=config["interval"], callback=on_markets, log=log_message,
+                                     store=store, analytics=analytics)
+    writer.start()
+    coordinator.start(urls)
+    discovery = None
+    if config["discover"]:
+        from scraper_discovery import LiveEventDiscovery, LIVE_EVENTS_URL
+        discovery = LiveEventDiscovery(coordinator, listing_url=config["discovery_url"] or LIVE_EVENTS_URL,
+                                       interval=config["discovery_interval"], max_events=config["max_events"],
+                                       scraper_options=scraper_options(config), log=log_message)
+        discovery.start()
+    try:
+        stop_event.wait()
+    finally:
+        if discovery:
+            discovery.stop()
+        coordinator.stop()
+        writer.stop()
+        if history:
+            history.close()
+        if server:
+            server.stop()
+
+
+def run_worker(config, stop_event):
+    """Scrape the events a coordinator assigns and stream the results back to it"""
+    from scraper_cluster import ClusterWorker
+
+    worker = ClusterWorker(config["join"], worker_id=config["worker_id"], interval=config["interval"],
+                           use_selenium=not config["http"], max_drivers=config["max_drivers"],
+                           http_workers=config["http_workers"], max_events=config["max_events"],
+                           scraper_options=scraper_options(config), log=log_message)
+    worker.run(stop_event)
+
+
+def start_api(config, history=None, analytics=None):
+    """
+    Start the local snapshot API (with /metrics, /history with an odds history and /analytics
+    with odds analytics) if a port is configured
+
+    Returns:
+        tuple: (store, server, metrics), all None without an API port
+    """
+    if not config["api_port"]:
+        return None, None, None
+    from scraper_metrics import Metrics, metrics_route
+    from scraper_server import SnapshotStore, SnapshotServer
+    store = SnapshotStore()
+    metrics = Metrics()
+    server = SnapshotServer(store, port=int(config["api_port"]))
+    server.add_route("/metrics", metrics_route(metrics))
+    if history:
+        from scraper_history import history_route
+        server.add_route("/history", history_route(history))
+    if analytics:
+        from scraper_analytics import analytics_route
+        server.add_route("/analytics", analytics_route(analytics))
+    server.start()
+    log_message(f"API server listening on http://127.0.0.1:{server.port}/events")
+    return store, server, metrics
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        config = load_config(args)
+    except (OSError, ValueError) as e:
+        print(f"Error loading config: {e}", file=sys.stderr)
+        return 2
+
+    from scraper_core import validate_event_url
+    from scraper_schedule import valid_interval
+
+    urls = config["urls"]
+    if not urls and not config["discover"] and not config["replay"] and not config["join"] \
+            and not config["coordinate"]:
+        print("Error: no event URLs given (or use --discover or --replay)", file=sys.stderr)
+        return 2
+    if config["extraction_mode"] == "feed" and config["http"]:
+        print("Error: --extraction-mode feed reads the browser's network traffic and cannot be combined with --http",
+              file=sys.stderr)
+        return 2
+    if config["discover"] and config["http"]:
+        print("Error: --discover follows events in the browser and cannot be combined with --http", file=sys.stderr)
+        return 2
+    for url in urls:
+        url_error = validate_event_url(url)
+        if url_error:
+            print(f"Error: {url}: {url_error}", file=sys.stderr)
+            return 2
+    if not valid_interval(config["interval"]):
+        print("Error: Polling interval must be a finite number greater than 0", file=sys.stderr)
+        return 2
+    for name in ("min_interval", "max_interval"):
+        if config[name] is not None and not valid_interval(config[name]):
+            print(f"Error: --{name.replace('_', '-')} must be a finite number greater than 0", file=sys.stderr)
+            return 2
+    pooled = not (config["replay"] or config["join"] or config["coordinate"] or config["http"]) \
+        and (len(urls) > 1 or config["discover"])
+    if pooled and config["update_mode"] == "push":
+        print("Error: --update-mode push follows a single event; several events are polled", file=sys.stderr)
+        return 2
+    if config["analytics"]:
+        import scraper_analytics
+        if scraper_analytics.np is None:
+            print("Error: --analytics needs NumPy (pip install numpy)", file=sys.stderr)
+            return 2
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        log_message(f"Received signal {signum}, shutting down")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    if config["replay"]:
+        run_replay(config, stop_event)
+    elif config["join"]:
+        run_worker(config, stop_event)
+    elif config["coordinate"]:
+        run_coordinator(config, [url.strip() for url in urls], stop_event)
+    elif config["http"]:
+        run_http(config, [url.strip() for url in urls], stop_event)
+    elif len(urls) == 1 and not config["discover"]:
+        run_single(config, urls[0].strip(), stop_event)
+    else:
+        run_pool(config, [url.strip() for url in urls], stop_event)
+    log_message("Scraping stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
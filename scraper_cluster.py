@@ -0,0 +1,724 @@
+import json
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from scraper_model import market_list
+from scraper_pool import event_id_from_url
+
+# Wire protocol: one JSON object per line over TCP.
+#
+# worker -> coordinator
+#   {"type": "hello", "worker_id": ..., "slots": n, "max_events": n or null}
+#   {"type": "markets", "event_id": ..., "markets": [...]}              (only when changed)
+#   {"type": "status", "events": [...], "fresh": [...], "cycle_s": s, "skipped": n}
+#       heartbeat; fresh lists the events scraped with markets since the last one
+# coordinator -> worker
+#   {"type": "assign", "url": ...}
+#   {"type": "release", "event_id": ...}
+#   {"type": "stop"}
+
+
+def parse_address(address, default_port=8765):
+    """
+    Args:
+        address (str): "host:port", "host" or ":port"
+
+    Returns:
+        tuple: (host, port)
+    """
+    host, _, port = address.rpartition(":") if ":" in address else (address, None, None)
+    return host or "127.0.0.1", int(port) if port else default_port
+
+
+class _Connection:
+    """
+    Line-delimited JSON messages over a socket, safe to send from several threads
+
+    send() only queues a message and a sender thread writes the queue out,
+    so a peer that stops reading never blocks the sending thread. Once more
+    than max_pending messages are queued, the peer counts as dead and the
+    connection is closed.
+    """
+
+    def __init__(self, sock, max_pending=10000):
+        self.sock = sock
+        self.max_pending = max_pending
+        self._reader = sock.makefile("r", encoding="utf-8", newline="\n")
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._sending = False
+        self.closed = False
+        threading.Thread(target=self._send_loop, daemon=True).start()
+
+    def send(self, message):
+        """Queue a message; raises OSError if the connection is closed or the peer is stuck"""
+        data = (json.dumps(message, ensure_ascii=False, separators=(',', ':')) + "\n").encode("utf-8")
+        with self._condition:
+            if self.closed:
+                raise OSError("Connection closed")
+            overflow = len(self._queue) >= self.max_pending
+            if not overflow:
+                self._queue.append(data)
+                self._condition.notify_all()
+        if overflow:
+            self.close()
+            raise OSError(f"Peer stopped reading ({self.max_pending} messages queued), connection closed")
+
+    def _send_loop(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self.closed:
+                    self._condition.wait()
+                if self.closed:
+                    return
+                batch = b"".join(self._queue)
+                self._queue.clear()
+                self._sending = True
+            try:
+                self.sock.sendall(batch)
+            except OSError:
+                self.close()
+                return
+            finally:
+                with self._condition:
+                    self._sending = False
+                    self._condition.notify_all()
+
+    def drain(self, timeout=1.0):
+        """Wait up to timeout seconds for the queued messages to be sent"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while (self._queue or self._sending) and not self.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return not self._queue
+
+    def messages(self):
+        """Yield incoming messages until the peer disconnects"""
+        try:
+            for line in self._reader:
+                if line.strip():
+                    yield json.loads(line)
+        except (OSError, ValueError):
+            return
+        finally:
+            # The reader holds a reference to the socket: its fd is only released once both are closed
+            try:
+                self._reader.close()
+            except (OSError, ValueError):
+                pass
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class WorkerHandle:
+    """The coordinator's view of one connected worker"""
+
+    def __init__(self, connection, address):
+        self.connection = connection
+        self.address = address
+        self.worker_id = None
+        self.slots = 1
+        self.max_events = None
+        self.events = set()
+        self.cycle_s = None
+        self.skipped = 0
+        self.skipping = False
+        self.last_seen = time.monotonic()
+        self.connected_at = time.monotonic()
+
+    def load(self, interval):
+        """
+        Estimated share of the worker's capacity in use: events times measured
+        seconds per scrape, spread over its parallel slots, per polling interval
+        """
+        if not self.cycle_s:
+            return len(self.events) / max(1, self.slots) * 0.01
+        return len(self.events) * self.cycle_s / max(1, self.slots) / interval
+
+    def has_room(self):
+        return self.max_events is None or len(self.events) < self.max_events
+
+
+class ShardedEvent:
+    """One event owned by the coordinator and scraped by one of its workers"""
+
+    def __init__(self, url):
+        self.url = url
+        self.event_id = event_id_from_url(url) or url
+        self.worker = None
+        self.started_at = time.monotonic()
+        self.last_markets = None
+        self.last_markets_at = None
+        self.moves = 0
+
+
+class ClusterCoordinator:
+    """
+    Own the list of followed events and shard it across worker processes
+
+    Workers (ClusterWorker, on this or other machines) connect over TCP and
+    are assigned events; their results stream back whenever they change and
+    are handed to the callback, so output is written in one place. Messages
+    to a worker are queued per connection, so a worker that stops reading
+    cannot stall the coordinator. An event whose worker
+    disconnects or stops sending heartbeats is reassigned right away.
+    Every rebalance_interval seconds an event is moved away from a worker
+    that is overloaded (it skips polling deadlines, or its measured scrape
+    time exceeds its share of the interval) or that follows more than one
+    event above the least busy worker.
+
+    The coordinator has the add_event/remove_event/watchers interface of
+    WatcherPool, so LiveEventDiscovery can drive it.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, interval=1, callback=None, heartbeat_timeout=10,
+                 rebalance_interval=5, overload_threshold=1.0, log=print, store=None, analytics=None):
+        """
+        Initialize the coordinator
+
+        Args:
+            host (str): Interface to listen on for workers
+            port (int): TCP port, 0 picks a free one
+            interval (float): Polling interval of the workers, for the load estimate
+            callback (callable): Called with (event_id, markets) for every result
+            heartbeat_timeout (float): Seconds of silence after which a worker counts as dead
+            rebalance_interval (float): Seconds between two rebalancing passes
+            overload_threshold (float): Estimated load above which a worker is overloaded
+            log (callable): Function receiving log messages
+            store (SnapshotStore): Store the results are published to, cleared of removed events
+            analytics (OddsAnalytics): Analytics fed with the results, cleared of removed events
+        """
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.callback = callback
+        self.heartbeat_timeout = heartbeat_timeout
+        self.rebalance_interval = rebalance_interval
+        self.overload_threshold = overload_threshold
+        self.log = log
+        self.store = store
+        self.analytics = analytics
+        self.events = {}
+        self.workers = []
+        self.moves = 0
+        self._connections = set()
+        self._lock = threading.RLock()
+        self._server = None
+        self._running = False
+        self._stopping = threading.Event()
+        self._threads = []
+
+    @property
+    def watchers(self):
+        """Followed events by event id (WatcherPool-compatible)"""
+        return self.events
+
+    def start(self, urls=()):
+        """
+        Listen for workers and start following the given events
+
+        Args:
+            urls (iterable): Event URLs to follow
+        """
+        self._server = socket.create_server((self.host, self.port))
+        self.port = self._server.getsockname()[1]
+        self._running = True
+        self._stopping.clear()
+        for target in (self._accept_loop, self._supervise):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        for url in urls:
+            self.add_event(url)
+        self.log(f"Coordinator listening for workers on {self.host}:{self.port}")
+
+    def stop(self):
+        """Tell every worker to stop and close the listening socket"""
+        self._running = False
+        self._stopping.set()
+        with self._lock:
+            workers = list(self.workers)
+        for worker in workers:
+            try:
+                worker.connection.send({"type": "stop"})
+            except OSError:
+                pass
+        for worker in workers:
+            worker.connection.drain()
+        with self._lock:
+            connections = list(self._connections)
+        for worker in connections:
+            worker.connection.close()
+        if self._server:
+            # close() alone does not wake a thread blocked in accept()
+            try:
+                self._server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._server.close()
+            self._server = None
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def add_event(self, url):
+        """
+        Start following an event on one of the workers
+
+        Returns:
+            ShardedEvent: The event, or the existing one if already followed
+        """
+        with self._lock:
+            event_id = event_id_from_url(url) or url
+            if event_id in self.events:
+                return self.events[event_id]
+            event = self.events[event_id] = ShardedEvent(url)
+            self._assign(event)
+            return event
+
+    def remove_event(self, event_id):
+        """Stop following an event"""
+        with self._lock:
+            event = self.events.pop(event_id, None)
+            if event is None:
+                return
+            if event.worker:
+                event.worker.events.discard(event_id)
+                self._send(event.worker, {"type": "release", "event_id": event_id})
+        if self.store:
+            self.store.remove(event_id)
+        if self.analytics:
+            self.analytics.remove_event(event_id)
+        self.log(f"Stopped following event {event_id}")
+
+    def _send(self, worker, message):
+        try:
+            worker.connection.send(message)
+        except OSError as e:
+            self.log(f"Error sending to worker {worker.worker_id}: {e}")
+
+    def _pick_worker(self, exclude=None):
+        """Least loaded live worker with room for one more event"""
+        candidates = [w for w in self.workers if w is not exclude and w.worker_id and w.has_room()]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda w: (w.load(self.interval), len(w.events)))
+
+    def _assign(self, event, worker=None):
+        """Hand an event to a worker (the least loaded one by default); lock held"""
+        worker = worker or self._pick_worker()
+        if worker is None:
+            return False
+        worker.events.add(event.event_id)
+        event.worker = worker
+        self._send(worker, {"type": "assign", "url": event.url})
+        return True
+
+    def _assign_pending(self):
+        with self._lock:
+            for event in self.events.values():
+                if event.worker is None and not self._assign(event):
+                    break
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                sock, address = self._server.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            worker = WorkerHandle(_Connection(sock), address)
+            with self._lock:
+                self._connections.add(worker)
+            thread = threading.Thread(target=self._serve, args=(worker,), daemon=True)
+            thread.start()
+
+    def _serve(self, worker):
+        """Read one worker's messages until it disconnects"""
+        for message in worker.connection.messages():
+            worker.last_seen = time.monotonic()
+            kind = message.get("type")
+            if kind == "markets":
+                self._on_markets(worker, message["event_id"], message["markets"])
+            elif kind == "status":
+                with self._lock:
+                    worker.cycle_s = message.get("cycle_s")
+                    skipped = message.get("skipped", 0)
+                    worker.skipping = skipped > worker.skipped
+                    worker.skipped = skipped
+                    # Unchanged results are not sent, but still show that the event has markets
+                    for event_id in message.get("fresh", ()):
+                        event = self.events.get(event_id)
+                        if event is not None and event.worker is worker:
+                            event.last_markets_at = worker.last_seen
+            elif kind == "hello":
+                with self._lock:
+                    worker.worker_id = message.get("worker_id") or f"{worker.address[0]}:{worker.address[1]}"
+                    worker.slots = message.get("slots") or 1
+                    worker.max_events = message.get("max_events")
+                    self.workers.append(worker)
+                self.log(f"Worker {worker.worker_id} joined ({worker.slots} slots)")
+                self._assign_pending()
+        self._drop_worker(worker, "disconnected")
+
+    def _on_markets(self, worker, event_id, markets):
+        markets = market_list(markets)
+        with self._lock:
+            event = self.events.get(event_id)
+            # Late results of an event that moved away or was removed
+            if event is None or event.worker is not worker:
+                return
+            event.last_markets = markets
+            event.last_markets_at = time.monotonic()
+        if self.callback:
+            try:
+                self.callback(event_id, markets)
+            except Exception as e:
+                self.log(f"Error handling markets of event {event_id}: {e}")
+
+    def _drop_worker(self, worker, reason):
+        """Close a dead worker's connection, forget it and give its events to the others"""
+        # Also for connections that never said hello, so their socket and serve thread go away
+        worker.connection.close()
+        with self._lock:
+            self._connections.discard(worker)
+            if worker not in self.workers:
+                return
+            self.workers.remove(worker)
+            orphaned = [self.events[event_id] for event_id in worker.events if event_id in self.events]
+            worker.events.clear()
+            for event in orphaned:
+                event.worker = None
+            if self._running:
+                self.log(f"Worker {worker.worker_id} {reason}, reassigning {len(orphaned)} event(s)")
+        self._assign_pending()
+
+    def _supervise(self):
+        """Drop silent workers, place unassigned events and rebalance periodically"""
+        next_rebalance = time.monotonic() + self.rebalance_interval
+        while not self._stopping.wait(min(1.0, self.heartbeat_timeout / 2)):
+            now = time.monotonic()
+            with self._lock:
+                silent = [w for w in self._connections if now - w.last_seen > self.heartbeat_timeout]
+            for worker in silent:
+                self._drop_worker(worker, "stopped sending heartbeats")
+            self._assign_pending()
+            if now >= next_rebalance:
+                next_rebalance = now + self.rebalance_interval
+                self.rebalance()
+
+    def _overloaded(self, worker):
+        return worker.skipping or worker.load(self.interval) > self.overload_threshold
+
+    def rebalance(self):
+        """
+        Move at most one event from the busiest worker to the least busy one
+
+        Returns:
+            bool: True if an event was moved
+        """
+        with self._lock:
+            workers = [w for w in self.workers if w.worker_id]
+            if len(workers) < 2:
+                return False
+            busiest = max(workers, key=lambda w: (self._overloaded(w), w.load(self.interval), len(w.events)))
+            target = self._pick_worker(exclude=busiest)
+            if target is None or not busiest.events:
+                return False
+            per_event = busiest.load(self.interval) / len(busiest.events)
+            if self._overloaded(busiest):
+                # Only worth it if the target stays below the busiest worker after the move
+                if target.load(self.interval) + per_event >= busiest.load(self.interval) - per_event:
+                    return False
+                reason = "overloaded"
+            elif len(busiest.events) - len(target.events) > 1 and not self._overloaded(target):
+                reason = "uneven"
+            else:
+                return False
+            event = self.events[sorted(busiest.events)[0]]
+            busiest.events.discard(event.event_id)
+            # Start the event on the new worker before releasing it on the old one, so there is no gap
+            self._assign(event, target)
+            self._send(busiest, {"type": "release", "event_id": event.event_id})
+            event.moves += 1
+            self.moves += 1
+            self.log(f"Moved event {event.event_id} from worker {busiest.worker_id} to {target.worker_id} ({reason})")
+            return True
+
+    def status(self):
+        """
+        Returns:
+            dict: Workers with their events and load, and events without a worker
+        """
+        with self._lock:
+            return {
+                "workers": [
+                    {
+                        "worker_id": w.worker_id,
+                        "address": f"{w.address[0]}:{w.address[1]}",
+                        "events": sorted(w.events),
+                        "slots": w.slots,
+                        "cycle_s": w.cycle_s,
+                        "load": w.load(self.interval),
+                        "skipped_cycles": w.skipped,
+                    }
+                    for w in self.workers if w.worker_id
+                ],
+                "unassigned": sorted(e.event_id for e in self.events.values() if e.worker is None),
+                "moves": self.moves,
+            }
+
+
+class _Uplink:
+    """
+    Stands in for a SnapshotStore on a worker: forwards changed markets to the coordinator
+
+    Markets equal to the last ones sent for an event are only noted as fresh,
+    for the next heartbeat.
+    """
+
+    def __init__(self, worker):
+        self.worker = worker
+        self._sent = {}
+        self._fresh = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event_id, data):
+        with self._lock:
+            self._fresh.add(event_id)
+            if self._sent.get(event_id) == data:
+                return
+            self._sent[event_id] = data
+        self.worker._send({"type": "markets", "event_id": event_id, "markets": data})
+
+    def remove(self, event_id):
+        with self._lock:
+            self._sent.pop(event_id, None)
+            self._fresh.discard(event_id)
+
+    def take_fresh(self):
+        """Events published since the last call"""
+        with self._lock:
+            fresh, self._fresh = self._fresh, set()
+        return sorted(fresh)
+
+
+class ClusterWorker:
+    """
+    Scrape the events a ClusterCoordinator assigns and stream the results back
+
+    Browser workers follow their events as tabs in a WatcherPool; with
+    use_selenium=False they poll them over HTTP with a ConcurrentFetcher.
+    The worker sends a heartbeat with its measured scrape time every
+    heartbeat_interval seconds and reconnects if the coordinator goes away
+    (dropping its events, which the coordinator reassigns meanwhile).
+    """
+
+    def __init__(self, coordinator, worker_id=None, interval=1, use_selenium=True, max_drivers=2,
+                 http_workers=8, max_events=None, scraper_options=None, heartbeat_interval=2,
+                 reconnect_delay=3, log=print):
+        """
+        Initialize the worker
+
+        Args:
+            coordinator (str): Coordinator address, "host:port"
+            worker_id (str): Name reported to the coordinator, random by default
+            interval (float): Seconds between two scrapes of the same event
+            use_selenium (bool): Scrape in Chrome tabs, or over plain HTTP
+            max_drivers (int): Chrome instances of a browser worker
+            http_workers (int): Parallel requests of an HTTP worker
+            max_events (int): Most events this worker accepts, None for no limit
+            scraper_options (dict): Extra TippmixProScraper arguments, e.g. extraction_mode
+            heartbeat_interval (float): Seconds between two status messages
+            reconnect_delay (float): Seconds to wait before reconnecting
+            log (callable): Function receiving log messages
+        """
+        from scraper_metrics import Metrics
+
+        self.address = parse_address(coordinator)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}"
+        self.interval = interval
+        self.use_selenium = use_selenium
+        self.max_drivers = max_drivers
+        self.http_workers = http_workers
+        self.max_events = max_events
+        self.scraper_options = dict(scraper_options or {})
+        self.metrics = self.scraper_options.get("metrics") or Metrics()
+        self.scraper_options["metrics"] = self.metrics
+        self.heartbeat_interval = heartbeat_interval
+        self.reconnect_delay = reconnect_delay
+        self.log = log
+        self.connection = None
+        self._uplink = None
+        self._backend = None
+        self._backend_stop = None
+        self._backend_thread = None
+
+    def _send(self, message):
+        connection = self.connection
+        if connection is None or connection.closed:
+            return
+        try:
+            connection.send(message)
+        except OSError:
+            pass
+
+    @property
+    def slots(self):
+        return self.max_drivers if self.use_selenium else self.http_workers
+
+    def _start_backend(self):
+        self._uplink = _Uplink(self)
+        if self.use_selenium:
+            from scraper_pool import WatcherPool
+            self._backend = WatcherPool(None, interval=self.interval, max_drivers=self.max_drivers, log=self.log,
+                                        store=self._uplink, scraper_options=self.scraper_options)
+            self._backend.start()
+        else:
+            from scraper_http import ConcurrentFetcher
+            self._backend = ConcurrentFetcher([], max_workers=self.http_workers,
+                                              parser_engine=self.scraper_options.get("parser_engine", "lxml"),
+                                              metrics=self.metrics)
+            self._backend_stop = threading.Event()
+            self._backend_thread = threading.Thread(
+                target=self._backend.run, args=(self.interval, self._uplink.publish, self._backend_stop),
+                daemon=True
+            )
+            self._backend_thread.start()
+
+    def _stop_backend(self):
+        if self._backend is None:
+            return
+        if self.use_selenium:
+            self._backend.stop()
+        else:
+            self._backend_stop.set()
+            self._backend_thread.join(timeout=self.interval + 15)
+            self._backend.close()
+        self._backend = None
+
+    def _events(self):
+        if self.use_selenium:
+            return list(self._backend.watchers)
+        return list(self._backend.scrapers)
+
+    def _assign(self, url):
+        try:
+            if self.use_selenium:
+                self._backend.add_event(url)
+            else:
+                self._backend.add_url(url)
+        except Exception as e:
+            self.log(f"Error opening event {url}: {e}")
+
+    def _release(self, event_id):
+        if self.use_selenium:
+            # The pool removes the event from the uplink like from any store
+            self._backend.remove_event(event_id)
+        else:
+            self._backend.remove_url(event_id)
+            self._uplink.remove(event_id)
+
+    def _cycle_s(self):
+        """Typical seconds per scrape of one event, from the worker's metrics"""
+        stages = self.metrics.summary()["stages"]
+        names = ("cycle",) if self.use_selenium else ("http", "parse")
+        total = sum(stages[name]["p50"] for name in names if name in stages)
+        return total / 1000 if total else None
+
+    def _skipped(self):
+        if self.use_selenium:
+            return sum(w.schedule.skipped for w in list(self._backend.watchers.values()))
+        return sum(s.skipped for s in list(self._backend.schedules.values()))
+
+    def _heartbeat(self, stop):
+        while not stop.wait(self.heartbeat_interval):
+            self._send({"type": "status", "events": self._events(), "fresh": self._uplink.take_fresh(),
+                        "cycle_s": self._cycle_s(), "skipped": self._skipped()})
+
+    def run(self, stop_event=None):
+        """
+        Serve the coordinator until stop_event is set or the coordinator says stop
+
+        Args:
+            stop_event (threading.Event): Stops the worker when set
+        """
+        stop_event = stop_event or threading.Event()
+        finished = threading.Event()
+        # A stop_event set from outside closes the connection to end the read loop
+        watcher = threading.Thread(target=self._close_on_stop, args=(stop_event, finished), daemon=True)
+        watcher.start()
+        try:
+            while not stop_event.is_set():
+                try:
+                    sock = socket.create_connection(self.address, timeout=10)
+                except OSError as e:
+                    self.log(f"Cannot reach coordinator {self.address[0]}:{self.address[1]}: {e}")
+                    stop_event.wait(self.reconnect_delay)
+                    continue
+                sock.settimeout(None)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self.connection = _Connection(sock)
+                if stop_event.is_set() or self._serve(stop_event):
+                    break
+                stop_event.wait(self.reconnect_delay)
+        finally:
+            finished.set()
+            watcher.join()
+            if self.connection is not None:
+                self.connection.close()
+
+    def _close_on_stop(self, stop_event, finished):
+        while not finished.is_set():
+            if stop_event.wait(0.5):
+                connection = self.connection
+                if connection is not None:
+                    connection.close()
+                return
+
+    def _serve(self, stop_event):
+        """
+        Run one coordinator session
+
+        Returns:
+            bool: True if the coordinator told the worker to stop
+        """
+        self.log(f"Connected to coordinator {self.address[0]}:{self.address[1]} as {self.worker_id}")
+        self._start_backend()
+        heartbeat_stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(heartbeat_stop,), daemon=True).start()
+        stopped = False
+        try:
+            self._send({"type": "hello", "worker_id": self.worker_id, "slots": self.slots,
+                        "max_events": self.max_events})
+            for message in self.connection.messages():
+                kind = message.get("type")
+                if kind == "assign":
+                    self._assign(message["url"])
+                elif kind == "release":
+                    self._release(message["event_id"])
+                elif kind == "stop":
+                    stopped = True
+                    break
+        finally:
+            heartbeat_stop.set()
+            self.connection.drain()
+            self.connection.close()
+            # The coordinator reassigns our events as soon as we are gone
+            self._stop_backend()
+        if not stopped and not stop_event.is_set():
+            self.log("Lost the coordinator, reconnecting")
+        return stopped or stop_event.is_set()
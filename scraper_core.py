@@ -1,16 +1,63 @@
-import requests
-import os
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.common.exceptions import TimeoutException, WebDriverException
+import time
+from scraper_browser import USER_AGENT, PAGE_READY_SCRIPT, launch_chrome, load_page, start_page_load
+from scraper_feed import FeedCapture
+from scraper_metrics import Metrics
+from scraper_model import MarketList, market_list
+from scraper_parsers import MarketCache, get_market_parser, market_classes
+from scraper_scripts import (MARKET_EXTRACTION_SCRIPT, INSTALL_OBSERVER_SCRIPT, DRAIN_CHANGES_SCRIPT,
+                             CONTAINER_HTML_SCRIPT, INCREMENTAL_SNAPSHOT_SCRIPT)
+# requests and selenium are imported lazily where they are used, so headless
+# deployments that never touch them don't pay for loading them at startup.
+
+def validate_event_url(url):
+    """
+    Check that a URL is a TippmixPro event URL the scraper can follow
+    
+    Args:
+        url (str): URL to check
+        
+    Returns:
+        str: Error message, or None if the URL is valid
+    """
+    url = url.strip()
+    if not url:
+        return "Please enter a website URL"
+    if not (url.endswith('/all') or url.endswith('/all/')):
+        return "URL must end with '/all' or '/all/'"
+    if not (url.startswith('https://tippmixpro') or url.startswith('https://www.tippmixpro')):
+        return "URL must be a valid TippmixPro url."
+    return None
+
+def create_http_session(pool_size=10):
+    """
+    Create an HTTP session with keep-alive connection pooling and compression
+    
+    Args:
+        pool_size (int): Connections kept open per host
+        
+    Returns:
+        requests.Session: The configured session
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    from urllib3.util.request import ACCEPT_ENCODING
+    
+    session = requests.Session()
+    retries = Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # Setup session headers; ACCEPT_ENCODING includes br when a brotli decoder is installed
+    session.headers.update({
+        'User-Agent': USER_AGENT,
+        'Accept-Encoding': ACCEPT_ENCODING,
+    })
+    return session
 
 class WebScraper:
-    def __init__(self, use_selenium=False, timeout=30, dynamic_wait_timeout=5):
+    def __init__(self, use_selenium=False, timeout=30, dynamic_wait_timeout=5, driver_manager=None,
+                 resource_policy=None, session=None, http_pool_size=10, metrics=None):
         """
         Initialize the web scraper
         
@@ -18,62 +65,110 @@ class WebScraper:
             use_selenium (bool): Whether to use Selenium for JavaScript-heavy pages
             timeout (int): Timeout for requests in seconds
             dynamic_wait_timeout (int): Timeout for waiting for dynamic elements
+            driver_manager (DriverManager): Keeps browsers warm between pages, optional
+            resource_policy (ResourcePolicy): Lean page loading for browsers launched by
+                this scraper (a driver_manager brings its own), optional
+            session (requests.Session): HTTP session to share with other scrapers, optional
+            http_pool_size (int): Keep-alive connections per host of a session created here
+            metrics (Metrics): Collector for stage timings and counters, optional
         """
         self.use_selenium = use_selenium
         self.timeout = timeout
         self.dynamic_wait_timeout = dynamic_wait_timeout
-        self.session = requests.Session()
+        self._session = session
+        self.http_pool_size = http_pool_size
+        self.metrics = metrics or Metrics()
         self.driver = None
+        self.driver_manager = driver_manager
+        self.resource_policy = resource_policy
+        self.last_page_load = None
+        self.replacement_tab = None
+        self.capture_network = False
+        self.owns_driver = True
+        self.window_handle = None
         
         # Keep-alive scraping variables
         self.current_url = None
+        self.current_content = None
         self.is_page_open = False
         
-        # Setup session headers
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        # Validators of the last HTTP responses, for conditional requests
+        self._http_cache = {}
+    
+    @property
+    def session(self):
+        """HTTP session, created on first use"""
+        if self._session is None:
+            self._session = create_http_session(self.http_pool_size)
+        return self._session
+    
+    def fetch(self, url):
+        """
+        GET a URL over the pooled HTTP session, revalidating the previous response
+        
+        The ETag and Last-Modified of the last response are sent back as
+        If-None-Match/If-Modified-Since, so unchanged pages cost a 304 without a body.
+        
+        Args:
+            url (str): URL to fetch
+            
+        Returns:
+            tuple: (content, changed) where changed is False if the server answered 304
+        """
+        headers = {}
+        cached = self._http_cache.get(url)
+        if cached:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+        
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and cached:
+            return cached["content"], False
+        response.raise_for_status()
+        
+        self._http_cache[url] = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content": response.text,
+        }
+        return response.text, True
     
     def _setup_selenium_driver(self):
         """Setup Selenium WebDriver with Chrome options"""
         try:
-            chrome_options = Options()
-            chrome_options.add_argument("--headless")  # Run in background - DISABLED FOR DEBUGGING
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--window-size=1200,900")
-            chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-            chrome_options.add_argument("--disable-speech-api")
-            chrome_options.add_argument("--disable-speech-synthesis-api")
-            chrome_options.add_argument("--disable-voice-transcription")
-            # Add these Chrome options
-            chrome_options.add_argument("--silent")
-            chrome_options.add_argument("--disable-logging")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_experimental_option("excludeSwitches", ["enable-logging"])
-            chrome_options.add_experimental_option('useAutomationExtension', False)
-
-            # And use Service with null output
-            service = Service(log_output=os.devnull)
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
-            
-            # Try to create driver without specifying service first
-            try:
-                self.driver = webdriver.Chrome(options=chrome_options)
-            except WebDriverException:
-                # If that fails, try with service
-                service = Service(log_output=os.devnull)  # Redirect logs to null
-                self.driver = webdriver.Chrome(service=service, options=chrome_options)
-            
-            self.driver.set_page_load_timeout(self.timeout)
+            if self.driver_manager:
+                # Reuse a warm browser instead of paying the cold-start
+                self.driver = self.driver_manager.acquire()
+            else:
+                self.driver = launch_chrome(self.timeout, self.resource_policy, self.capture_network)
             return True
             
         except Exception as e:
             print(f"Error setting up Selenium driver: {e}")
             return False
     
+    def attach_to_driver(self, driver, new_tab=True):
+        """
+        Share an already running driver with other scrapers, using a tab of our own
+        
+        Args:
+            driver: Running Selenium WebDriver owned by someone else
+            new_tab (bool): Open a fresh tab, or take over the currently active one
+        """
+        self.driver = driver
+        self.owns_driver = False
+        self.replacement_tab = None
+        if new_tab:
+            driver.switch_to.new_window('tab')
+        self.window_handle = driver.current_window_handle
+    
+    def activate_window(self):
+        """Switch the driver to this scraper's tab when the driver is shared"""
+        if self.driver and self.window_handle:
+            self.driver.switch_to.window(self.window_handle)
+    
     def open_page(self, url):
         """
         Open a page and keep it open for keep-alive scraping
@@ -92,9 +187,18 @@ class WebScraper:
         
         if self.use_selenium:
             self._open_page_with_selenium(self.current_url)
+        else:
+            self._open_page_with_http(self.current_url)
         
         self.is_page_open = True
     
+    def _open_page_with_http(self, url):
+        """Open page with a plain HTTP request (for server-rendered content)"""
+        try:
+            self.current_content, _ = self.fetch(url)
+        except Exception as e:
+            raise Exception(f"Error opening page over HTTP: {e}")
+    
     def _open_page_with_selenium(self, url):
         """Open page using Selenium (for dynamic content)"""
         try:
@@ -102,10 +206,11 @@ class WebScraper:
                 if not self._setup_selenium_driver():
                     raise Exception("Failed to setup Selenium driver")
             
-            self.driver.get(url)
-            #time.sleep(2)  # Wait for page to load
-
-            self.current_content = self.driver.page_source
+            self.activate_window()
+            if self.driver_manager:
+                self.last_page_load = self.driver_manager.navigate(self.driver, url)
+            else:
+                self.last_page_load = load_page(self.driver, url, self.resource_policy)
             
         except Exception as e:
             raise Exception(f"Error opening page with Selenium: {e}")
@@ -116,12 +221,173 @@ class WebScraper:
         self.current_url = None
         self.current_content = None
         
-        if self.driver:
+        if self.driver and not self.owns_driver:
+            # Shared driver: only close our own tab, the owner quits the browser
+            try:
+                if self.window_handle:
+                    self.driver.switch_to.window(self.window_handle)
+                    self.driver.close()
+                    # Don't leave the shared driver pointing at the closed window
+                    handles = self.driver.window_handles
+                    if handles:
+                        self.driver.switch_to.window(handles[0])
+            except:
+                pass
+            self.driver = None
+            self.window_handle = None
+            self.owns_driver = True
+        elif self.driver and self.driver_manager:
+            # Keep the browser warm for the next start
+            self.driver_manager.release(self.driver)
+            self.driver = None
+            self.window_handle = None
+        elif self.driver:
             try:
                 self.driver.quit()
             except:
                 pass
             self.driver = None
+            self.window_handle = None
+    
+    def park_page(self):
+        """
+        Leave our tab on a shared driver open but on about:blank, and detach from it
+
+        Used for the last tab of a shared driver: closing it would end the
+        browser session, while a live page left behind keeps running its
+        scripts. The next scraper attaching without a new tab takes it over.
+        """
+        if not self.driver or self.owns_driver:
+            self.close_page()
+            return
+        self.discard_replacement_tab()
+        self.reset_page_state()
+        self.is_page_open = False
+        self.current_url = None
+        self.current_content = None
+        try:
+            if self.window_handle:
+                self.driver.switch_to.window(self.window_handle)
+            self.driver.get("about:blank")
+        except Exception:
+            pass
+        self.driver = None
+        self.window_handle = None
+        self.owns_driver = True
+
+    def reset_page_state(self):
+        """Forget state tied to the loaded document, e.g. after a reload"""
+        pass
+    
+    def reload_page(self):
+        """Soft recovery: load the current URL again in the same tab"""
+        self.discard_replacement_tab()
+        self.reset_page_state()
+        self._open_page_with_selenium(self.current_url)
+    
+    def reopen_in_new_tab(self):
+        """Recovery from a crashed or hung renderer: replace our tab with a fresh one"""
+        self.discard_replacement_tab()
+        old_handle = self.window_handle or self.driver.current_window_handle
+        self.driver.switch_to.new_window('tab')
+        new_handle = self.driver.current_window_handle
+        try:
+            self.driver.switch_to.window(old_handle)
+            self.driver.close()
+        except Exception:
+            # The crashed tab may already be gone
+            pass
+        self.driver.switch_to.window(new_handle)
+        self.window_handle = new_handle
+        self.reset_page_state()
+        self._open_page_with_selenium(self.current_url)
+    
+    def discard_driver(self):
+        """Quit our (hung or crashed) browser instead of keeping it warm"""
+        if self.driver and self.driver_manager:
+            self.driver_manager.discard(self.driver)
+        elif self.driver:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+        self.driver = None
+        self.window_handle = None
+        # Preloaded tabs went away with the browser
+        self.replacement_tab = None
+    
+    def preload_replacement_tab(self):
+        """
+        Start loading the current URL in a new tab of our driver, without waiting for it
+        
+        Our own tab stays active and can be scraped while the replacement loads.
+        The handle is kept in replacement_tab until the tab is adopted or
+        discarded; reloading or reopening our page discards it.
+        
+        Returns:
+            str: Window handle of the replacement tab
+        """
+        self.discard_replacement_tab()
+        current = self.window_handle or self.driver.current_window_handle
+        self.driver.switch_to.new_window('tab')
+        handle = self.driver.current_window_handle
+        self.replacement_tab = handle
+        policy = self.driver_manager.resource_policy if self.driver_manager else self.resource_policy
+        try:
+            start_page_load(self.driver, self.current_url, policy)
+        finally:
+            self.driver.switch_to.window(current)
+        return handle
+    
+    def discard_replacement_tab(self):
+        """Close a replacement tab that is still preloading, if any"""
+        if self.replacement_tab is None:
+            return
+        try:
+            self.discard_tab(self.replacement_tab)
+        except Exception:
+            # The tab may already be gone
+            pass
+    
+    def replacement_tab_ready(self, handle):
+        """True once a preloaded tab has rendered its markets"""
+        current = self.window_handle or self.driver.current_window_handle
+        policy = self.driver_manager.resource_policy if self.driver_manager else self.resource_policy
+        selector = policy.ready_selector if policy and policy.ready_selector else "article"
+        self.driver.switch_to.window(handle)
+        try:
+            return bool(self.driver.execute_script(PAGE_READY_SCRIPT, selector))
+        finally:
+            self.driver.switch_to.window(current)
+    
+    def adopt_replacement_tab(self, handle):
+        """Close our tab and continue in a preloaded one"""
+        old_handle = self.window_handle or self.driver.current_window_handle
+        self.driver.switch_to.window(old_handle)
+        self.driver.close()
+        self.driver.switch_to.window(handle)
+        self.window_handle = handle
+        self.replacement_tab = None
+        self.reset_page_state()
+    
+    def discard_tab(self, handle):
+        """Close a preloaded tab that is not needed after all"""
+        if handle == self.replacement_tab:
+            self.replacement_tab = None
+        current = self.window_handle or self.driver.current_window_handle
+        try:
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+        finally:
+            self.driver.switch_to.window(current)
+    
+    def relaunch_browser(self):
+        """Last-resort recovery: quit the browser and load the page in a new one"""
+        if not self.owns_driver:
+            raise Exception("A shared driver can only be relaunched by its owner")
+        self.discard_driver()
+        self.reset_page_state()
+        self._open_page_with_selenium(self.current_url)
 
 class TippmixProScraper(WebScraper):
     """
@@ -129,6 +395,55 @@ class TippmixProScraper(WebScraper):
     Extracts market titles from .MarketGroupsItem children
     """
     
+    EXTRACTION_MODES = ("html", "script", "feed")
+    
+    def __init__(self, *args, extraction_mode="html", parser_engine="lxml", feed_decoder=None,
+                 feed_url_pattern=None, feed_reseed_interval=60, incremental=True, market_container=None,
+                 recorder=None, **kwargs):
+        """
+        Initialize the TippmixPro scraper
+        
+        Args:
+            extraction_mode (str): "html" parses the body innerHTML in Python,
+                "script" extracts the markets inside the page and returns only the result,
+                "feed" keeps the markets up to date from the page's own network feed
+            parser_engine (str): "lxml" (default) or "bs4" for the html extraction mode
+            feed_decoder (FeedDecoder): Decoder for the feed mode's messages
+            feed_url_pattern (str): Regex selecting the XHR/fetch URLs of the feed
+            feed_reseed_interval (float): Seconds between full DOM snapshots that correct
+                feed drift, None to seed only once per page
+            incremental (bool): In html mode, transfer and parse only the market articles
+                that changed since the last cycle
+            market_container (str): CSS selector of the element holding the markets,
+                None to use the closest common ancestor of the market articles
+            recorder (SnapshotRecorder): Record every raw HTML snapshot (html and HTTP modes);
+                recording transfers the whole market container each cycle
+        """
+        super().__init__(*args, **kwargs)
+        if extraction_mode not in self.EXTRACTION_MODES:
+            raise ValueError(f"Unknown extraction mode: {extraction_mode}")
+        self.extraction_mode = extraction_mode
+        self.parser_engine = parser_engine
+        self._market_parser = None
+        self.incremental = incremental
+        self.market_container = market_container
+        self._market_cache = None
+        self.recorder = recorder
+        
+        # Push mode state: last full snapshot that observed changes are merged into
+        self._push_markets = None
+        
+        # HTTP mode: markets parsed from the last 200 response
+        self._http_markets = None
+        
+        # Feed mode state
+        self.feed_decoder = feed_decoder
+        self.feed_url_pattern = feed_url_pattern
+        self.feed_reseed_interval = feed_reseed_interval
+        self.feed = None
+        self._feed_seeded_at = None
+        self.capture_network = extraction_mode == "feed"
+    
     def convert_tippmixpro_url(self, original_url):
         """
         Convert TippmixPro URLs from www.tippmixpro.hu to sports2.tippmixpro.hu
@@ -162,74 +477,289 @@ class TippmixProScraper(WebScraper):
             return original_url
 
     def get_market_id(self, article_soup):
-        classes = article_soup.get("class", [])
-        for cls in classes:
-            if cls.startswith("Market--Id-"):
-                return cls.replace("Market--Id-", "")
-        return None
+        return market_classes(article_soup.get("class", []))[0]
 
     def get_market_part(self, article_soup):
-        classes = article_soup.get("class", [])
-        for cls in classes:
-            if cls.startswith("Market--Part-"):
-                return cls.replace("Market--Part-", "")
-        return None
+        return market_classes(article_soup.get("class", []))[1]
 
+    @property
+    def market_parser(self):
+        """Parser engine for the html extraction mode, created on first use"""
+        if self._market_parser is None:
+            self._market_parser = get_market_parser(self.parser_engine)
+        return self._market_parser
 
-    def scrape_market_titles(self):
-        print("-------------Scraping market titles---------")
-        try:
-            # wait for the main container
+    @property
+    def market_cache(self):
+        """Per-market parse cache of the incremental html extraction"""
+        if self._market_cache is None:
+            self._market_cache = MarketCache(self.market_parser)
+        return self._market_cache
+
+    def parse_market_html(self, html_snapshot):
+        """
+        Parse the markets out of an HTML snapshot of the page
+        
+        Args:
+            html_snapshot (str): innerHTML of the market container or page body
+            
+        Returns:
+            list: Market dicts with market_id, market_part, legend and outcomes
+        """
+        with self.metrics.span("parse"):
+            return self.market_parser.parse(html_snapshot)
+
+    def _extract_markets_with_script(self):
+        """Run the market extraction inside the page and return the compact result"""
+        with self.metrics.span("script"):
+            return self.driver.execute_script(MARKET_EXTRACTION_SCRIPT)
+
+    def _extract_markets_with_html(self):
+        """Ship the market HTML over the wire and parse it in Python"""
+        # A recording needs whole snapshots, not just the changed articles
+        if self.incremental and self.recorder is None:
+            return self._extract_markets_incrementally()
+
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        
+        # wait for the main container
+        with self.metrics.span("wait"):
             element = WebDriverWait(self.driver, timeout=10).until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, "body"))
             )
 
-            # take a snapshot of the HTML
-            html_snapshot = element.get_attribute("innerHTML")
-            soup = BeautifulSoup(html_snapshot, "html.parser")
-
-            bet_list = []
-
-            # find all <article> elements in the snapshot
-            articles = soup.select("article")
-            #print(len(articles))
-
-            for article in articles:
-                # get legend text safely
-                legend_tag = article.select_one(".Market__Legend")
-                legend_text = legend_tag.get_text(strip=True) if legend_tag else ""
-                #print(legend_text)
-
-                outcomes_list = []
-                outcome_tags = article.select(".Market__OddsGroupItem")
-
-                for outcome in outcome_tags:
-                    text_tag = outcome.select_one(".OddsButton__Text")
-                    odds_tag = outcome.select_one(".OddsButton__Odds")
-                    if text_tag and odds_tag:
-                        outcomes_list.append({
-                            "text": text_tag.get_text(strip=True),
-                            "odds": odds_tag.get_text(strip=True)
-                        })
-
-                if outcomes_list:
-                    bet_list.append({
-                        "market_id": self.get_market_id(article),  # will need a BeautifulSoup-compatible version
-                        "market_part": self.get_market_part(article),  # same here
-                        "legend": legend_text,
-                        "outcomes": outcomes_list
-                    })
-                    print(bet_list[-1])
+        # take a snapshot of the market container's HTML
+        with self.metrics.span("transfer"):
+            html_snapshot = self.driver.execute_script(CONTAINER_HTML_SCRIPT, self.market_container)
+        self._record(html_snapshot)
+        return self.parse_market_html(html_snapshot)
+
+    def _extract_markets_incrementally(self):
+        """Ship only the changed market articles and parse just those"""
+        cache = self.market_cache
+        with self.metrics.span("transfer"):
+            articles = self.driver.execute_script(INCREMENTAL_SNAPSHOT_SCRIPT, self.market_container,
+                                                  cache.fingerprints())
+        with self.metrics.span("parse"):
+            return cache.update(articles)
+
+    def _extract_markets_from_feed(self):
+        """Serve the markets from the feed-driven market table, seeding it from the DOM"""
+        if self.feed is None or self.feed.driver is not self.driver:
+            self.feed = FeedCapture(self.driver, self.window_handle, self.feed_decoder, self.feed_url_pattern)
+            self._feed_seeded_at = None
+
+        reseed_due = self._feed_seeded_at is None or (
+            self.feed_reseed_interval is not None
+            and time.monotonic() - self._feed_seeded_at >= self.feed_reseed_interval
+        )
+        # Drain first, so messages older than the DOM snapshot don't overwrite it
+        with self.metrics.span("feed"):
+            self.feed.poll()
+        # A tab that fell behind its feed backlog has missed messages
+        if reseed_due or not self.feed.seeded:
+            markets = self._extract_markets_with_script()
+            if markets is None:
+                return None
+            self.feed.seed(markets)
+            self._feed_seeded_at = time.monotonic()
+        return self.feed.table.snapshot()
+
+    def _extract_markets_with_http(self):
+        """Re-fetch the page over HTTP and parse it, reusing the last result on a 304"""
+        with self.metrics.span("http"):
+            content, changed = self.fetch(self.current_url)
+        self.current_content = content
+        if changed or self._http_markets is None:
+            self._record(content)
+            self._http_markets = self.parse_market_html(content)
+        return self._http_markets
+    
+    def _record(self, html_snapshot):
+        """Hand a raw snapshot to the recorder, if recording"""
+        if self.recorder is not None:
+            self.recorder.record(self.current_url, html_snapshot)
+
+    def capture_snapshot(self):
+        """
+        Capture the raw market HTML without parsing it, for a ParsePipeline
+        
+        Returns:
+            tuple: (html, changed), changed is False when an HTTP revalidation
+                returned 304 and the last parsed markets still apply
+        """
+        self.activate_window()
+        if not self.use_selenium:
+            with self.metrics.span("http"):
+                content, changed = self.fetch(self.current_url)
+            self.current_content = content
+            changed = changed or self._http_markets is None
+            if changed:
+                self._record(content)
+            return content, changed
+        with self.metrics.span("transfer"):
+            html_snapshot = self.driver.execute_script(CONTAINER_HTML_SCRIPT, self.market_container)
+        self._record(html_snapshot)
+        return html_snapshot, True
+
+    def scrape_market_titles(self):
+        from selenium.common.exceptions import TimeoutException
+        
+        cycle_start = time.perf_counter()
+        try:
+            self.activate_window()
+
+            if not self.use_selenium:
+                bet_list = self._extract_markets_with_http()
+            elif self.extraction_mode == "script":
+                bet_list = self._extract_markets_with_script()
+            elif self.extraction_mode == "feed":
+                bet_list = self._extract_markets_from_feed()
+            else:
+                bet_list = self._extract_markets_with_html()
+
+            self.metrics.observe("cycle", time.perf_counter() - cycle_start)
+            if bet_list is None:
+                return None
 
+            # Script, feed and push results arrive as plain lists
+            bet_list = market_list(bet_list)
+            self.metrics.record_markets(bet_list)
             return bet_list
 
         except TimeoutException as e:
+            self.metrics.inc("timeouts")
             print(f"Error in scrape_market_titles_snapshot: {e}")
             return None
+        except Exception:
+            self.metrics.inc("errors")
+            raise
+
+    def install_change_observer(self, container_selector=None):
+        """
+        Install a MutationObserver that buffers changed market articles in the page
+        
+        Args:
+            container_selector (str): CSS selector of the element holding the markets,
+                defaults to market_container or the page body
+            
+        Returns:
+            bool: True if a new observer was installed
+        """
+        self.activate_window()
+        return self.driver.execute_script(INSTALL_OBSERVER_SCRIPT,
+                                          container_selector or self.market_container or "body")
+
+    def wait_for_market_changes(self, timeout=1.0):
+        """
+        Block until the page reports changed markets, then return the full market list
+        
+        The first call (and any call after the page lost its observer, e.g. on reload)
+        installs the observer and returns a full snapshot. Later calls only extract the
+        changed articles in the page and merge them into the previous snapshot.
+        
+        Args:
+            timeout (float): Seconds to wait for a change
+            
+        Returns:
+            list: Updated market dicts, or None if nothing changed within the timeout
+        """
+        self.activate_window()
+        if self._push_markets is not None:
+            self.driver.set_script_timeout(timeout + self.dynamic_wait_timeout)
+            result = self.driver.execute_async_script(DRAIN_CHANGES_SCRIPT, int(timeout * 1000))
+            if result is not None and not result["structural"]:
+                if not result["changes"]:
+                    return None
+                if self._merge_market_changes(result["changes"]):
+                    return MarketList(self._push_markets)
+
+        # No observer yet, page reloaded, or markets were added/removed: full snapshot
+        self.install_change_observer()
+        markets = self._extract_markets_with_script()
+        self._push_markets = markets
+        return MarketList(markets) if markets is not None else None
+
+    def _merge_market_changes(self, changes):
+        """
+        Merge changed markets into the previous snapshot in place
+        
+        Returns:
+            bool: False if a change cannot be placed and a full snapshot is needed
+        """
+        positions = {
+            (market["market_id"], market["market_part"]): index
+            for index, market in enumerate(self._push_markets)
+        }
+        removed = set()
+        for change in changes:
+            key = (change["market_id"], change["market_part"])
+            if key not in positions:
+                # A market gained its first outcomes: its place in the list is unknown
+                if change["market"] is not None:
+                    return False
+                continue
+            if change["market"] is None:
+                removed.add(positions[key])
+            else:
+                self._push_markets[positions[key]] = change["market"]
+        if removed:
+            self._push_markets = [m for i, m in enumerate(self._push_markets) if i not in removed]
+        return True
+
+    def reset_page_state(self):
+        """Forget the push mode snapshot, parse cache and feed state of the loaded page"""
+        self._push_markets = None
+        self._http_markets = None
+        if self._market_cache is not None:
+            self._market_cache.clear()
+        if self.feed is not None:
+            self.feed.close()
+        self.feed = None
+
+    def close_page(self):
+        """Close the page and forget its per-page state"""
+        self.reset_page_state()
+        super().close_page()
+
+    def replacement_tab_ready(self, handle):
+        """
+        True once a preloaded tab yields markets
+        
+        Runs the extraction of our mode on the replacement tab (a full, uncached
+        html snapshot in html mode, the in-page extraction otherwise), so the
+        scraper only switches to a tab it can actually read markets from.
+        """
+        current = self.window_handle or self.driver.current_window_handle
+        self.driver.switch_to.window(handle)
+        try:
+            if self.extraction_mode == "html":
+                html_snapshot = self.driver.execute_script(CONTAINER_HTML_SCRIPT, self.market_container)
+                markets = self.market_parser.parse(html_snapshot)
+            else:
+                markets = self.driver.execute_script(MARKET_EXTRACTION_SCRIPT)
+            return bool(markets)
+        finally:
+            self.driver.switch_to.window(current)
+
+    def check_script_extraction(self):
+        """
+        Compare the in-page extraction with the Python parser on the open page
+        
+        Useful on saved HTML fixtures opened via a file:// URL.
+        
+        Returns:
+            bool: True if both extraction modes return identical markets
+        """
+        self.activate_window()
+        return self._extract_markets_with_script() == self._extract_markets_with_html()
 
     
     def close(self):
         """Close the scraper and clean up resources"""
         self.close_page()
-        if self.session:
-            self.session.close()
\ No newline at end of file
+        if self._session:
+            self._session.close()
+            self._session = None
\ No newline at end of file
@@ -0,0 +1,201 @@
+import copy
+import re
+import threading
+import time
+from urllib.parse import urljoin
+from scraper_core import TippmixProScraper
+from scraper_pool import event_id_from_url
+from scraper_scripts import LIST_LINKS_SCRIPT
+
+LIVE_EVENTS_URL = "https://www.tippmixpro.hu/hu/elo/i/elo-esemenyek"
+
+_HREF_RE = re.compile(r'href\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
+# Event pages end with the long numeric event id, optionally followed by /all
+_EVENT_PATH_RE = re.compile(r'/\d{6,}(/all)?/?$')
+
+
+def event_urls_from_links(links, converter):
+    """
+    Turn the links of the live listing into event /all URLs, one per event
+
+    Args:
+        links (iterable): Absolute link URLs
+        converter (callable): URL converter, TippmixProScraper.convert_tippmixpro_url
+
+    Returns:
+        dict: Event id -> /all URL, in listing order
+    """
+    events = {}
+    for link in links:
+        path = link.split('#', 1)[0].split('?', 1)[0]
+        if 'tippmixpro' not in path or not _EVENT_PATH_RE.search(path):
+            continue
+        path = path.rstrip('/')
+        if not path.endswith('/all'):
+            path += '/all'
+        event_id = event_id_from_url(path)
+        if event_id and event_id not in events:
+            events[event_id] = converter(path)
+    return events
+
+
+def links_from_html(html, base_url):
+    """Absolute href targets of a server-rendered page"""
+    return [urljoin(base_url, href) for href in _HREF_RE.findall(html or "")]
+
+
+class LiveEventDiscovery:
+    """
+    Keep a WatcherPool following exactly the events that are live
+
+    Every interval seconds the live-events listing is scraped for event links.
+    Events that appear are added to the pool (up to max_events), events that
+    left the listing for missing_cycles discoveries in a row are removed, and
+    so are events whose page yielded no markets for empty_timeout seconds.
+    An event retired for yielding no markets is only retried after
+    retry_after seconds, even if the listing still shows it.
+    """
+
+    def __init__(self, pool, listing_url=LIVE_EVENTS_URL, interval=30, max_events=None,
+                 missing_cycles=2, empty_timeout=120, retry_after=600, use_selenium=True,
+                 scraper_options=None, log=print):
+        """
+        Initialize the discovery
+
+        Args:
+            pool (WatcherPool): Pool the watchers are started in and stopped from
+            listing_url (str): Live-events listing page
+            interval (float): Seconds between two scrapes of the listing
+            max_events (int): Most events followed at once, None for no limit
+            missing_cycles (int): Discoveries an event must be missing from the listing before it is retired
+            empty_timeout (float): Seconds without markets after which an event is retired
+            retry_after (float): Seconds before an event retired for lack of markets is tried again
+            use_selenium (bool): Render the listing in Chrome, False for a plain HTTP fetch
+            scraper_options (dict): Extra TippmixProScraper arguments for the listing scraper
+            log (callable): Function receiving log messages
+        """
+        self.pool = pool
+        self.listing_url = listing_url
+        self.interval = interval
+        self.max_events = max_events
+        self.missing_cycles = missing_cycles
+        self.empty_timeout = empty_timeout
+        self.retry_after = retry_after
+        self.log = log
+        options = dict(scraper_options or {})
+        if options.get("resource_policy"):
+            # The listing has event links, not market articles
+            options["resource_policy"] = copy.copy(options["resource_policy"])
+            options["resource_policy"].ready_selector = "a[href]"
+        self.scraper = TippmixProScraper(use_selenium=use_selenium, **options)
+        self.live = {}
+        self.started = 0
+        self.retired = 0
+        self._missing = {}
+        self._retired_empty = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def listing_links(self):
+        """
+        Scrape the listing page
+
+        Returns:
+            list: Absolute URLs of every link on the listing
+        """
+        if not self.scraper.is_page_open:
+            self.scraper.open_page(self.listing_url)
+        if not self.scraper.use_selenium:
+            content, _ = self.scraper.fetch(self.scraper.current_url)
+            return links_from_html(content, self.scraper.current_url)
+        self.scraper.activate_window()
+        links = self.scraper.driver.execute_script(LIST_LINKS_SCRIPT) or []
+        if not links:
+            # Listing never rendered or the app lost its state: load it again
+            self.scraper.open_page(self.listing_url)
+            links = self.scraper.driver.execute_script(LIST_LINKS_SCRIPT) or []
+        return links
+
+    def discover_once(self):
+        """
+        Scrape the listing once and start and stop watchers to match it
+
+        A listing without a single event link is taken for a failed scrape
+        (the page did not render or its layout changed), not for a day without
+        live events, and leaves the watchers alone.
+
+        Returns:
+            tuple: (started event ids, retired event ids)
+        """
+        live = event_urls_from_links(self.listing_links(), self.scraper.convert_tippmixpro_url)
+        if not live:
+            self.log("Live listing yielded no event links, keeping the followed events")
+            return [], []
+        self.live = live
+        now = time.monotonic()
+        started, retired = [], []
+
+        for event_id, watcher in list(self.pool.watchers.items()):
+            if event_id in self.live:
+                self._missing.pop(event_id, None)
+            else:
+                self._missing[event_id] = self._missing.get(event_id, 0) + 1
+                if self._missing[event_id] >= self.missing_cycles:
+                    self._retire(event_id, "left the live listing")
+                    retired.append(event_id)
+                    continue
+            last_markets = watcher.last_markets_at or watcher.started_at
+            if now - last_markets >= self.empty_timeout:
+                self._retire(event_id, f"no markets for {self.empty_timeout:.0f}s")
+                self._retired_empty[event_id] = now
+                retired.append(event_id)
+
+        for event_id in [e for e, at in self._retired_empty.items()
+                         if e not in self.live or now - at >= self.retry_after]:
+            del self._retired_empty[event_id]
+
+        for event_id, url in self.live.items():
+            if event_id in self.pool.watchers or event_id in self._retired_empty:
+                continue
+            if self.max_events is not None and len(self.pool.watchers) >= self.max_events:
+                break
+            try:
+                self.pool.add_event(url)
+                self.started += 1
+                started.append(event_id)
+            except Exception as e:
+                self.log(f"Error opening discovered event {event_id}: {e}")
+        return started, retired
+
+    def _retire(self, event_id, reason):
+        self.pool.remove_event(event_id)
+        self._missing.pop(event_id, None)
+        self.retired += 1
+        self.log(f"Retired event {event_id}: {reason}")
+
+    def start(self):
+        """Run discover_once every interval seconds on a background thread"""
+        if self._thread:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def _worker(self):
+        while not self._stop_event.is_set():
+            try:
+                started, retired = self.discover_once()
+                if started or retired:
+                    self.log(f"Discovery: {len(self.live)} live, {len(started)} started, "
+                             f"{len(retired)} retired, {len(self.pool.watchers)} followed")
+            except Exception as e:
+                self.log(f"Error discovering live events: {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        """Stop discovering and close the listing page (watchers keep running)"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 15)
+            self._thread = None
+        self.scraper.close()
@@ -0,0 +1,410 @@
+import json
+import re
+import threading
+import weakref
+from collections import OrderedDict, deque
+from scraper_model import MarketList
+
+
+class FeedDecoder:
+    """
+    Turns raw feed messages (WebSocket frames or XHR bodies) into market updates
+
+    decode() returns a list of updates, each one of:
+        {"type": "market", "market": {market_id, market_part, legend, outcomes}}
+        {"type": "odds", "market_id": .., "market_part": .., "text": .., "odds": ..}
+        {"type": "remove", "market_id": .., "market_part": ..}
+
+    The base implementation understands messages that already carry markets
+    in the scraper's output schema, which is also what the offline stand-in
+    feeds replay. Subclass it to map the site's own message format.
+    """
+
+    def decode(self, payload):
+        """
+        Args:
+            payload (str): Message text
+
+        Returns:
+            list: Market updates, empty for messages that carry no odds
+        """
+        try:
+            message = json.loads(payload)
+        except (TypeError, ValueError):
+            return []
+        if isinstance(message, list):
+            return [update for item in message for update in self._decode_message(item)]
+        return self._decode_message(message)
+
+    def _decode_message(self, message):
+        if not isinstance(message, dict):
+            return []
+        updates = []
+        for market in message.get("markets", []):
+            if "market_id" in market and "outcomes" in market:
+                updates.append({"type": "market", "market": {
+                    "market_id": market["market_id"],
+                    "market_part": market.get("market_part"),
+                    "legend": market.get("legend", ""),
+                    "outcomes": [{"text": o["text"], "odds": o["odds"]} for o in market["outcomes"]],
+                }})
+        for odds in message.get("odds", []):
+            updates.append(dict(odds, type="odds"))
+        for removed in message.get("removed", []):
+            updates.append({"type": "remove", "market_id": removed["market_id"],
+                            "market_part": removed.get("market_part")})
+        return updates
+
+
+class SelectionFeedDecoder(FeedDecoder):
+    """
+    Decoder for sportsbook push frames that identify outcomes by selection id
+
+    Unlike the output schema, such a feed sends whole markets only when they
+    (re)appear and afterwards only price changes of single selections:
+
+        {"type": "markets", "markets": [{"id": 123, "part": 1, "name": "Match Winner",
+            "selections": [{"id": 1230, "name": "Team A", "odds": 1.85, "status": "open"}]}]}
+        {"type": "odds", "changes": [{"selectionId": 1230, "odds": 1.9, "status": "open"}]}
+        {"type": "marketRemoved", "marketId": 123, "part": 1}
+
+    Selection ids are mapped back to their market and outcome text from the
+    market frames seen before; changes of selections not seen yet are
+    counted in unknown_selections and left to the next reseed. Numeric odds
+    are formatted like the page shows them, and selections that are not
+    open come out as suspended. Socket.IO/Engine.IO packet prefixes (e.g.
+    42["odds", {...}]) are stripped. The field names are class attributes,
+    so a subclass can map a variant of the format. Messages without a
+    "type" are decoded by FeedDecoder.
+    """
+
+    MARKET_FIELDS = {"id": "id", "part": "part", "legend": "name", "selections": "selections"}
+    SELECTION_FIELDS = {"id": "id", "text": "name", "odds": "odds", "status": "status"}
+    CHANGE_FIELDS = {"id": "selectionId", "odds": "odds", "status": "status"}
+    OPEN_STATUSES = ("open", "active", None)
+    ODDS_FORMAT = "{:.2f}"
+    SUSPENDED_TEXT = ""
+
+    _PACKET_PREFIX = re.compile(r"^\d+(?=[\[{])")
+
+    def __init__(self):
+        self._selections = {}
+        self.unknown_selections = 0
+
+    def decode(self, payload):
+        if isinstance(payload, str):
+            payload = self._PACKET_PREFIX.sub("", payload, count=1)
+        try:
+            message = json.loads(payload)
+        except (TypeError, ValueError):
+            return []
+        if isinstance(message, list) and len(message) == 2 and isinstance(message[0], str):
+            # Socket.IO event: [name, data]
+            return self._decode_message(dict(message[1], type=message[0]) if isinstance(message[1], dict) else None)
+        if isinstance(message, list):
+            return [update for item in message for update in self._decode_message(item)]
+        return self._decode_message(message)
+
+    def _decode_message(self, message):
+        if not isinstance(message, dict):
+            return []
+        kind = message.get("type")
+        if kind is None:
+            return super()._decode_message(message)
+        if kind == "markets":
+            return [self._market_update(market) for market in message.get("markets", [])]
+        if kind == "odds":
+            return self._odds_updates(message.get("changes", []))
+        if kind == "marketRemoved":
+            return [{"type": "remove", "market_id": _text(message.get("marketId")),
+                     "market_part": _text(message.get("part"))}]
+        return []
+
+    def _odds_text(self, odds, status):
+        if status not in self.OPEN_STATUSES or odds is None:
+            return self.SUSPENDED_TEXT
+        if isinstance(odds, str):
+            return odds
+        return self.ODDS_FORMAT.format(odds)
+
+    def _market_update(self, market):
+        fields, selection_fields = self.MARKET_FIELDS, self.SELECTION_FIELDS
+        market_id = _text(market.get(fields["id"]))
+        market_part = _text(market.get(fields["part"]))
+        outcomes = []
+        for selection in market.get(fields["selections"], []):
+            text = selection.get(selection_fields["text"], "")
+            self._selections[selection.get(selection_fields["id"])] = (market_id, market_part, text)
+            outcomes.append({"text": text, "odds": self._odds_text(selection.get(selection_fields["odds"]),
+                                                                   selection.get(selection_fields["status"]))})
+        return {"type": "market", "market": {
+            "market_id": market_id,
+            "market_part": market_part,
+            "legend": market.get(fields["legend"], ""),
+            "outcomes": outcomes,
+        }}
+
+    def _odds_updates(self, changes):
+        fields = self.CHANGE_FIELDS
+        updates = []
+        for change in changes:
+            target = self._selections.get(change.get(fields["id"]))
+            if target is None:
+                self.unknown_selections += 1
+                continue
+            market_id, market_part, text = target
+            updates.append({"type": "odds", "market_id": market_id, "market_part": market_part, "text": text,
+                            "odds": self._odds_text(change.get(fields["odds"]), change.get(fields["status"]))})
+        return updates
+
+
+def _text(value):
+    """Ids as the DOM extraction reports them: strings, None for missing"""
+    return None if value is None else str(value)
+
+
+class MarketTable:
+    """
+    In-memory market table kept up to date from feed updates
+
+    Markets keep the order in which they were first seen, so snapshots come
+    out in a stable order like the DOM extraction.
+    """
+
+    def __init__(self):
+        self._markets = OrderedDict()
+        self.updates_applied = 0
+
+    def load(self, markets):
+        """Replace the table with a full market list, e.g. a DOM snapshot"""
+        self._markets = OrderedDict(
+            ((m["market_id"], m["market_part"]), m) for m in markets
+        )
+
+    def apply(self, updates):
+        """
+        Apply decoded feed updates
+
+        Returns:
+            bool: True if the table changed
+        """
+        changed = False
+        for update in updates:
+            kind = update["type"]
+            if kind == "market":
+                market = update["market"]
+                key = (market["market_id"], market["market_part"])
+                if self._markets.get(key) != market:
+                    self._markets[key] = market
+                    changed = True
+            elif kind == "remove":
+                key = (update["market_id"], update.get("market_part"))
+                if self._markets.pop(key, None) is not None:
+                    changed = True
+            elif kind == "odds":
+                market = self._markets.get((update["market_id"], update.get("market_part")))
+                if market is None:
+                    continue
+                for outcome in market["outcomes"]:
+                    if outcome["text"] == update["text"] and outcome["odds"] != update["odds"]:
+                        outcome["odds"] = update["odds"]
+                        changed = True
+            self.updates_applied += 1
+        return changed
+
+    def snapshot(self):
+        """
+        Returns:
+            MarketList: Market dicts in the scraper's output format (markets without outcomes dropped)
+        """
+        return MarketList(
+            {
+                "market_id": m["market_id"],
+                "market_part": m["market_part"],
+                "legend": m["legend"],
+                "outcomes": [dict(o) for o in m["outcomes"]],
+            }
+            for m in self._markets.values() if m["outcomes"]
+        )
+
+
+class PerformanceLogReader:
+    """
+    Reads a driver's DevTools performance log and sorts feed traffic per tab
+
+    The performance log is per driver, while feed captures are per tab, so
+    one reader per driver drains the log and keeps each watched tab's
+    WebSocket frames and finished XHR/fetch requests until that tab asks for
+    them. Traffic of other tabs is dropped, and so are a tab's buffers when
+    it stops watching. Each buffer keeps at most max_backlog messages; older
+    ones are dropped and counted, so the tab's capture knows to reseed.
+    Chromedriver window handles are the DevTools target ids found in the
+    log's "webview" field.
+    """
+
+    def __init__(self, driver, max_backlog=1000):
+        self.driver = driver
+        self.max_backlog = max_backlog
+        self._frames = {}
+        self._finished = {}
+        self._dropped = {}
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def watch(self, webview):
+        """Start buffering the feed traffic of a tab"""
+        with self._lock:
+            if webview not in self._frames:
+                self._frames[webview] = deque()
+                self._finished[webview] = deque()
+                self._dropped[webview] = 0
+
+    def unwatch(self, webview):
+        """Stop buffering a tab's traffic and drop what it has not taken yet"""
+        with self._lock:
+            self._frames.pop(webview, None)
+            self._finished.pop(webview, None)
+            self._dropped.pop(webview, None)
+            self._responses = {
+                request_id: owner for request_id, owner in self._responses.items() if owner != webview
+            }
+
+    def _buffer(self, buffers, webview, item):
+        buffer = buffers[webview]
+        if len(buffer) >= self.max_backlog:
+            buffer.popleft()
+            self._dropped[webview] += 1
+        buffer.append(item)
+
+    def read(self, url_pattern=None):
+        """Drain the driver's performance log into the per-tab buffers"""
+        entries = self.driver.get_log("performance")
+        with self._lock:
+            for entry in entries:
+                try:
+                    message = json.loads(entry["message"])
+                except (KeyError, ValueError):
+                    continue
+                webview = message.get("webview")
+                inner = message.get("message", {})
+                method = inner.get("method")
+                params = inner.get("params", {})
+                if webview not in self._frames and method != "Network.loadingFinished":
+                    continue
+                if method == "Network.webSocketFrameReceived":
+                    self._buffer(self._frames, webview, params.get("response", {}).get("payloadData", ""))
+                elif method == "Network.responseReceived":
+                    response = params.get("response", {})
+                    if params.get("type") not in ("XHR", "Fetch"):
+                        continue
+                    if "json" not in response.get("mimeType", ""):
+                        continue
+                    if url_pattern and not url_pattern.search(response.get("url", "")):
+                        continue
+                    self._responses[params.get("requestId")] = webview
+                elif method == "Network.loadingFinished":
+                    webview = self._responses.pop(params.get("requestId"), None)
+                    if webview in self._finished:
+                        self._buffer(self._finished, webview, params.get("requestId"))
+
+    def take(self, webview):
+        """
+        Returns:
+            tuple: (WebSocket frame payloads, finished request ids, number of messages
+                dropped since the last take) buffered for a watched tab
+        """
+        with self._lock:
+            if webview not in self._frames:
+                return [], [], 0
+            frames, request_ids = list(self._frames[webview]), list(self._finished[webview])
+            dropped = self._dropped[webview]
+            self._frames[webview].clear()
+            self._finished[webview].clear()
+            self._dropped[webview] = 0
+            return frames, request_ids, dropped
+
+
+_readers = weakref.WeakKeyDictionary()
+_readers_lock = threading.Lock()
+
+
+def log_reader_for(driver):
+    """Get the shared PerformanceLogReader of a driver"""
+    with _readers_lock:
+        reader = _readers.get(driver)
+        if reader is None:
+            reader = _readers[driver] = PerformanceLogReader(driver)
+        return reader
+
+
+class FeedCapture:
+    """
+    Captures the page's own odds feed from one tab and keeps a MarketTable current
+
+    Requires a driver launched with performance logging (launch_chrome with
+    capture_network=True).
+    """
+
+    def __init__(self, driver, window_handle=None, decoder=None, url_pattern=None):
+        """
+        Initialize the feed capture
+
+        Args:
+            driver: Selenium WebDriver with performance logging enabled
+            window_handle (str): Tab to capture, defaults to the current one
+            decoder (FeedDecoder): Message decoder, defaults to SelectionFeedDecoder
+            url_pattern (str): Regex restricting which XHR/fetch URLs are decoded
+        """
+        self.driver = driver
+        self.window_handle = window_handle or driver.current_window_handle
+        self.decoder = decoder or SelectionFeedDecoder()
+        self.url_pattern = re.compile(url_pattern) if url_pattern else None
+        self.table = MarketTable()
+        self.messages = 0
+        self.dropped = 0
+        self.seeded = False
+        log_reader_for(driver).watch(self.window_handle)
+
+    def seed(self, markets):
+        """Start from a full market list, so the feed only has to deliver changes"""
+        self.table.load(markets)
+        self.seeded = True
+
+    def poll(self):
+        """
+        Decode the feed messages that arrived since the last poll
+
+        The driver must be on this capture's tab, since XHR bodies are
+        fetched through DevTools on the current target.
+
+        Returns:
+            bool: True if the market table changed
+        """
+        reader = log_reader_for(self.driver)
+        reader.read(self.url_pattern)
+        frames, request_ids, dropped = reader.take(self.window_handle)
+        if dropped:
+            # Missed messages: the table can only be trusted again after a reseed
+            self.dropped += dropped
+            self.seeded = False
+
+        payloads = list(frames)
+        for request_id in request_ids:
+            try:
+                body = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+            except Exception:
+                # Body already evicted from the DevTools buffer
+                continue
+            if not body.get("base64Encoded"):
+                payloads.append(body.get("body", ""))
+
+        changed = False
+        for payload in payloads:
+            self.messages += 1
+            if self.table.apply(self.decoder.decode(payload)):
+                changed = True
+        return changed
+
+    def close(self):
+        """Stop capturing: the tab's unread traffic is dropped"""
+        log_reader_for(self.driver).unwatch(self.window_handle)
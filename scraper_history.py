@@ -0,0 +1,361 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from scraper_model import market_columns
+
+# One tick: timestamp, series id, odds (NaN while suspended)
+TICK = struct.Struct("<dId")
+# Sealed block: first record, first and last timestamp, number of series ids that follow
+BLOCK_HEADER = struct.Struct("<QddI")
+
+TICKS_FILE = "ticks.dat"
+SERIES_FILE = "series.jsonl"
+BLOCKS_FILE = "blocks.idx"
+
+
+class HistoryStore:
+    """
+    Append-only odds history, one time series per (event, market, part, outcome)
+
+    A tick is appended whenever an outcome's odds change (and on the first
+    sighting of an outcome), so quiet markets cost nothing between moves.
+    The store is a directory with three files:
+
+        ticks.dat    fixed-size records (timestamp, series id, odds), in time order
+        series.jsonl one line per series: its id and key
+        blocks.idx   one entry per sealed block of block_records ticks: the
+                     block's time span and the series ids that occur in it
+
+    Queries memory-map ticks.dat, binary-search the time range and only scan
+    the blocks that contain a matching series, so they read a small part of
+    the file no matter how long the history is.
+    """
+
+    def __init__(self, directory, block_records=4096):
+        """
+        Open (or create) a history store
+
+        Args:
+            directory (str): Directory holding the store's files
+            block_records (int): Ticks per indexed block
+        """
+        self.directory = directory
+        self.block_records = block_records
+        os.makedirs(directory, exist_ok=True)
+        self.ticks_file = os.path.join(directory, TICKS_FILE)
+        self.series_file = os.path.join(directory, SERIES_FILE)
+        self.blocks_file = os.path.join(directory, BLOCKS_FILE)
+        self._lock = threading.Lock()
+
+        self._series = {}
+        self._keys = []
+        self._load_series()
+
+        self._record_count = self._repair_ticks()
+        self._blocks = []
+        self._series_blocks = {}
+        self._load_blocks()
+        self._open_block_series = set()
+        self._open_block_first_ts = None
+        self._scan_open_block()
+
+        self._last_odds = {}
+        self._last_ts = self._read_last_ts()
+        self._ticks = open(self.ticks_file, "ab")
+        self._series_out = open(self.series_file, "a", encoding="utf-8")
+        self._blocks_out = open(self.blocks_file, "ab")
+        self._map = None
+        self._map_size = 0
+
+    def _load_series(self):
+        try:
+            with open(self.series_file, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn last line after a crash
+                        break
+                    key = tuple(entry["key"])
+                    self._series[key] = entry["id"]
+                    self._keys.append(key)
+        except FileNotFoundError:
+            pass
+
+    def _repair_ticks(self):
+        """Drop a partially written last tick, e.g. after a crash"""
+        try:
+            size = os.path.getsize(self.ticks_file)
+        except OSError:
+            return 0
+        if size % TICK.size:
+            with open(self.ticks_file, "r+b") as f:
+                f.truncate(size - size % TICK.size)
+        return size // TICK.size
+
+    def _load_blocks(self):
+        try:
+            with open(self.blocks_file, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        offset = 0
+        while offset + BLOCK_HEADER.size <= len(data):
+            first_record, first_ts, last_ts, count = BLOCK_HEADER.unpack_from(data, offset)
+            end = offset + BLOCK_HEADER.size + 4 * count
+            if end > len(data) or first_record + self.block_records > self._record_count:
+                break
+            ids = struct.unpack_from(f"<{count}I", data, offset + BLOCK_HEADER.size)
+            self._add_block(first_ts, last_ts, ids)
+            offset = end
+        if offset != len(data):
+            with open(self.blocks_file, "r+b") as f:
+                f.truncate(offset)
+
+    def _add_block(self, first_ts, last_ts, series_ids):
+        block = len(self._blocks)
+        self._blocks.append((first_ts, last_ts))
+        for series_id in series_ids:
+            self._series_blocks.setdefault(series_id, []).append(block)
+
+    def _scan_open_block(self):
+        """Seal blocks that were filled but not indexed, and collect the open block's series"""
+        start = len(self._blocks) * self.block_records
+        if start >= self._record_count:
+            return
+        with open(self.ticks_file, "rb") as f:
+            f.seek(start * TICK.size)
+            data = f.read()
+        blocks_out = open(self.blocks_file, "ab")
+        try:
+            for ts, series_id, _ in TICK.iter_unpack(data):
+                self._track(ts, series_id, blocks_out, start)
+                start += 1
+        finally:
+            blocks_out.close()
+
+    def _track(self, ts, series_id, blocks_out, record):
+        """Account one appended tick in the open block, sealing the block when full"""
+        if self._open_block_first_ts is None:
+            self._open_block_first_ts = ts
+        self._open_block_series.add(series_id)
+        if (record + 1) % self.block_records == 0:
+            ids = sorted(self._open_block_series)
+            blocks_out.write(BLOCK_HEADER.pack(record + 1 - self.block_records, self._open_block_first_ts,
+                                               ts, len(ids)))
+            blocks_out.write(struct.pack(f"<{len(ids)}I", *ids))
+            self._add_block(self._open_block_first_ts, ts, ids)
+            self._open_block_series = set()
+            self._open_block_first_ts = None
+
+    def _read_last_ts(self):
+        if not self._record_count:
+            return 0.0
+        with open(self.ticks_file, "rb") as f:
+            f.seek((self._record_count - 1) * TICK.size)
+            return TICK.unpack(f.read(TICK.size))[0]
+
+    def _series_id(self, key):
+        series_id = self._series.get(key)
+        if series_id is None:
+            series_id = self._series[key] = len(self._keys)
+            self._keys.append(key)
+            self._series_out.write(json.dumps({"id": series_id, "key": key}, ensure_ascii=False) + "\n")
+        return series_id
+
+    def record(self, event_id, markets, timestamp=None):
+        """
+        Append the odds that changed since the previous snapshot of an event
+
+        Args:
+            event_id (str): Event the markets belong to
+            markets (list): Markets returned by scrape_market_titles (or a ColumnarSnapshot)
+            timestamp (float): Unix time of the snapshot, defaults to now
+
+        Returns:
+            int: Number of ticks appended
+        """
+        columns = market_columns(markets)
+        offsets = columns.outcome_offsets
+        with self._lock:
+            # Ticks must stay in time order for the binary search, even if the clock steps back
+            ts = max(timestamp if timestamp is not None else time.time(), self._last_ts)
+            appended = 0
+            for i in range(len(columns)):
+                market_id, market_part = columns.market_ids[i], columns.market_parts[i]
+                for j in range(offsets[i], offsets[i + 1]):
+                    key = (event_id, market_id, market_part, columns.outcome_texts[j])
+                    series_id = self._series_id(key)
+                    odds = columns.odds[j]
+                    last = self._last_odds.get(series_id)
+                    # NaN != NaN, so compare suspended states explicitly
+                    if last is not None and (last == odds or (last != last and odds != odds)):
+                        continue
+                    self._last_odds[series_id] = odds
+                    self._ticks.write(TICK.pack(ts, series_id, odds))
+                    self._track(ts, series_id, self._blocks_out, self._record_count)
+                    self._record_count += 1
+                    appended += 1
+            if appended:
+                self._last_ts = ts
+                self._series_out.flush()
+                self._ticks.flush()
+                self._blocks_out.flush()
+            return appended
+
+    def series(self, event_id=None, market_id=None, market_part=None, text=None):
+        """
+        Returns:
+            dict: Series id -> (event_id, market_id, market_part, text) of every matching series
+        """
+        with self._lock:
+            return {
+                series_id: key for series_id, key in enumerate(self._keys)
+                if (event_id is None or key[0] == event_id)
+                and (market_id is None or key[1] == market_id)
+                and (market_part is None or key[2] == market_part)
+                and (text is None or key[3] == text)
+            }
+
+    def _mapped(self):
+        """Memory map of ticks.dat, remapped when the file has grown"""
+        size = self._record_count * TICK.size
+        if self._map is None or self._map_size != size:
+            # Not closed: queries may still scan the old map, it is unmapped once they drop it
+            self._map = None
+            if not size:
+                return None
+            with open(self.ticks_file, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            self._map_size = size
+        return self._map
+
+    def _find(self, mapped, ts, count):
+        """First record with a timestamp >= ts (binary search over the mapped file)"""
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if TICK.unpack_from(mapped, mid * TICK.size)[0] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def query(self, event_id=None, market_id=None, market_part=None, text=None, start=None, end=None):
+        """
+        Odds moves of the matching series within a time range
+
+        Example: store.query(event_id, market_id="123", start=time.time() - 600)
+
+        Args:
+            event_id, market_id, market_part, text: Series filters, None matches all
+            start (float): Unix time, inclusive; None for the beginning
+            end (float): Unix time, exclusive; None for now
+
+        Returns:
+            list: (timestamp, event_id, market_id, market_part, text, odds) tuples in time
+                order, odds None while suspended
+        """
+        wanted = self.series(event_id, market_id, market_part, text)
+        if not wanted:
+            return []
+        # Only the index is read under the lock; the mapped records before count
+        # never change, so the scan runs without blocking record()
+        with self._lock:
+            self._ticks.flush()
+            count = self._record_count
+            mapped = self._mapped()
+            if mapped is None:
+                return []
+            # Sealed blocks only need scanning if one of the wanted series occurs in them
+            sealed = len(self._blocks)
+            candidate_blocks = set()
+            for series_id in wanted:
+                candidate_blocks.update(self._series_blocks.get(series_id, ()))
+
+        lo = self._find(mapped, start, count) if start is not None else 0
+        hi = self._find(mapped, end, count) if end is not None else count
+        if lo >= hi:
+            return []
+        ranges = []
+        first_block, last_block = lo // self.block_records, (hi - 1) // self.block_records
+        for block in range(first_block, last_block + 1):
+            if block < sealed and block not in candidate_blocks:
+                continue
+            block_lo = max(lo, block * self.block_records)
+            block_hi = min(hi, (block + 1) * self.block_records)
+            if ranges and ranges[-1][1] == block_lo:
+                ranges[-1] = (ranges[-1][0], block_hi)
+            else:
+                ranges.append((block_lo, block_hi))
+
+        result = []
+        for range_lo, range_hi in ranges:
+            chunk = mapped[range_lo * TICK.size:range_hi * TICK.size]
+            for ts, series_id, odds in TICK.iter_unpack(chunk):
+                key = wanted.get(series_id)
+                if key is not None:
+                    result.append((ts,) + key + (None if odds != odds else odds,))
+        return result
+
+    def last_odds(self, event_id, market_id, market_part, text, at=None):
+        """
+        Odds of one outcome at a point in time
+
+        Returns:
+            float: The odds, None if suspended or not seen before that time
+        """
+        moves = self.query(event_id, market_id, market_part, text, end=at)
+        return moves[-1][5] if moves else None
+
+    def stats(self):
+        """
+        Returns:
+            dict: Tick, series and sealed block counts
+        """
+        with self._lock:
+            return {"ticks": self._record_count, "series": len(self._keys), "blocks": len(self._blocks)}
+
+    def close(self):
+        """Flush and close the store's files"""
+        with self._lock:
+            # A query still scanning keeps its map until it finishes
+            self._map = None
+            for f in (self._ticks, self._series_out, self._blocks_out):
+                f.close()
+
+
+
+def history_route(history):
+    """
+    Route handler serving odds moves from a HistoryStore on a SnapshotServer
+
+    Usage: server.add_route("/history", history_route(history))
+
+    Query parameters: event_id, market_id, market_part, text (series filters),
+    start/end (unix time) or last=<seconds> for the most recent moves.
+    """
+    def handle(request, query):
+        def param(name):
+            values = query.get(name)
+            return values[0] if values else None
+
+        start = param("start")
+        end = param("end")
+        last = param("last")
+        if last is not None:
+            start = time.time() - float(last)
+        moves = history.query(param("event_id"), param("market_id"), param("market_part"), param("text"),
+                              start=float(start) if start is not None else None,
+                              end=float(end) if end is not None else None)
+        payload = [
+            {"ts": ts, "event_id": event_id, "market_id": market_id, "market_part": market_part,
+             "text": text, "odds": odds}
+            for ts, event_id, market_id, market_part, text, odds in moves
+        ]
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+        request.send_body(200, body)
+    return handle
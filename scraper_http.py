@@ -0,0 +1,173 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from scraper_core import TippmixProScraper, create_http_session
+from scraper_pool import event_id_from_url
+from scraper_schedule import PollSchedule
+
+
+class ConcurrentFetcher:
+    """
+    Poll many event pages in parallel over plain HTTP
+
+    All events share one pooled keep-alive session, so the connections to a
+    host are reused across events and cycles. Each event has its own scraper
+    (and parser), which revalidates with ETag/Last-Modified and only re-parses
+    pages that actually changed.
+
+    With a ParsePipeline the worker threads only fetch; changed pages are
+    parsed in the pipeline's processes and delivered when ready.
+    """
+
+    def __init__(self, urls, max_workers=8, parser_engine="lxml", timeout=10, metrics=None,
+                 parse_pipeline=None, recorder=None):
+        """
+        Initialize the fetcher
+
+        Args:
+            urls (iterable): Event URLs to poll
+            max_workers (int): Parallel requests
+            parser_engine (str): "lxml" or "bs4"
+            timeout (int): Request timeout in seconds
+            metrics (Metrics): Collector for stage timings and counters, optional
+            parse_pipeline (ParsePipeline): Parse changed pages in worker processes
+            recorder (SnapshotRecorder): Record every changed page
+        """
+        self.max_workers = max_workers
+        self.session = create_http_session(pool_size=max_workers)
+        self.parser_engine = parser_engine
+        self.timeout = timeout
+        self.metrics = metrics
+        self.parse_pipeline = parse_pipeline
+        self.recorder = recorder
+        self.scrapers = {}
+        self.schedules = {}
+        self.errors = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+        for url in urls:
+            self.add_url(url)
+
+    def add_url(self, url):
+        """Start polling another event"""
+        event_id = event_id_from_url(url) or url
+        if event_id in self.scrapers:
+            return
+        scraper = TippmixProScraper(use_selenium=False, timeout=self.timeout, session=self.session,
+                                    parser_engine=self.parser_engine, metrics=self.metrics,
+                                    recorder=self.recorder)
+        scraper.current_url = scraper.convert_tippmixpro_url(url)
+        scraper.is_page_open = True
+        self.scrapers[event_id] = scraper
+
+    def remove_url(self, url):
+        """Stop polling an event"""
+        event_id = event_id_from_url(url) or url
+        self.scrapers.pop(event_id, None)
+        if self.parse_pipeline:
+            self.parse_pipeline.forget(event_id)
+
+    def _fetch_one(self, event_id, scraper):
+        try:
+            markets = scraper._extract_markets_with_http()
+            scraper.metrics.record_markets(markets)
+            self.errors.pop(event_id, None)
+            return markets
+        except Exception as e:
+            scraper.metrics.inc("errors")
+            self.errors[event_id] = str(e)
+            return None
+
+    def _capture_one(self, event_id, scraper, callback):
+        """
+        Fetch one event and queue a changed page on the parse pipeline
+
+        Returns:
+            list: The last parsed markets (still current on a 304), None if the request failed
+        """
+        try:
+            content, changed = scraper.capture_snapshot()
+            self.errors.pop(event_id, None)
+        except Exception as e:
+            scraper.metrics.inc("errors")
+            self.errors[event_id] = str(e)
+            return None
+        if changed:
+            def on_parsed(markets):
+                if markets is not None:
+                    scraper._http_markets = markets
+                    callback(event_id, markets)
+            self.parse_pipeline.submit(event_id, content, on_parsed)
+        elif scraper._http_markets is not None:
+            callback(event_id, scraper._http_markets)
+        return scraper._http_markets
+
+    def poll_once(self, event_ids=None):
+        """
+        Fetch every event (or the given ones) once, in parallel
+
+        Args:
+            event_ids (iterable): Events to fetch, defaults to all
+
+        Returns:
+            dict: Event id -> market list, None for events whose request failed
+        """
+        scrapers = list(self.scrapers.items())
+        if event_ids is not None:
+            wanted = set(event_ids)
+            scrapers = [(event_id, scraper) for event_id, scraper in scrapers if event_id in wanted]
+        futures = {
+            event_id: self._executor.submit(self._fetch_one, event_id, scraper)
+            for event_id, scraper in scrapers
+        }
+        return {event_id: future.result() for event_id, future in futures.items()}
+
+    def run(self, interval, callback, stop_event=None, adaptive=False, min_interval=None, max_interval=None):
+        """
+        Poll every event on its own PollSchedule until stop_event is set
+
+        Args:
+            interval (float): Seconds between two polls of the same event
+            callback (callable): Called with (event_id, markets) for every successful fetch
+            stop_event (threading.Event): Stops the loop when set
+            adaptive (bool): Poll events with moving odds faster and quiet ones slower
+            min_interval (float): Fastest adaptive interval
+            max_interval (float): Slowest adaptive interval
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            for event_id in list(self.scrapers):
+                if event_id not in self.schedules:
+                    self.schedules[event_id] = PollSchedule(interval, adaptive=adaptive,
+                                                            min_interval=min_interval,
+                                                            max_interval=max_interval)
+            for event_id in list(self.schedules):
+                if event_id not in self.scrapers:
+                    del self.schedules[event_id]
+
+            now = time.monotonic()
+            due = [event_id for event_id, schedule in self.schedules.items() if schedule.due(now)]
+            if self.parse_pipeline:
+                # Parsed pages reach the callback from the pipeline; the schedule
+                # adapts to the last markets already parsed
+                futures = {
+                    event_id: self._executor.submit(self._capture_one, event_id, self.scrapers[event_id], callback)
+                    for event_id in due if event_id in self.scrapers
+                }
+                for event_id, future in futures.items():
+                    self.schedules[event_id].complete(future.result())
+            else:
+                for event_id, markets in self.poll_once(due).items():
+                    self.schedules[event_id].complete(markets)
+                    if markets is not None:
+                        callback(event_id, markets)
+
+            if self.schedules:
+                wait = min(schedule.next_due for schedule in self.schedules.values()) - time.monotonic()
+            else:
+                wait = interval
+            stop_event.wait(max(0.0, min(wait, interval)))
+
+    def close(self):
+        """Stop the worker threads and close the pooled connections"""
+        self._executor.shutdown(wait=True)
+        self.session.close()
@@ -0,0 +1,186 @@
+import time
+from collections import deque
+from scraper_browser import browser_rss, tab_memory
+
+
+class TabRecycler:
+    """
+    Keep a long-running event tab within a memory budget
+
+    Live pages left open for hours keep growing their JS heap and DOM. Every
+    sample_interval seconds the tab's memory is sampled through the DevTools
+    Performance domain (and the browser's RSS when psutil is installed). Once
+    a sample crosses the budget, a replacement tab starts loading the same
+    page in the background while the old tab keeps being scraped. The
+    scraper switches over only when the replacement yields markets, so
+    recycling leaves no gap in the output; a replacement that is
+    not ready within preload_timeout is dropped and retried later.
+
+    check() must be called from the thread that drives the scraper, e.g.
+    after every cycle.
+    """
+
+    def __init__(self, scraper, heap_budget_mb=512, node_budget=200000, rss_budget_mb=None,
+                 sample_interval=30, preload_timeout=60, history=120, log=print):
+        """
+        Initialize the recycler
+
+        Args:
+            scraper (TippmixProScraper): Scraper whose tab is recycled
+            heap_budget_mb (float): Largest JS heap of the tab, None for no limit
+            node_budget (int): Most live DOM nodes of the tab, None for no limit
+            rss_budget_mb (float): Largest RSS of the whole browser, None for no limit; in a
+                pool every tab of the browser shares it
+            sample_interval (float): Seconds between two memory samples
+            preload_timeout (float): Seconds a replacement tab may take to render the markets
+            history (int): Samples kept for the memory trend
+            log (callable): Function receiving log messages
+        """
+        self.scraper = scraper
+        self.heap_budget_mb = heap_budget_mb
+        self.node_budget = node_budget
+        self.rss_budget_mb = rss_budget_mb
+        self.sample_interval = sample_interval
+        self.preload_timeout = preload_timeout
+        self.log = log
+        self.samples = deque(maxlen=history)
+        self.recycles = 0
+        self.failed_recycles = 0
+        self.last_reason = None
+        self._next_sample = time.monotonic() + sample_interval
+        self._replacement = None
+        self._replacement_started = None
+
+    @property
+    def recycling(self):
+        """True while a replacement tab is loading"""
+        return self._replacement is not None
+
+    def sample(self):
+        """
+        Sample the memory of the scraper's tab
+
+        Returns:
+            dict: Sample time (unix) and the tab_memory() metrics, plus rss_mb (None without psutil)
+        """
+        self.scraper.activate_window()
+        sample = tab_memory(self.scraper.driver)
+        sample["rss_mb"] = browser_rss(self.scraper.driver)
+        sample["time"] = time.time()
+        self.samples.append(sample)
+        return sample
+
+    def over_budget(self, sample):
+        """
+        Returns:
+            str: Why the sample exceeds the budget, None if it does not
+        """
+        if self.heap_budget_mb is not None and sample["heap_mb"] > self.heap_budget_mb:
+            return f"JS heap {sample['heap_mb']:.0f} MB > {self.heap_budget_mb} MB"
+        if self.node_budget is not None and sample["nodes"] > self.node_budget:
+            return f"{sample['nodes']} DOM nodes > {self.node_budget}"
+        if (self.rss_budget_mb is not None and sample["rss_mb"] is not None
+                and sample["rss_mb"] > self.rss_budget_mb):
+            return f"browser RSS {sample['rss_mb']:.0f} MB > {self.rss_budget_mb} MB"
+        return None
+
+    def check(self):
+        """
+        Sample memory when due, start a replacement tab over budget and switch once it is ready
+
+        Returns:
+            bool: True if the scraper switched to a fresh tab in this call
+        """
+        now = time.monotonic()
+        if self._replacement is not None and self.scraper.replacement_tab != self._replacement:
+            # A recovery reloaded the page and closed the replacement
+            self.forget_replacement()
+        if self._replacement is not None:
+            return self._try_switch(now)
+        if now < self._next_sample:
+            return False
+        self._next_sample = now + self.sample_interval
+        try:
+            reason = self.over_budget(self.sample())
+        except Exception as e:
+            self.log(f"Error sampling tab memory: {e}")
+            return False
+        if reason:
+            self.last_reason = reason
+            self.log(f"Recycling tab ({reason}), preloading a replacement")
+            try:
+                self._replacement = self.scraper.preload_replacement_tab()
+                self._replacement_started = now
+            except Exception as e:
+                self.failed_recycles += 1
+                self.log(f"Error preloading replacement tab: {e}")
+        return False
+
+    def _try_switch(self, now):
+        try:
+            if self.scraper.replacement_tab_ready(self._replacement):
+                self.scraper.adopt_replacement_tab(self._replacement)
+                self._replacement = None
+                self.recycles += 1
+                self.log(f"Switched to a fresh tab after "
+                         f"{now - self._replacement_started:.1f}s of preloading")
+                return True
+        except Exception as e:
+            self.log(f"Error checking replacement tab: {e}")
+        if now - self._replacement_started >= self.preload_timeout:
+            self.log("Replacement tab did not render the markets in time, keeping the old tab")
+            self.failed_recycles += 1
+            self.cancel()
+        return False
+
+    def cancel(self):
+        """Close a replacement tab that is still loading"""
+        if self._replacement is None:
+            return
+        try:
+            self.scraper.discard_tab(self._replacement)
+        except Exception:
+            pass
+        self._replacement = None
+        self._next_sample = time.monotonic() + self.sample_interval
+
+    def forget_replacement(self):
+        """Drop a replacement tab that went away with its browser, e.g. after a relaunch"""
+        self._replacement = None
+        self._next_sample = time.monotonic() + self.sample_interval
+
+    def trend(self, field="heap_mb"):
+        """
+        Growth of a memory metric over the kept samples (least-squares slope)
+
+        Args:
+            field (str): "heap_mb", "nodes", "listeners" or "rss_mb"
+
+        Returns:
+            float: Change per minute, 0 with fewer than two samples
+        """
+        points = [(s["time"], s[field]) for s in self.samples if s.get(field) is not None]
+        if len(points) < 2:
+            return 0.0
+        mean_t = sum(t for t, _ in points) / len(points)
+        mean_v = sum(v for _, v in points) / len(points)
+        variance = sum((t - mean_t) ** 2 for t, _ in points)
+        if not variance:
+            return 0.0
+        slope = sum((t - mean_t) * (v - mean_v) for t, v in points) / variance
+        return slope * 60
+
+    def status(self):
+        """
+        Returns:
+            dict: Last sample, heap and node trends per minute and recycle counts
+        """
+        return {
+            "last_sample": dict(self.samples[-1]) if self.samples else None,
+            "heap_mb_per_min": self.trend("heap_mb"),
+            "nodes_per_min": self.trend("nodes"),
+            "recycling": self.recycling,
+            "recycles": self.recycles,
+            "failed_recycles": self.failed_recycles,
+            "last_reason": self.last_reason,
+        }
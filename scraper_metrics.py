@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RollingHistogram:
+    """
+    Durations of the most recent samples plus all-time count and sum
+    """
+
+    def __init__(self, window=1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantiles(self):
+        """
+        Returns:
+            dict: Quantile -> value over the rolling window, empty without samples
+        """
+        if not self.samples:
+            return {}
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return {q: ordered[min(last, int(round(q * last)))] for q in QUANTILES}
+
+
+class Metrics:
+    """
+    Hot-path instrumentation: per-stage timing spans and counters
+
+    Stages used by the scraper:
+        wait       WebDriverWait for the page body
+        transfer   innerHTML transfer over the WebDriver wire
+        parse      HTML parsing into markets
+        script     in-page extraction (script, push and feed modes)
+        feed       draining and decoding network feed messages
+        http       page fetch in HTTP mode
+        pipeline   snapshot queued and parsed in a ParsePipeline worker process
+        cycle      a whole scrape_market_titles call
+        serialize  JSON serialization of the output file
+        write      writing the output file to disk
+    """
+
+    def __init__(self, window=1024):
+        """
+        Args:
+            window (int): Number of recent samples the quantiles are computed over
+        """
+        self.window = window
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage):
+        """Time the enclosed block as one sample of a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def observe(self, stage, seconds):
+        """Record one duration of a stage"""
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = RollingHistogram(self.window)
+            histogram.observe(seconds)
+
+    def inc(self, counter, amount=1):
+        """Increase a counter, e.g. markets, outcomes, errors or timeouts"""
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def record_markets(self, markets):
+        """Count the markets and outcomes of one cycle's result"""
+        if markets is None:
+            return
+        self.inc("cycles")
+        self.inc("markets", len(markets))
+        self.inc("outcomes", sum(len(market["outcomes"]) for market in markets))
+
+    def summary(self):
+        """
+        Returns:
+            dict: Stage -> {"p50", "p95", "p99", "count"} in milliseconds, plus "counters"
+        """
+        with self._lock:
+            stages = {}
+            for stage, histogram in self.histograms.items():
+                quantiles = histogram.quantiles()
+                stages[stage] = {
+                    "p50": quantiles.get(0.5, 0) * 1000,
+                    "p95": quantiles.get(0.95, 0) * 1000,
+                    "p99": quantiles.get(0.99, 0) * 1000,
+                    "count": histogram.count,
+                }
+            return {"stages": stages, "counters": dict(self.counters)}
+
+    def render_prometheus(self, prefix="tippmixpro_scraper"):
+        """
+        Render all metrics in the Prometheus text exposition format
+
+        Returns:
+            str: Exposition text
+        """
+        lines = [
+            f"# HELP {prefix}_stage_seconds Duration of scraping hot-path stages (rolling window quantiles)",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                for q, value in histogram.quantiles().items():
+                    lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.total:.6f}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            for counter, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}_{counter}_total counter")
+                lines.append(f"{prefix}_{counter}_total {value}")
+        return "\n".join(lines) + "\n"
+
+
+def metrics_route(metrics):
+    """
+    Route handler serving metrics on a SnapshotServer
+
+    Usage: server.add_route("/metrics", metrics_route(metrics))
+    """
+    def handle(request, query):
+        body = metrics.render_prometheus().encode("utf-8")
+        request.send_body(200, body, content_type="text/plain; version=0.0.4; charset=utf-8")
+    return handle
@@ -0,0 +1,379 @@
+import struct
+import sys
+import time
+from array import array
+
+# Odds that cannot be bet on right now: blank, a dash or a lock symbol
+SUSPENDED = None
+
+# String index of missing values (e.g. a market without a part) in the binary format
+_NO_STRING = 0xFFFFFFFF
+
+BINARY_MAGIC = b"TMPS"
+BINARY_VERSION = 1
+# magic, version, timestamp, markets, outcomes, strings
+_HEADER = struct.Struct("<4sHxxdIII")
+
+
+def parse_odds(text):
+    """
+    Parse displayed odds into a number
+
+    Accepts decimal points and locale decimal commas ("1.85", "1,85"), as well
+    as spaces or non-breaking spaces used as thousands separators.
+
+    Args:
+        text (str): Odds as shown on the page
+
+    Returns:
+        float: The odds, or None (SUSPENDED) if blank, suspended or not a number
+    """
+    if not text:
+        return SUSPENDED
+    cleaned = text.strip().replace("\u00a0", "").replace(" ", "").replace(",", ".")
+    try:
+        odds = float(cleaned)
+    except ValueError:
+        return SUSPENDED
+    # Rejects "nan", "inf" and nonsense below even money
+    if not 1.0 <= odds < float("inf"):
+        return SUSPENDED
+    return odds
+
+
+class Outcome:
+    """One selectable outcome of a market, with its odds parsed once"""
+
+    __slots__ = ("text", "odds", "odds_text")
+
+    def __init__(self, text, odds_text):
+        self.text = text
+        self.odds_text = odds_text
+        self.odds = parse_odds(odds_text)
+
+    @property
+    def suspended(self):
+        return self.odds is SUSPENDED
+
+    def to_dict(self):
+        """Outcome in the JSON output schema (odds as displayed)"""
+        return {"text": self.text, "odds": self.odds_text}
+
+    def __eq__(self, other):
+        if not isinstance(other, Outcome):
+            return NotImplemented
+        return self.text == other.text and self.odds_text == other.odds_text
+
+    def __repr__(self):
+        return f"Outcome({self.text!r}, {self.odds_text!r})"
+
+
+class Market:
+    """A market and its outcomes, without the per-item dict overhead"""
+
+    __slots__ = ("market_id", "market_part", "legend", "outcomes")
+
+    def __init__(self, market_id, market_part, legend, outcomes):
+        self.market_id = market_id
+        self.market_part = market_part
+        self.legend = legend
+        self.outcomes = outcomes
+
+    @classmethod
+    def from_dict(cls, market):
+        """Build from a market dict as returned by scrape_market_titles"""
+        return cls(market["market_id"], market["market_part"], market["legend"],
+                   [Outcome(o["text"], o["odds"]) for o in market["outcomes"]])
+
+    @property
+    def key(self):
+        return self.market_id, self.market_part
+
+    @property
+    def suspended(self):
+        """True if no outcome of the market can be bet on"""
+        return all(outcome.odds is SUSPENDED for outcome in self.outcomes)
+
+    def to_dict(self):
+        """Market in the JSON output schema"""
+        return {
+            "market_id": self.market_id,
+            "market_part": self.market_part,
+            "legend": self.legend,
+            "outcomes": [outcome.to_dict() for outcome in self.outcomes],
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, Market):
+            return NotImplemented
+        return (self.market_id == other.market_id and self.market_part == other.market_part
+                and self.legend == other.legend and self.outcomes == other.outcomes)
+
+    def __repr__(self):
+        return f"Market({self.market_id!r}, {self.market_part!r}, {self.legend!r}, {len(self.outcomes)} outcomes)"
+
+
+class MarketList(list):
+    """
+    Scraped markets in the JSON output schema, with their odds parsed only once
+
+    A plain list of market dicts to everything that serializes, compares or
+    publishes it. Consumers that need numbers (history, analytics, the
+    schedule) read them from columns, a ColumnarSnapshot of the same markets
+    that is built on first use and then shared, instead of each parsing
+    every odds string again. The markets must not be modified once columns
+    has been read.
+    """
+
+    __slots__ = ("_columns",)
+
+    def __init__(self, markets=()):
+        super().__init__(markets)
+        self._columns = None
+
+    @property
+    def columns(self):
+        """ColumnarSnapshot of the markets, with numeric odds"""
+        if self._columns is None:
+            self._columns = ColumnarSnapshot.from_markets(self)
+        return self._columns
+
+
+def market_list(markets):
+    """
+    Args:
+        markets (list): Market dicts as returned by scrape_market_titles, or None
+
+    Returns:
+        MarketList: The markets, as is if they already are one; None stays None
+    """
+    if markets is None or isinstance(markets, MarketList):
+        return markets
+    return MarketList(markets)
+
+
+def market_columns(markets):
+    """
+    Numeric view of a market list, reusing the columns parsed for it before
+
+    Args:
+        markets: MarketList, ColumnarSnapshot or plain list of market dicts
+
+    Returns:
+        ColumnarSnapshot: The markets with numeric odds
+    """
+    if isinstance(markets, ColumnarSnapshot):
+        return markets
+    if isinstance(markets, MarketList):
+        return markets.columns
+    return ColumnarSnapshot.from_markets(markets)
+
+
+def markets_from_dicts(data):
+    """
+    Args:
+        data (list): Market dicts as returned by scrape_market_titles
+
+    Returns:
+        list: Market objects
+    """
+    return [Market.from_dict(market) for market in data]
+
+
+class ColumnarSnapshot:
+    """
+    Array-backed snapshot: one column per field instead of one object per outcome
+
+    Market i owns the outcomes outcome_offsets[i] to outcome_offsets[i + 1].
+    Odds are a float64 array with NaN for suspended outcomes, so they can be
+    loaded straight into NumPy with numpy.frombuffer(snapshot.odds).
+
+    encode()/decode() convert to and from the binary output format: a header
+    followed by a deduplicated string table and the columns as little-endian
+    arrays. Loading a snapshot is a handful of bulk array reads, without
+    parsing JSON or odds strings.
+    """
+
+    def __init__(self, timestamp=None):
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.market_ids = []
+        self.market_parts = []
+        self.legends = []
+        self.outcome_offsets = array("I", [0])
+        self.outcome_texts = []
+        self.odds_texts = []
+        self.odds = array("d")
+
+    @classmethod
+    def from_markets(cls, markets, timestamp=None):
+        """
+        Args:
+            markets (list): Market dicts (scrape_market_titles output) or Market objects
+            timestamp (float): Unix time of the snapshot, defaults to now
+        """
+        snapshot = cls(timestamp)
+        nan = float("nan")
+        for market in markets:
+            if isinstance(market, dict):
+                # Straight from the dict, without building Outcome objects on the way
+                snapshot.market_ids.append(market["market_id"])
+                snapshot.market_parts.append(market["market_part"])
+                snapshot.legends.append(market["legend"])
+                for outcome in market["outcomes"]:
+                    odds = parse_odds(outcome["odds"])
+                    snapshot.outcome_texts.append(outcome["text"])
+                    snapshot.odds_texts.append(outcome["odds"])
+                    snapshot.odds.append(nan if odds is SUSPENDED else odds)
+                snapshot.outcome_offsets.append(len(snapshot.odds))
+                continue
+            snapshot.market_ids.append(market.market_id)
+            snapshot.market_parts.append(market.market_part)
+            snapshot.legends.append(market.legend)
+            for outcome in market.outcomes:
+                snapshot.outcome_texts.append(outcome.text)
+                snapshot.odds_texts.append(outcome.odds_text)
+                snapshot.odds.append(nan if outcome.odds is SUSPENDED else outcome.odds)
+            snapshot.outcome_offsets.append(len(snapshot.odds))
+        return snapshot
+
+    def __len__(self):
+        return len(self.market_ids)
+
+    def market(self, index):
+        """Market object of one row"""
+        start, end = self.outcome_offsets[index], self.outcome_offsets[index + 1]
+        outcomes = [Outcome(self.outcome_texts[i], self.odds_texts[i]) for i in range(start, end)]
+        return Market(self.market_ids[index], self.market_parts[index], self.legends[index], outcomes)
+
+    def to_markets(self):
+        """
+        Returns:
+            list: Market objects
+        """
+        return [self.market(i) for i in range(len(self))]
+
+    def to_dicts(self):
+        """
+        Returns:
+            list: Market dicts in the JSON output schema
+        """
+        return [market.to_dict() for market in self.to_markets()]
+
+    def encode(self):
+        """
+        Returns:
+            bytes: The snapshot in the binary output format
+        """
+        strings = {}
+
+        def index_column(values):
+            column = array("I")
+            for value in values:
+                if value is None:
+                    column.append(_NO_STRING)
+                else:
+                    column.append(strings.setdefault(value, len(strings)))
+            return column
+
+        columns = [
+            index_column(self.market_ids),
+            index_column(self.market_parts),
+            index_column(self.legends),
+            self.outcome_offsets,
+            index_column(self.outcome_texts),
+            index_column(self.odds_texts),
+        ]
+        table = [s.encode("utf-8") for s in strings]
+        lengths = array("I", [len(b) for b in table])
+
+        parts = [_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, self.timestamp,
+                              len(self.market_ids), len(self.odds), len(table))]
+        for column in [lengths] + columns + [self.odds]:
+            parts.append(_little_endian(column).tobytes())
+        parts.append(b"".join(table))
+        return b"".join(parts)
+
+    @classmethod
+    def decode(cls, payload):
+        """
+        Args:
+            payload (bytes): Data produced by encode()
+
+        Returns:
+            ColumnarSnapshot: The decoded snapshot
+        """
+        magic, version, timestamp, n_markets, n_outcomes, n_strings = _HEADER.unpack_from(payload)
+        if magic != BINARY_MAGIC:
+            raise ValueError("Not a binary market snapshot")
+        if version != BINARY_VERSION:
+            raise ValueError(f"Unsupported binary snapshot version: {version}")
+        view = memoryview(payload)
+        offset = _HEADER.size
+
+        def read(typecode, count):
+            nonlocal offset
+            column = array(typecode)
+            size = column.itemsize * count
+            column.frombytes(view[offset:offset + size])
+            offset += size
+            return _little_endian(column)
+
+        lengths = read("I", n_strings)
+        market_ids = read("I", n_markets)
+        market_parts = read("I", n_markets)
+        legends = read("I", n_markets)
+        outcome_offsets = read("I", n_markets + 1)
+        outcome_texts = read("I", n_outcomes)
+        odds_texts = read("I", n_outcomes)
+        odds = read("d", n_outcomes)
+
+        table = []
+        for length in lengths:
+            table.append(bytes(view[offset:offset + length]).decode("utf-8"))
+            offset += length
+
+        def strings_of(column):
+            return [None if i == _NO_STRING else table[i] for i in column]
+
+        snapshot = cls(timestamp)
+        snapshot.market_ids = strings_of(market_ids)
+        snapshot.market_parts = strings_of(market_parts)
+        snapshot.legends = strings_of(legends)
+        snapshot.outcome_offsets = outcome_offsets
+        snapshot.outcome_texts = strings_of(outcome_texts)
+        snapshot.odds_texts = strings_of(odds_texts)
+        snapshot.odds = odds
+        return snapshot
+
+
+def _little_endian(column):
+    """The binary format is little-endian; big-endian hosts work on a swapped copy"""
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+def serialize_binary_snapshot(data):
+    """
+    Args:
+        data (list): Markets returned by scrape_market_titles
+
+    Returns:
+        bytes: The snapshot in the binary output format
+    """
+    return market_columns(data).encode()
+
+
+def load_binary_snapshot(filename):
+    """
+    Load a binary snapshot file written with binary output enabled
+
+    Args:
+        filename (str): The .bin file
+
+    Returns:
+        ColumnarSnapshot: The snapshot
+    """
+    with open(filename, "rb") as f:
+        return ColumnarSnapshot.decode(f.read())
@@ -0,0 +1,447 @@
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from scraper_model import serialize_binary_snapshot
+
+
+def build_snapshot(data):
+    """
+    Wrap scraped market data into the output document
+    
+    Args:
+        data (list): Markets returned by scrape_market_titles
+        
+    Returns:
+        dict: Document with timestamp and data keys
+    """
+    return {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "data": data
+    }
+
+
+def serialize_snapshot(data, compact=False):
+    """
+    Serialize the output document
+    
+    Args:
+        data (list): Markets returned by scrape_market_titles
+        compact (bool): Drop indentation and whitespace
+        
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    if compact:
+        text = json.dumps(build_snapshot(data), ensure_ascii=False, separators=(',', ':'))
+    else:
+        text = json.dumps(build_snapshot(data), indent=2, ensure_ascii=False)
+    return text.encode('utf-8')
+
+
+def _read_umask():
+    # os.umask can only be read by setting it, so do it once at import
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+_UMASK = _read_umask()
+
+
+def atomic_write(filename, payload):
+    """
+    Write bytes to a file so readers never see a partially written file
+    
+    The payload goes to a temporary file in the same directory, which then
+    replaces the target in a single rename. The file keeps the mode of the
+    file it replaces, or gets the umask-derived mode of a plain open() (the
+    temporary file itself is created 0600).
+    
+    Args:
+        filename (str): Target file
+        payload (bytes): File content
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    try:
+        mode = stat.S_IMODE(os.stat(filename).st_mode)
+    except OSError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        if hasattr(os, "fchmod"):
+            os.fchmod(fd, mode)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, filename)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def binary_snapshot_file(filename):
+    """Binary output file written next to a JSON output file (.json -> .bin)"""
+    return os.path.splitext(filename)[0] + ".bin"
+
+
+def write_snapshot(data, filename, compact=False, binary=False):
+    """
+    Save scraped data to a JSON file (atomically replaces existing content)
+    
+    Args:
+        data (list): Markets returned by scrape_market_titles
+        filename (str): Output JSON file
+        compact (bool): Drop indentation and whitespace
+        binary (bool): Also write the binary columnar snapshot next to it
+    """
+    atomic_write(filename, serialize_snapshot(data, compact))
+    if binary:
+        atomic_write(binary_snapshot_file(filename), serialize_binary_snapshot(data))
+
+
+class SnapshotWriter:
+    """
+    Background writer stage for output files
+    
+    Snapshots are handed over with submit() and written on a dedicated thread,
+    so the scraping loop never waits on the disk. Pending snapshots are
+    coalesced per file: if the disk falls behind, only the latest one is
+    written, and files are written in the order they were first queued. Writes are skipped when the markets did not change since the last
+    write, unless refresh_interval seconds have passed. Snapshots handed to
+    a DeltaJournal or the odds history are not coalesced: every one of them
+    is diffed in order, so the journal and the history keep each move, and
+    only the full snapshot rewrite is coalesced.
+    """
+    
+    def __init__(self, compact=False, refresh_interval=60, log=print, metrics=None, binary=False,
+                 history=None, analytics=None):
+        """
+        Initialize the writer
+        
+        Args:
+            compact (bool): Write compact JSON instead of indented JSON
+            refresh_interval (float): Rewrite unchanged files at least this often
+                (refreshes the timestamp), None to never rewrite unchanged data
+            log (callable): Function receiving error messages
+            metrics (Metrics): Collector for serialize/write timings, optional
+            binary (bool): Also write a binary columnar snapshot (.bin) next to each JSON file
+            history (HistoryStore): Record the odds moves of snapshots submitted with an event id,
+                stamped with their submit time
+            analytics (OddsAnalytics): Feed snapshots submitted with an event id to the analytics,
+                with one tick whenever the queue runs empty
+        """
+        self.compact = compact
+        self.binary = binary
+        self.history = history
+        self.analytics = analytics
+        self.metrics = metrics
+        self.refresh_interval = refresh_interval
+        self.log = log
+        self.written = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self._pending = {}
+        self._last_hash = {}
+        self._last_write = {}
+        self._condition = threading.Condition()
+        self._running = False
+        self._busy = False
+        self._thread = None
+    
+    def start(self):
+        """Start the writer thread"""
+        if self._thread:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+    
+    def stop(self, flush=True):
+        """
+        Stop the writer thread
+        
+        Args:
+            flush (bool): Write the pending snapshots before stopping
+        """
+        with self._condition:
+            if not flush:
+                self._pending.clear()
+            self._running = False
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+    
+    def submit(self, data, filename, journal=None, event_id=None):
+        """
+        Queue a snapshot for writing, replacing any not yet written one for the same file
+        
+        Args:
+            data (list): Markets returned by scrape_market_titles
+            filename (str): Output JSON file
+            journal (DeltaJournal): Hand the snapshot to this journal instead
+            event_id (str): Event of the snapshot, for the odds history
+        """
+        submitted = time.time()
+        with self._condition:
+            earlier = []
+            if filename in self._pending:
+                self.coalesced += 1
+                previous, previous_event_id, previous_submitted, _, earlier = self._pending[filename]
+                if journal or (self.history and previous_event_id is not None):
+                    # The journal and the history need every snapshot, to record each move
+                    earlier.append((previous, previous_event_id, previous_submitted))
+            self._pending[filename] = (data, event_id, submitted, journal, earlier)
+            self._condition.notify()
+    
+    def flush(self):
+        """Block until every submitted snapshot has been written"""
+        with self._condition:
+            while self._pending or self._busy:
+                self._condition.wait()
+    
+    def _worker(self):
+        analytics_pending = False
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                # Oldest file first, so no file waits behind newer ones
+                filename = next(iter(self._pending))
+                data, event_id, submitted, journal, earlier = self._pending.pop(filename)
+                self._busy = True
+            try:
+                if self.history:
+                    self._record_history(earlier + [(data, event_id, submitted)])
+                if self.analytics and event_id is not None:
+                    self.analytics.update(event_id, data)
+                    analytics_pending = True
+                if journal:
+                    for previous, _, _ in earlier:
+                        journal.update(previous, checkpoint=False)
+                    journal.update(data)
+                else:
+                    self._write(data, filename)
+            except Exception as e:
+                if self.metrics:
+                    self.metrics.inc("write_errors")
+                self.log(f"Error saving data: {e}")
+            finally:
+                with self._condition:
+                    queue_empty = not self._pending
+                if analytics_pending and queue_empty:
+                    # One vectorized tick per burst of snapshots
+                    analytics_pending = False
+                    self._tick_analytics()
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+    
+    def _record_history(self, snapshots):
+        for data, event_id, submitted in snapshots:
+            if event_id is None:
+                continue
+            try:
+                self.history.record(event_id, data, timestamp=submitted)
+            except Exception as e:
+                self.log(f"Error recording odds history: {e}")
+    
+    def _tick_analytics(self):
+        try:
+            start = time.perf_counter()
+            self.analytics.tick()
+            if self.metrics:
+                self.metrics.observe("analytics", time.perf_counter() - start)
+        except Exception as e:
+            self.log(f"Error in odds analytics: {e}")
+    
+    def _write(self, data, filename):
+        """Write one snapshot unless its markets are unchanged"""
+        digest = hashlib.sha1(
+            json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        ).digest()
+        now = time.monotonic()
+        if self._last_hash.get(filename) == digest:
+            stale = (self.refresh_interval is not None
+                     and now - self._last_write[filename] >= self.refresh_interval)
+            if not stale:
+                self.skipped += 1
+                return
+        if self.metrics:
+            with self.metrics.span("serialize"):
+                payload = serialize_snapshot(data, self.compact)
+            with self.metrics.span("write"):
+                atomic_write(filename, payload)
+            if self.binary:
+                with self.metrics.span("serialize"):
+                    payload = serialize_binary_snapshot(data)
+                with self.metrics.span("write"):
+                    atomic_write(binary_snapshot_file(filename), payload)
+        else:
+            write_snapshot(data, filename, self.compact, self.binary)
+        self._last_hash[filename] = digest
+        self._last_write[filename] = now
+        self.written += 1
+
+
+def outcome_index(data):
+    """
+    Flatten market data into a lookup keyed by (market_id, market_part, outcome text)
+    
+    Args:
+        data (list): Markets returned by scrape_market_titles
+        
+    Returns:
+        dict: Key tuple -> (legend, odds)
+    """
+    index = {}
+    for market in data:
+        for outcome in market["outcomes"]:
+            key = (market["market_id"], market["market_part"], outcome["text"])
+            index[key] = (market["legend"], outcome["odds"])
+    return index
+
+
+def diff_outcomes(previous, current):
+    """
+    Compare two outcome indexes
+    
+    Args:
+        previous (dict): Index of the previous snapshot
+        current (dict): Index of the current snapshot
+        
+    Returns:
+        list: Change dicts with op "add", "remove" or "change"; a change of the
+            odds carries prev_odds, a renamed market prev_legend
+    """
+    changes = []
+    for key, (legend, odds) in current.items():
+        if key not in previous:
+            changes.append(_change("add", key, legend, odds))
+        elif previous[key] != (legend, odds):
+            prev_legend, prev_odds = previous[key]
+            change = _change("change", key, legend, odds)
+            if prev_odds != odds:
+                change["prev_odds"] = prev_odds
+            if prev_legend != legend:
+                change["prev_legend"] = prev_legend
+            changes.append(change)
+    for key, (legend, odds) in previous.items():
+        if key not in current:
+            changes.append(_change("remove", key, legend, odds))
+    return changes
+
+
+def _change(op, key, legend, odds):
+    market_id, market_part, text = key
+    return {
+        "op": op,
+        "market_id": market_id,
+        "market_part": market_part,
+        "legend": legend,
+        "text": text,
+        "odds": odds
+    }
+
+
+class DeltaJournal:
+    """
+    Append-only JSONL change journal next to the full snapshot file
+    
+    Only added, removed and changed outcomes are appended to the journal.
+    The full snapshot is rewritten when something changed, or at the latest
+    every checkpoint_interval seconds.
+    """
+    
+    def __init__(self, snapshot_file, journal_file=None, checkpoint_interval=60,
+                 max_journal_bytes=10 * 1024 * 1024, backup_count=5, compact=False, binary=False):
+        """
+        Initialize the delta journal
+        
+        Args:
+            snapshot_file (str): Full snapshot JSON file
+            journal_file (str): JSONL journal, defaults to the snapshot name with .jsonl
+            checkpoint_interval (float): Maximum seconds between snapshot rewrites
+            max_journal_bytes (int): Rotate the journal once it grows past this size
+            backup_count (int): Number of rotated journals to keep
+            compact (bool): Write the snapshot as compact JSON
+            binary (bool): Also write the binary columnar snapshot at each checkpoint
+        """
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file or os.path.splitext(snapshot_file)[0] + ".jsonl"
+        self.checkpoint_interval = checkpoint_interval
+        self.max_journal_bytes = max_journal_bytes
+        self.backup_count = backup_count
+        self.compact = compact
+        self.binary = binary
+        self.previous = None
+        self.last_checkpoint = 0.0
+        self._unwritten = False
+    
+    def update(self, data, checkpoint=True):
+        """
+        Record a new snapshot
+        
+        Args:
+            data (list): Markets returned by scrape_market_titles
+            checkpoint (bool): Also rewrite the full snapshot if due; False only appends
+                the changes, for snapshots that a newer one follows right away
+            
+        Returns:
+            list: The changes appended to the journal
+        """
+        current = outcome_index(data)
+        if self.previous is None:
+            changes = diff_outcomes({}, current)
+        else:
+            changes = diff_outcomes(self.previous, current)
+        self.previous = current
+        
+        if changes:
+            self._append(changes)
+            self._unwritten = True
+        if not checkpoint:
+            return changes
+        
+        now = time.monotonic()
+        if self._unwritten or now - self.last_checkpoint >= self.checkpoint_interval:
+            write_snapshot(data, self.snapshot_file, self.compact, self.binary)
+            self.last_checkpoint = now
+            self._unwritten = False
+        
+        return changes
+    
+    def _append(self, changes):
+        """Append change lines to the journal, rotating it when it gets too big"""
+        self._rotate_if_needed()
+        ts = time.time()
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            for change in changes:
+                change["ts"] = ts
+                f.write(json.dumps(change, ensure_ascii=False, separators=(',', ':')))
+                f.write("\n")
+    
+    def _rotate_if_needed(self):
+        try:
+            size = os.path.getsize(self.journal_file)
+        except OSError:
+            return
+        if size < self.max_journal_bytes:
+            return
+        # journal.jsonl -> journal.jsonl.1 -> journal.jsonl.2 ...
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.journal_file}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.journal_file}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.journal_file, f"{self.journal_file}.1")
+        else:
+            os.remove(self.journal_file)
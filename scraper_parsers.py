@@ -0,0 +1,266 @@
+import re
+from scraper_model import MarketList
+
+# Market ids and parts are encoded as classes on the <article>
+MARKET_CLASS_RE = re.compile(r'^Market--(Id|Part)-(.*)$')
+
+
+def market_classes(classes):
+    """
+    Pull the market id and part out of an article's class list in a single pass
+
+    Args:
+        classes (list): Class names of the market <article>
+
+    Returns:
+        tuple: (market_id, market_part), None for any that is missing
+    """
+    market_id = None
+    market_part = None
+    for cls in classes:
+        match = MARKET_CLASS_RE.match(cls)
+        if not match:
+            continue
+        if match.group(1) == 'Id':
+            if market_id is None:
+                market_id = match.group(2)
+        elif market_part is None:
+            market_part = match.group(2)
+        if market_id is not None and market_part is not None:
+            break
+    return market_id, market_part
+
+
+class MarketParser:
+    """
+    Base class for parser engines turning a page snapshot into market dicts
+    """
+
+    name = None
+
+    def parse(self, html_snapshot):
+        """
+        Parse the markets out of an HTML snapshot of the page
+
+        Args:
+            html_snapshot (str): innerHTML of the page body
+
+        Returns:
+            MarketList: Market dicts with market_id, market_part, legend and outcomes
+        """
+        raise NotImplementedError
+
+    def parse_article(self, article_html):
+        """
+        Parse a single market <article>
+
+        Args:
+            article_html (str): outerHTML of the article
+
+        Returns:
+            tuple: Every market found in the article, usually one (empty if it has no outcomes)
+        """
+        return tuple(self.parse(article_html))
+
+
+def _copy_market(market):
+    """Copy of a cached market dict that the caller is free to modify"""
+    market = dict(market)
+    market["outcomes"] = [dict(outcome) for outcome in market["outcomes"]]
+    return market
+
+
+class BeautifulSoupMarketParser(MarketParser):
+    """
+    Pure-Python fallback engine using BeautifulSoup with html.parser
+    """
+
+    name = "bs4"
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        self._soup = BeautifulSoup
+
+    def parse(self, html_snapshot):
+        soup = self._soup(html_snapshot, "html.parser")
+
+        bet_list = MarketList()
+
+        # find all <article> elements in the snapshot
+        for article in soup.select("article"):
+            # get legend text safely
+            legend_tag = article.select_one(".Market__Legend")
+            legend_text = legend_tag.get_text(strip=True) if legend_tag else ""
+
+            outcomes_list = []
+            for outcome in article.select(".Market__OddsGroupItem"):
+                text_tag = outcome.select_one(".OddsButton__Text")
+                odds_tag = outcome.select_one(".OddsButton__Odds")
+                if text_tag and odds_tag:
+                    outcomes_list.append({
+                        "text": text_tag.get_text(strip=True),
+                        "odds": odds_tag.get_text(strip=True)
+                    })
+
+            if outcomes_list:
+                market_id, market_part = market_classes(article.get("class", []))
+                bet_list.append({
+                    "market_id": market_id,
+                    "market_part": market_part,
+                    "legend": legend_text,
+                    "outcomes": outcomes_list
+                })
+
+        return bet_list
+
+
+def _class_xpath(class_name, first=False):
+    """XPath step matching descendants carrying class_name, like a CSS .class selector"""
+    step = f".//*[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+    return f"({step})[1]" if first else step
+
+
+class LxmlMarketParser(MarketParser):
+    """
+    lxml engine with XPath expressions compiled once and reused across cycles
+    """
+
+    name = "lxml"
+
+    def __init__(self):
+        # Imported here so a missing lxml only disables this engine
+        from lxml import etree
+        self._fromstring = etree.fromstring
+        self._html_parser = etree.HTMLParser()
+        self._articles = etree.XPath("//article")
+        self._legend = etree.XPath(_class_xpath("Market__Legend", first=True))
+        self._outcomes = etree.XPath(_class_xpath("Market__OddsGroupItem"))
+        self._outcome_text = etree.XPath(_class_xpath("OddsButton__Text", first=True))
+        self._outcome_odds = etree.XPath(_class_xpath("OddsButton__Odds", first=True))
+        self._texts = etree.XPath(".//text()")
+
+    def _text(self, element):
+        """Equivalent of BeautifulSoup's get_text(strip=True)"""
+        return "".join(t.strip() for t in self._texts(element))
+
+    def parse(self, html_snapshot):
+        if not html_snapshot or not html_snapshot.strip():
+            return MarketList()
+        root = self._fromstring(html_snapshot, self._html_parser)
+        if root is None:
+            return MarketList()
+
+        bet_list = MarketList()
+
+        for article in self._articles(root):
+            legend_tag = self._legend(article)
+            legend_text = self._text(legend_tag[0]) if legend_tag else ""
+
+            outcomes_list = []
+            for outcome in self._outcomes(article):
+                text_tag = self._outcome_text(outcome)
+                odds_tag = self._outcome_odds(outcome)
+                if text_tag and odds_tag:
+                    outcomes_list.append({
+                        "text": self._text(text_tag[0]),
+                        "odds": self._text(odds_tag[0])
+                    })
+
+            if outcomes_list:
+                market_id, market_part = market_classes(article.get("class", "").split())
+                bet_list.append({
+                    "market_id": market_id,
+                    "market_part": market_part,
+                    "legend": legend_text,
+                    "outcomes": outcomes_list
+                })
+
+        return bet_list
+
+
+class MarketCache:
+    """
+    Parsed markets of one page, keyed by market and the fingerprint of its article
+
+    Fed by INCREMENTAL_SNAPSHOT_SCRIPT, which only ships the HTML of articles
+    whose fingerprint is not in fingerprints(). Unchanged markets are served
+    from the cache, so a cycle only parses the markets that changed. Markets
+    that left the page are evicted on the next update.
+
+    Every update hands out copies of the cached market dicts, so callers may
+    modify them without corrupting later cycles.
+    """
+
+    def __init__(self, parser):
+        """
+        Args:
+            parser (MarketParser): Engine parsing the changed articles
+        """
+        self.parser = parser
+        self._entries = {}
+        self.hits = 0
+        self.parsed = 0
+        self.evicted = 0
+
+    def fingerprints(self):
+        """
+        Returns:
+            dict: Key -> fingerprint of every cached article
+        """
+        return {key: entry[0] for key, entry in self._entries.items()}
+
+    def update(self, articles):
+        """
+        Apply one incremental snapshot
+
+        Args:
+            articles (list): [key, fingerprint] per article in page order, with the
+                article HTML as third item when it changed
+
+        Returns:
+            MarketList: Market dicts in page order
+        """
+        entries = {}
+        bet_list = MarketList()
+        for article in articles:
+            key, fingerprint = article[0], article[1]
+            if len(article) > 2:
+                markets = self.parser.parse_article(article[2])
+                self.parsed += 1
+            else:
+                markets = self._entries[key][1]
+                self.hits += 1
+            entries[key] = (fingerprint, markets)
+            bet_list.extend(_copy_market(market) for market in markets)
+        self.evicted += len(self._entries.keys() - entries.keys())
+        self._entries = entries
+        return bet_list
+
+    def clear(self):
+        """Forget every cached market, e.g. when the page changes"""
+        self._entries = {}
+
+
+PARSER_ENGINES = {
+    "lxml": LxmlMarketParser,
+    "bs4": BeautifulSoupMarketParser,
+}
+
+
+def get_market_parser(name="lxml"):
+    """
+    Create a parser engine by name, falling back to BeautifulSoup if lxml is unavailable
+
+    Args:
+        name (str): "lxml" or "bs4"
+
+    Returns:
+        MarketParser: The parser engine instance
+    """
+    if name not in PARSER_ENGINES:
+        raise ValueError(f"Unknown parser engine: {name}")
+    try:
+        return PARSER_ENGINES[name]()
+    except ImportError as e:
+        print(f"Parser engine '{name}' unavailable ({e}), falling back to bs4")
+        return BeautifulSoupMarketParser()
@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Parser engine of a worker process, created once by the pool initializer
+_worker_parser = None
+
+
+def _init_worker(parser_engine):
+    global _worker_parser
+    from scraper_parsers import get_market_parser
+    _worker_parser = get_market_parser(parser_engine)
+
+
+def _parse_snapshot(html_snapshot):
+    return _worker_parser.parse(html_snapshot)
+
+
+class _EventOrder:
+    """Sequence numbers and finished results of one event, for in-order delivery"""
+
+    def __init__(self):
+        self.next_seq = 0
+        self.deliver_seq = 0
+        self.done = {}
+        self.delivery_lock = threading.Lock()
+
+
+class ParsePipeline:
+    """
+    Parse raw page snapshots in a pool of worker processes
+
+    Browser- and network-facing threads only capture snapshots and submit
+    them; the parsing runs in separate processes, so it is not serialized by
+    the GIL and spreads over all cores. Results are handed back per event in
+    submission order, even if a later snapshot of the same event finishes
+    first.
+
+    At most max_pending snapshots are queued or being parsed. When that limit
+    is reached, submit() blocks until a worker frees up, or with block=False
+    drops the snapshot so the caller can move on and capture a newer one.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None, parser_engine="lxml", block=True,
+                 log=print, metrics=None):
+        """
+        Initialize the pipeline
+
+        Args:
+            max_workers (int): Parser processes, defaults to the number of CPUs
+            max_pending (int): Snapshots queued or in progress, defaults to 2 per worker
+            parser_engine (str): "lxml" or "bs4"
+            block (bool): Wait for a free slot when max_pending is reached instead of dropping
+            log (callable): Function receiving log messages
+            metrics (Metrics): Collector for the "pipeline" stage and market counters, optional
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.max_workers * 2
+        self.block = block
+        self.log = log
+        self.metrics = metrics
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                             initargs=(parser_engine,))
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._events = {}
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, event_id, html_snapshot, callback):
+        """
+        Queue a snapshot for parsing
+
+        Args:
+            event_id (str): Event the snapshot belongs to
+            html_snapshot (str): Raw HTML of the page or market container
+            callback (callable): Called with the market list (None if parsing failed),
+                in submission order per event, from a pipeline thread
+
+        Returns:
+            bool: False if the snapshot was dropped because max_pending was reached
+        """
+        if not self._slots.acquire(blocking=self.block):
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            order = self._events.get(event_id)
+            if order is None:
+                order = self._events[event_id] = _EventOrder()
+            seq = order.next_seq
+            order.next_seq += 1
+            self.submitted += 1
+            self._pending += 1
+        submitted_at = time.perf_counter()
+        try:
+            future = self._executor.submit(_parse_snapshot, html_snapshot)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+                self._idle.notify_all()
+            self._slots.release()
+            raise
+        future.add_done_callback(
+            lambda f: self._on_done(order, seq, callback, f, submitted_at)
+        )
+        return True
+
+    def _on_done(self, order, seq, callback, future, submitted_at):
+        self._slots.release()
+        try:
+            markets = future.result()
+        except Exception as e:
+            markets = None
+            with self._lock:
+                self.failed += 1
+            self.log(f"Error parsing snapshot: {e}")
+        if self.metrics:
+            self.metrics.observe("pipeline", time.perf_counter() - submitted_at)
+            self.metrics.record_markets(markets)
+
+        # Whoever completes the next expected sequence delivers everything that is ready
+        with order.delivery_lock:
+            order.done[seq] = (callback, markets)
+            while order.deliver_seq in order.done:
+                ready_callback, ready_markets = order.done.pop(order.deliver_seq)
+                order.deliver_seq += 1
+                try:
+                    ready_callback(ready_markets)
+                except Exception as e:
+                    self.log(f"Error handling parsed snapshot: {e}")
+                with self._lock:
+                    self.completed += 1
+                    self._pending -= 1
+                    self._idle.notify_all()
+
+    def drain(self, timeout=None):
+        """
+        Wait until every submitted snapshot has been delivered
+
+        Returns:
+            bool: False if the timeout passed first
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def forget(self, event_id):
+        """Drop the ordering state of an event that is no longer followed"""
+        with self._lock:
+            self._events.pop(event_id, None)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Submitted, completed, dropped and failed snapshot counts
+        """
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+
+    def close(self, wait=True):
+        """Stop the worker processes, finishing the queued snapshots if wait is True"""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,430 @@
+import os
+import re
+import threading
+import time
+import zlib
+from scraper_core import TippmixProScraper
+from scraper_output import DeltaJournal, SnapshotWriter
+from scraper_schedule import PollSchedule
+from scraper_watchdog import Watchdog
+from scraper_memory import TabRecycler
+
+
+def event_id_from_url(url):
+    """
+    Extract the numeric TippmixPro event id from an event URL
+
+    Args:
+        url (str): Event URL, e.g. .../flyquest-spirit/279204529400057856/all
+
+    Returns:
+        str: The event id, or None if the URL has no numeric path segment
+    """
+    path = url.split('?', 1)[0].rstrip('/')
+    if path.endswith('/all'):
+        path = path[:-len('/all')]
+    match = re.search(r'/(\d+)$', path)
+    return match.group(1) if match else None
+
+
+def output_name(event_id):
+    """
+    Make an event id safe to use in a file name
+
+    Args:
+        event_id (str): Numeric event id, or the whole URL when it has none
+
+    Returns:
+        str: The id with every character other than letters, digits, '.', '-' and '_'
+            replaced, shortened (with a hash of the full id) if very long
+    """
+    name = re.sub(r'[^\w.-]+', '_', event_id).strip('._') or "default"
+    if len(name) > 100:
+        name = f"{name[:80]}_{zlib.crc32(event_id.encode('utf-8')):08x}"
+    return name
+
+
+class EventWatcher:
+    """
+    One followed event: its own tab on a shared driver and its own output file
+    """
+
+    def __init__(self, url, output_file, scraper_options=None, schedule=None):
+        self.url = url
+        self.event_id = event_id_from_url(url) or url
+        self.output_file = output_file
+        self.journal = None
+        self.scraper = TippmixProScraper(use_selenium=True, **(scraper_options or {}))
+        self.schedule = schedule or PollSchedule(1)
+        self.watchdog = None
+        self.recycler = None
+        self.last_scrape = None
+        self.last_market_count = 0
+        self.last_markets = None
+        self.started_at = time.monotonic()
+        self.last_markets_at = None
+        self.error_count = 0
+        self.last_error = None
+        self.cycle_error = None
+
+
+class DriverSlot:
+    """
+    A single shared Chrome instance and the watchers whose tabs live in it
+
+    Selenium sessions are not thread-safe, so every slot is driven by exactly
+    one scheduler thread that rotates through its tabs.
+    """
+
+    def __init__(self, index, scraper_options=None):
+        self.index = index
+        self.owner = TippmixProScraper(use_selenium=True, **(scraper_options or {}))
+        self.watchers = []
+        self.adding = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def driver(self):
+        return self.owner.driver
+
+
+class WatcherPool:
+    """
+    Follow many TippmixPro events from one process
+
+    Events are opened as tabs spread across a small number of shared Chrome
+    drivers. Each driver gets a scheduler thread that rotates market snapshots
+    across its tabs and writes one output file per event.
+
+    With a ParsePipeline the scheduler threads only capture the market HTML
+    of each tab (html extraction mode) and the parsing runs in the pipeline's
+    worker processes, so many events are not limited to one core.
+    """
+
+    def __init__(self, output_dir, interval=1, max_drivers=2, log=print, store=None,
+                 scraper_options=None, adaptive=False, min_interval=None, max_interval=None,
+                 parse_pipeline=None, binary_output=False, history=None, tab_memory_budget_mb=None,
+                 analytics=None, compact_output=False, output_mode="snapshot", checkpoint_interval=60):
+        """
+        Initialize the watcher pool
+
+        Args:
+            output_dir (str): Directory for per-event output JSON files, None to only publish
+                to the store
+            interval (float): Seconds between two snapshots of the same event
+            max_drivers (int): Maximum number of Chrome instances to launch
+            log (callable): Function receiving log messages
+            store (SnapshotStore): Optional in-memory store the snapshots are published to
+            scraper_options (dict): Extra TippmixProScraper arguments, e.g. extraction_mode
+                or resource_policy
+            adaptive (bool): Poll events with moving odds faster and quiet ones slower
+            min_interval (float): Fastest adaptive interval, see PollSchedule
+            max_interval (float): Slowest adaptive interval, see PollSchedule
+            parse_pipeline (ParsePipeline): Parse html mode snapshots in worker processes
+            binary_output (bool): Also write a binary columnar snapshot next to each output file
+            history (HistoryStore): Record every event's odds moves
+            tab_memory_budget_mb (float): Recycle an event's tab once its JS heap exceeds this,
+                None disables recycling
+            analytics (OddsAnalytics): Feed every event's odds to the analytics
+            compact_output (bool): Write the output files without indentation
+            output_mode (str): "snapshot" or "delta" (a DeltaJournal next to each output file)
+            checkpoint_interval (float): Seconds between rewrites of an unchanged snapshot
+        """
+        self.output_dir = output_dir
+        self.interval = interval
+        self.adaptive = adaptive
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_drivers = max(1, int(max_drivers))
+        self.log = log
+        self.slots = []
+        self.watchers = {}
+        self.is_running = False
+        self.store = store
+        self.scraper_options = scraper_options or {}
+        self.parse_pipeline = parse_pipeline
+        self.tab_memory_budget_mb = tab_memory_budget_mb
+        self.analytics = analytics
+        self.binary_output = binary_output
+        self.compact_output = compact_output
+        self.output_mode = output_mode
+        self.checkpoint_interval = checkpoint_interval
+        self.writer = SnapshotWriter(compact=compact_output, refresh_interval=checkpoint_interval, log=log,
+                                     metrics=self.scraper_options.get("metrics"), binary=binary_output,
+                                     history=history, analytics=analytics)
+        self._lock = threading.Lock()
+        self._added = threading.Condition(self._lock)
+        self._adding = set()
+
+    def output_file_for(self, event_id):
+        """Per-event output file path, None without an output directory"""
+        if not self.output_dir:
+            return None
+        return os.path.join(self.output_dir, f"TippmixPro_{output_name(event_id)}.json")
+
+    def _relaunch_slot(self, slot):
+        """
+        Replace a slot's dead or hung driver and reopen all of its events in the new one
+
+        Called from the slot's scheduler thread with slot.lock held.
+        """
+        slot.owner.discard_driver()
+        if not slot.owner._setup_selenium_driver():
+            raise Exception("Failed to setup Selenium driver")
+        for i, watcher in enumerate(slot.watchers):
+            if watcher.recycler:
+                watcher.recycler.forget_replacement()
+            watcher.scraper.reset_page_state()
+            # The first watcher takes over the new driver's initial tab
+            watcher.scraper.attach_to_driver(slot.driver, new_tab=bool(i))
+            watcher.scraper.open_page(watcher.url)
+        self.log(f"Relaunched driver {slot.index} with {len(slot.watchers)} event(s)")
+
+    def _pick_slot(self):
+        """Return the least loaded slot, launching a new driver while under the limit"""
+        if len(self.slots) < self.max_drivers:
+            slot = DriverSlot(len(self.slots), self.scraper_options)
+            if not slot.owner._setup_selenium_driver():
+                raise Exception("Failed to setup Selenium driver")
+            self.slots.append(slot)
+            if self.is_running:
+                self._start_slot(slot)
+            return slot
+        return min(self.slots, key=lambda s: len(s.watchers) + s.adding)
+
+    def add_event(self, url):
+        """
+        Start following an event in a tab of one of the shared drivers
+
+        Args:
+            url (str): TippmixPro event URL ending with /all
+
+        Returns:
+            EventWatcher: The watcher, or the existing one if already followed
+        """
+        event_id = event_id_from_url(url) or url
+        with self._lock:
+            # An add of the same event still loading: wait for it instead of opening a second tab
+            while event_id in self._adding:
+                self._added.wait()
+            if event_id in self.watchers:
+                return self.watchers[event_id]
+            self._adding.add(event_id)
+            try:
+                slot = self._pick_slot()
+            except BaseException:
+                self._adding.discard(event_id)
+                self._added.notify_all()
+                raise
+            slot.adding += 1
+
+        # The page loads without the pool lock, so other events can be added, removed and scraped meanwhile
+        watcher = None
+        try:
+            schedule = PollSchedule(self.interval, adaptive=self.adaptive,
+                                    min_interval=self.min_interval, max_interval=self.max_interval)
+            watcher = EventWatcher(url, self.output_file_for(event_id), self.scraper_options, schedule)
+            if watcher.output_file and self.output_mode == "delta":
+                watcher.journal = DeltaJournal(watcher.output_file, checkpoint_interval=self.checkpoint_interval,
+                                               compact=self.compact_output, binary=self.binary_output)
+            with slot.lock:
+                # The first watcher of a fresh driver takes over its initial tab
+                first = not slot.watchers
+                watcher.scraper.attach_to_driver(slot.driver, new_tab=not first)
+                try:
+                    watcher.scraper.open_page(url)
+                except BaseException:
+                    # Don't leave the tab behind; the driver's only tab is parked instead of closed
+                    if first:
+                        watcher.scraper.park_page()
+                    else:
+                        watcher.scraper.close_page()
+                    raise
+                # Tabs share the slot's driver, so a relaunch reopens every event of the slot
+                watcher.watchdog = Watchdog(watcher.scraper, relaunch=lambda: self._relaunch_slot(slot),
+                                            log=lambda message: self.log(f"Event {watcher.event_id}: {message}"))
+                if self.tab_memory_budget_mb:
+                    watcher.recycler = TabRecycler(watcher.scraper, heap_budget_mb=self.tab_memory_budget_mb,
+                                                   log=lambda message: self.log(f"Event {watcher.event_id}: {message}"))
+                slot.watchers.append(watcher)
+        finally:
+            with self._lock:
+                slot.adding -= 1
+                self._adding.discard(event_id)
+                if watcher is not None and watcher in slot.watchers:
+                    self.watchers[event_id] = watcher
+                self._added.notify_all()
+        self.log(f"Watching event {event_id} in driver {slot.index}")
+        return watcher
+
+    def remove_event(self, event_id):
+        """
+        Stop following an event and close its tab
+
+        Args:
+            event_id (str): Event id as returned by event_id_from_url
+        """
+        with self._lock:
+            while event_id in self._adding:
+                self._added.wait()
+            watcher = self.watchers.pop(event_id, None)
+            if not watcher:
+                return
+            for slot in self.slots:
+                if watcher in slot.watchers:
+                    with slot.lock:
+                        slot.watchers.remove(watcher)
+                        if watcher.recycler:
+                            watcher.recycler.cancel()
+                        # Keep at least one tab open so the driver stays alive, but without the live page
+                        if slot.watchers:
+                            watcher.scraper.close_page()
+                        else:
+                            watcher.scraper.park_page()
+                    break
+            if self.store:
+                self.store.remove(event_id)
+            if self.parse_pipeline:
+                self.parse_pipeline.forget(event_id)
+            if self.analytics:
+                self.analytics.remove_event(event_id)
+            self.log(f"Stopped watching event {event_id}")
+
+    def start(self, urls=()):
+        """
+        Open the given events and start the per-driver scheduler threads
+
+        Args:
+            urls (iterable): Event URLs to follow
+        """
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+        self.is_running = True
+        self.writer.start()
+        for url in urls:
+            try:
+                self.add_event(url)
+            except Exception as e:
+                self.log(f"Error opening event {url}: {e}")
+        for slot in self.slots:
+            if not slot.thread:
+                self._start_slot(slot)
+
+    def _start_slot(self, slot):
+        slot.thread = threading.Thread(target=self._slot_worker, args=(slot,), daemon=True)
+        slot.thread.start()
+
+    def stop(self):
+        """Stop all scheduler threads and quit every driver"""
+        self.is_running = False
+        for slot in self.slots:
+            if slot.thread:
+                slot.thread.join(timeout=self.interval + 15)
+            slot.owner.close_page()
+        if self.parse_pipeline:
+            # Let snapshots still being parsed reach the writer
+            self.parse_pipeline.drain(timeout=15)
+        self.writer.stop()
+        self.slots = []
+        self.watchers = {}
+
+    def _slot_worker(self, slot):
+        """Scheduler thread: rotate snapshots across the tabs of one driver"""
+        while self.is_running:
+            with slot.lock:
+                watchers = list(slot.watchers)
+
+            now = time.monotonic()
+            due = [w for w in watchers if w.schedule.due(now)]
+            # Serve the most overdue tab first so no event starves
+            due.sort(key=lambda w: w.schedule.next_due)
+
+            for watcher in due:
+                if not self.is_running:
+                    break
+                with slot.lock:
+                    if watcher not in slot.watchers:
+                        continue
+                    data = self._scrape_watcher(watcher)
+                    # A pipelined snapshot has nothing to judge until its first parse is in
+                    awaiting_parse = (self.parse_pipeline and watcher.scraper.extraction_mode == "html"
+                                      and watcher.last_markets is None and watcher.cycle_error is None)
+                    if self.is_running and watcher.watchdog and not awaiting_parse:
+                        watcher.watchdog.observe(data, watcher.cycle_error)
+                    if self.is_running and watcher.recycler:
+                        watcher.recycler.check()
+                watcher.schedule.complete(data)
+
+            if watchers:
+                wait = min(w.schedule.next_due for w in watchers) - time.monotonic()
+            else:
+                wait = self.interval
+            if wait > 0:
+                time.sleep(min(wait, self.interval))
+
+    def _scrape_watcher(self, watcher):
+        """
+        Take one snapshot of an event and write its output file
+
+        Returns:
+            list: The scraped markets, None if the scrape failed
+        """
+        watcher.cycle_error = None
+        try:
+            if self.parse_pipeline and watcher.scraper.extraction_mode == "html":
+                html_snapshot, _ = watcher.scraper.capture_snapshot()
+                watcher.last_scrape = time.time()
+                self.parse_pipeline.submit(watcher.event_id, html_snapshot,
+                                           lambda markets: self._publish(watcher, markets))
+                # Parsed asynchronously: the schedule adapts to the last result already in
+                return watcher.last_markets
+            data = watcher.scraper.scrape_market_titles()
+            watcher.last_scrape = time.time()
+            self._publish(watcher, data)
+            return data
+        except Exception as e:
+            watcher.error_count += 1
+            watcher.last_error = str(e)
+            watcher.cycle_error = e
+            self.log(f"Error scraping event {watcher.event_id}: {e}")
+            return None
+
+    def _publish(self, watcher, data):
+        """Write and publish a parsed snapshot of an event"""
+        if not data:
+            return
+        watcher.last_markets = data
+        watcher.last_markets_at = time.monotonic()
+        watcher.last_market_count = len(data)
+        if watcher.output_file:
+            self.writer.submit(data, watcher.output_file, journal=watcher.journal, event_id=watcher.event_id)
+        if self.store:
+            self.store.publish(watcher.event_id, data)
+
+    def status(self):
+        """
+        Summarize the state of every followed event
+
+        Returns:
+            list: One dict per event with driver, market count, error and downtime info
+        """
+        result = []
+        for slot in self.slots:
+            for watcher in list(slot.watchers):
+                result.append({
+                    "event_id": watcher.event_id,
+                    "url": watcher.url,
+                    "driver": slot.index,
+                    "output_file": watcher.output_file,
+                    "last_scrape": watcher.last_scrape,
+                    "markets": watcher.last_market_count,
+                    "interval": watcher.schedule.interval,
+                    "skipped_cycles": watcher.schedule.skipped,
+                    "errors": watcher.error_count,
+                    "last_error": watcher.last_error,
+                    "downtime": watcher.watchdog.total_downtime() if watcher.watchdog else 0.0,
+                    "recoveries": dict(watcher.watchdog.recoveries) if watcher.watchdog else {},
+                    "memory": watcher.recycler.status() if watcher.recycler else None,
+                })
+        return result
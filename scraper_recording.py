@@ -0,0 +1,365 @@
+import bisect
+import lzma
+import os
+import struct
+import threading
+import time
+import zlib
+
+ARCHIVE_MAGIC = b"TMPR"
+ARCHIVE_VERSION = 1
+# magic, version
+ARCHIVE_HEADER = struct.Struct("<4sH")
+# codec, compressed size, frames, first and last timestamp
+CHUNK_HEADER = struct.Struct("<BIIdd")
+# timestamp, key length, snapshot length (followed by the key and snapshot bytes)
+FRAME_HEADER = struct.Struct("<dII")
+
+CODECS = {
+    "zlib": (1, lambda data: zlib.compress(data, 6), zlib.decompress),
+    "lzma": (2, lambda data: lzma.compress(data, preset=1), lzma.decompress),
+}
+_DECOMPRESSORS = {code: decompress for code, _, decompress in CODECS.values()}
+
+
+class SnapshotRecorder:
+    """
+    Record raw page snapshots into a compressed, chunked archive
+
+    Frames are (timestamp, key, snapshot) where the key is the page URL and
+    the snapshot the HTML the scraper parsed. A frame identical to the
+    previous one of the same key is dropped. Frames are collected into
+    chunks of about chunk_bytes raw bytes, which are compressed and appended
+    on a background thread, so record() costs the scraping thread only a
+    string comparison. Every chunk header carries its time span, which makes
+    the archive seekable by time without decompressing what comes before.
+
+    A file cut short (e.g. by a crash) stays readable up to its last
+    complete chunk; recording into an existing archive appends to it.
+    """
+
+    def __init__(self, filename, codec="zlib", chunk_bytes=4 * 1024 * 1024, log=print):
+        """
+        Open (or create) an archive for recording
+
+        Args:
+            filename (str): Archive file
+            codec (str): "zlib" (fast) or "lzma" (smaller)
+            chunk_bytes (int): Raw bytes per compressed chunk
+            log (callable): Function receiving error messages
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec: {codec}")
+        self.filename = filename
+        self.codec = codec
+        self.chunk_bytes = chunk_bytes
+        self.log = log
+        self.frames = 0
+        self.duplicates = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self._last = {}
+        self._frames = []
+        self._pending_bytes = 0
+        self._first_ts = None
+        self._last_ts = 0.0
+        self._chunks = []
+        self._condition = threading.Condition()
+        self._running = True
+        self._busy = False
+
+        if os.path.exists(filename) and os.path.getsize(filename):
+            # Drop a torn last chunk before appending after it
+            end = SnapshotArchive(filename).end_offset
+            with open(filename, "r+b") as f:
+                f.truncate(end)
+            self._file = open(filename, "ab")
+        else:
+            self._file = open(filename, "wb")
+            self._file.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION))
+            self._file.flush()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def record(self, key, snapshot, timestamp=None):
+        """
+        Add a snapshot to the archive unless it repeats the previous one of the same key
+
+        Args:
+            key (str): Page the snapshot was taken from, usually its URL
+            snapshot (str): Raw HTML
+            timestamp (float): Unix time, defaults to now
+
+        Returns:
+            bool: False if the frame was a duplicate and dropped
+        """
+        with self._condition:
+            if self._last.get(key) == snapshot:
+                self.duplicates += 1
+                return False
+            self._last[key] = snapshot
+            # Frames stay in time order, even if the clock steps back
+            ts = max(timestamp if timestamp is not None else time.time(), self._last_ts)
+            self._last_ts = ts
+            key_bytes = key.encode("utf-8")
+            data = snapshot.encode("utf-8")
+            self._frames.append(FRAME_HEADER.pack(ts, len(key_bytes), len(data)) + key_bytes + data)
+            if self._first_ts is None:
+                self._first_ts = ts
+            self._pending_bytes += FRAME_HEADER.size + len(key_bytes) + len(data)
+            self.frames += 1
+            self.raw_bytes += len(data)
+            if self._pending_bytes >= self.chunk_bytes:
+                self._seal()
+            return True
+
+    def _seal(self):
+        """Hand the collected frames to the compression thread (lock held)"""
+        if not self._frames:
+            return
+        self._chunks.append((self._frames, self._first_ts, self._last_ts))
+        self._frames = []
+        self._pending_bytes = 0
+        self._first_ts = None
+        self._condition.notify_all()
+
+    def _worker(self):
+        code, compress, _ = CODECS[self.codec]
+        while True:
+            with self._condition:
+                while self._running and not self._chunks:
+                    self._condition.wait()
+                if not self._chunks:
+                    return
+                frames, first_ts, last_ts = self._chunks.pop(0)
+                self._busy = True
+            try:
+                payload = compress(b"".join(frames))
+                self._file.write(CHUNK_HEADER.pack(code, len(payload), len(frames), first_ts, last_ts))
+                self._file.write(payload)
+                self._file.flush()
+                with self._condition:
+                    self.compressed_bytes += len(payload)
+            except Exception as e:
+                self.log(f"Error writing recording chunk: {e}")
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def flush(self):
+        """Write every recorded frame to the archive"""
+        with self._condition:
+            self._seal()
+            while self._chunks or self._busy:
+                self._condition.wait()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Frame, duplicate and byte counts and the compression ratio so far
+        """
+        with self._condition:
+            return {
+                "frames": self.frames,
+                "duplicates": self.duplicates,
+                "raw_bytes": self.raw_bytes,
+                "compressed_bytes": self.compressed_bytes,
+                "ratio": self.raw_bytes / self.compressed_bytes if self.compressed_bytes else None,
+            }
+
+    def close(self):
+        """Write the remaining frames and close the archive"""
+        with self._condition:
+            self._seal()
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join()
+        self._file.close()
+
+
+class SnapshotArchive:
+    """
+    Read a recording made by SnapshotRecorder
+
+    Opening the archive only reads the chunk headers; frames() binary-searches
+    the chunks by time and decompresses one chunk at a time from there.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        # (offset of the payload, codec, compressed size, frames, first ts, last ts)
+        self.chunks = []
+        with open(filename, "rb") as f:
+            header = f.read(ARCHIVE_HEADER.size)
+            if len(header) < ARCHIVE_HEADER.size:
+                raise ValueError("Not a snapshot recording")
+            magic, version = ARCHIVE_HEADER.unpack(header)
+            if magic != ARCHIVE_MAGIC:
+                raise ValueError("Not a snapshot recording")
+            if version != ARCHIVE_VERSION:
+                raise ValueError(f"Unsupported recording version: {version}")
+            size = os.fstat(f.fileno()).st_size
+            offset = ARCHIVE_HEADER.size
+            while offset + CHUNK_HEADER.size <= size:
+                f.seek(offset)
+                code, length, count, first_ts, last_ts = CHUNK_HEADER.unpack(f.read(CHUNK_HEADER.size))
+                payload_offset = offset + CHUNK_HEADER.size
+                if payload_offset + length > size or code not in _DECOMPRESSORS:
+                    # Torn last chunk
+                    break
+                self.chunks.append((payload_offset, code, length, count, first_ts, last_ts))
+                offset = payload_offset + length
+        self.end_offset = offset
+        self._chunk_ends = [chunk[5] for chunk in self.chunks]
+
+    def __len__(self):
+        return sum(chunk[3] for chunk in self.chunks)
+
+    @property
+    def start_time(self):
+        return self.chunks[0][4] if self.chunks else None
+
+    @property
+    def end_time(self):
+        return self.chunks[-1][5] if self.chunks else None
+
+    def frames(self, start=None, end=None, keys=None):
+        """
+        Iterate over the recorded frames in time order
+
+        Args:
+            start (float): Unix time to start at, inclusive; None for the beginning
+            end (float): Unix time to stop at, exclusive; None for the end
+            keys (iterable): Only frames of these keys, None for all
+
+        Yields:
+            tuple: (timestamp, key, snapshot)
+        """
+        wanted = set(keys) if keys is not None else None
+        first = bisect.bisect_left(self._chunk_ends, start) if start is not None else 0
+        with open(self.filename, "rb") as f:
+            for payload_offset, code, length, count, first_ts, last_ts in self.chunks[first:]:
+                if end is not None and first_ts >= end:
+                    return
+                f.seek(payload_offset)
+                data = _DECOMPRESSORS[code](f.read(length))
+                view = memoryview(data)
+                offset = 0
+                for _ in range(count):
+                    ts, key_length, length_ = FRAME_HEADER.unpack_from(data, offset)
+                    offset += FRAME_HEADER.size
+                    key = bytes(view[offset:offset + key_length]).decode("utf-8")
+                    offset += key_length
+                    if (start is None or ts >= start) and (end is None or ts < end) \
+                            and (wanted is None or key in wanted):
+                        yield ts, key, bytes(view[offset:offset + length_]).decode("utf-8")
+                    elif end is not None and ts >= end:
+                        return
+                    offset += length_
+
+    def stats(self):
+        """
+        Returns:
+            dict: Chunk and frame counts, time span and archive size
+        """
+        return {
+            "chunks": len(self.chunks),
+            "frames": len(self),
+            "start": self.start_time,
+            "end": self.end_time,
+            "bytes": self.end_offset,
+        }
+
+
+class SnapshotReplayer:
+    """
+    Feed a recording back through the parsing and output path, without a browser
+
+    Frames are parsed with the same parser engines (or ParsePipeline) as
+    live snapshots and handed to a callback with their event id, at the
+    recorded pace times speed. speed=0 replays as fast as the pipeline goes,
+    which benchmarks the whole pipeline offline.
+    """
+
+    def __init__(self, filename, speed=1.0, parser_engine="lxml", parse_pipeline=None, metrics=None, log=print):
+        """
+        Initialize the replayer
+
+        Args:
+            filename (str): Recording made by SnapshotRecorder
+            speed (float): Playback speed, 1 for real time, 0 for as fast as possible
+            parser_engine (str): "lxml" or "bs4"
+            parse_pipeline (ParsePipeline): Parse the frames in worker processes
+            metrics (Metrics): Collector for the "parse" stage and market counters, optional
+            log (callable): Function receiving log messages
+        """
+        from scraper_parsers import get_market_parser
+
+        if speed < 0:
+            raise ValueError("Playback speed must not be negative")
+        self.archive = SnapshotArchive(filename)
+        self.speed = speed
+        self.parse_pipeline = parse_pipeline
+        self.parser = None if parse_pipeline else get_market_parser(parser_engine)
+        self.metrics = metrics
+        self.log = log
+        self.frames = 0
+
+    def run(self, callback, stop_event=None, start=None, end=None, keys=None):
+        """
+        Replay the recording
+
+        Args:
+            callback (callable): Called with (event_id, markets) for every parsed frame
+            stop_event (threading.Event): Stops the replay when set
+            start, end, keys: Select the frames, see SnapshotArchive.frames
+
+        Returns:
+            dict: Replayed frames, wall-clock seconds and the speed relative to real time
+        """
+        from scraper_pool import event_id_from_url
+
+        wall_start = time.monotonic()
+        first_ts = last_ts = None
+        self.frames = 0
+        for ts, key, snapshot in self.archive.frames(start, end, keys):
+            if stop_event is not None and stop_event.is_set():
+                break
+            if first_ts is None:
+                first_ts = ts
+            last_ts = ts
+            if self.speed:
+                delay = wall_start + (ts - first_ts) / self.speed - time.monotonic()
+                if delay > 0:
+                    if stop_event is not None:
+                        if stop_event.wait(delay):
+                            break
+                    else:
+                        time.sleep(delay)
+
+            event_id = event_id_from_url(key) or key
+            if self.parse_pipeline:
+                self.parse_pipeline.submit(
+                    event_id, snapshot,
+                    lambda markets, event_id=event_id: markets is not None and callback(event_id, markets)
+                )
+            else:
+                start_parse = time.perf_counter()
+                markets = self.parser.parse(snapshot)
+                if self.metrics:
+                    self.metrics.observe("parse", time.perf_counter() - start_parse)
+                    self.metrics.record_markets(markets)
+                callback(event_id, markets)
+            self.frames += 1
+
+        if self.parse_pipeline:
+            self.parse_pipeline.drain()
+        elapsed = time.monotonic() - wall_start
+        recorded = (last_ts - first_ts) if first_ts is not None else 0.0
+        return {
+            "frames": self.frames,
+            "elapsed_s": elapsed,
+            "recorded_s": recorded,
+            "realtime_factor": recorded / elapsed if elapsed else None,
+        }
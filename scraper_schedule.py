@@ -0,0 +1,136 @@
+import math
+import time
+from scraper_model import market_columns
+
+
+def valid_interval(value):
+    """True if value is a usable polling interval: finite and greater than 0"""
+    return math.isfinite(value) and value > 0
+
+
+def markets_suspended(markets):
+    """
+    Check whether an event currently offers no odds at all
+
+    Args:
+        markets (list): Markets as returned by scrape_market_titles (their odds are
+            parsed only once, see MarketList)
+
+    Returns:
+        bool: True if there are markets but none of their outcomes carries odds;
+            an empty list is a missing or failed page, not a suspension
+    """
+    if not markets:
+        return False
+    # NaN marks suspended odds
+    return all(odds != odds for odds in market_columns(markets).odds)
+
+
+class PollSchedule:
+    """
+    Deadline-based polling schedule for one event
+
+    Cycles run on fixed deadlines (start + n * interval) instead of sleeping
+    a full interval after the work, so the period does not drift by the
+    scrape time. A cycle that overruns one or more deadlines skips them
+    rather than running the missed cycles back to back.
+
+    In adaptive mode the interval shrinks while the event's odds are moving
+    and grows while they are quiet, up to max_interval for suspended events.
+    """
+
+    def __init__(self, interval, adaptive=False, min_interval=None, max_interval=None,
+                 speedup=0.5, backoff=1.5):
+        """
+        Initialize the schedule
+
+        Args:
+            interval (float): Base seconds between two cycles, fractions allowed
+            adaptive (bool): Adapt the interval to how much the odds move
+            min_interval (float): Fastest adaptive interval, defaults to interval / 4
+            max_interval (float): Slowest adaptive interval, defaults to interval * 8
+            speedup (float): Interval factor after a cycle that saw changes
+            backoff (float): Interval factor after a cycle without changes
+        """
+        if not valid_interval(interval):
+            raise ValueError("Polling interval must be a finite number greater than 0")
+        for bound in (min_interval, max_interval):
+            if bound is not None and not valid_interval(bound):
+                raise ValueError("Adaptive interval bounds must be finite numbers greater than 0")
+        self.base_interval = float(interval)
+        self.interval = self.base_interval
+        self.adaptive = adaptive
+        self.min_interval = float(min_interval) if min_interval else self.base_interval / 4
+        self.max_interval = float(max_interval) if max_interval else self.base_interval * 8
+        self.speedup = speedup
+        self.backoff = backoff
+        self.next_due = time.monotonic()
+        self.cycles = 0
+        self.skipped = 0
+        self.suspended = False
+        self._last_markets = None
+
+    def due(self, now=None):
+        """True if the next cycle should run now"""
+        return (now if now is not None else time.monotonic()) >= self.next_due
+
+    def remaining(self, now=None):
+        """Seconds until the next deadline, 0 if it already passed"""
+        return max(0.0, self.next_due - (now if now is not None else time.monotonic()))
+
+    def wait(self, stop_event=None):
+        """
+        Sleep until the next deadline
+
+        Args:
+            stop_event (threading.Event): Wakes the wait early when set
+
+        Returns:
+            bool: True if stop_event was set
+        """
+        remaining = self.remaining()
+        if stop_event is not None:
+            return stop_event.wait(remaining)
+        if remaining:
+            time.sleep(remaining)
+        return False
+
+    def complete(self, markets=None):
+        """
+        Finish a cycle: adapt the interval and move to the next deadline
+
+        Args:
+            markets (list): The cycle's markets, None if the cycle failed
+        """
+        self.cycles += 1
+        if self.adaptive and markets is not None:
+            self._adapt(markets)
+
+        self.next_due += self.interval
+        now = time.monotonic()
+        if self.next_due <= now:
+            # Overran: skip the missed deadlines instead of piling up cycles
+            missed = int((now - self.next_due) // self.interval) + 1
+            self.skipped += missed
+            self.next_due += missed * self.interval
+
+    def _adapt(self, markets):
+        was_suspended = self.suspended
+        self.suspended = markets_suspended(markets)
+        if self.suspended:
+            self.interval = self.max_interval
+        elif was_suspended:
+            # Betting reopened, odds are about to move
+            self.interval = self.base_interval
+        elif markets != self._last_markets:
+            self.interval = max(self.min_interval, self.interval * self.speedup)
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        self._last_markets = markets
+
+    def reset(self):
+        """Go back to the base interval with the next cycle due immediately"""
+        self.interval = self.base_interval
+        self.next_due = time.monotonic()
+        self.suspended = False
+        self._last_markets = None
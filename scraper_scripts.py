@@ -0,0 +1,197 @@
+# JavaScript snippets executed inside the TippmixPro page through Selenium.
+#
+# They mirror the parser engines in scraper_parsers, so only compact market
+# data travels over the WebDriver wire. textOf() matches BeautifulSoup's
+# get_text(strip=True): every text node is stripped and the pieces are joined
+# without a separator.
+
+MARKET_JS_HELPERS = """
+function textOf(el) {
+    var walker = document.createTreeWalker(el, NodeFilter.SHOW_TEXT | NodeFilter.SHOW_CDATA_SECTION);
+    var parts = [];
+    var node;
+    while ((node = walker.nextNode())) {
+        var t = node.nodeValue.trim();
+        if (t) { parts.push(t); }
+    }
+    return parts.join('');
+}
+function classValue(el, prefix) {
+    var classes = el.classList;
+    for (var i = 0; i < classes.length; i++) {
+        if (classes[i].indexOf(prefix) === 0) { return classes[i].split(prefix).join(''); }
+    }
+    return null;
+}
+function extractArticle(article) {
+    var legendTag = article.querySelector('.Market__Legend');
+    var outcomes = [];
+    var items = article.querySelectorAll('.Market__OddsGroupItem');
+    for (var o = 0; o < items.length; o++) {
+        var textTag = items[o].querySelector('.OddsButton__Text');
+        var oddsTag = items[o].querySelector('.OddsButton__Odds');
+        if (textTag && oddsTag) {
+            outcomes.push({"text": textOf(textTag), "odds": textOf(oddsTag)});
+        }
+    }
+    if (!outcomes.length) { return null; }
+    return {
+        "market_id": classValue(article, 'Market--Id-'),
+        "market_part": classValue(article, 'Market--Part-'),
+        "legend": legendTag ? textOf(legendTag) : "",
+        "outcomes": outcomes
+    };
+}
+"""
+
+# Full extraction of every market on the page
+MARKET_EXTRACTION_SCRIPT = MARKET_JS_HELPERS + """
+if (!document.body) { return null; }
+var result = [];
+var articles = document.body.querySelectorAll('article');
+for (var a = 0; a < articles.length; a++) {
+    var market = extractArticle(articles[a]);
+    if (market) { result.push(market); }
+}
+return result;
+"""
+
+# Installs a MutationObserver that buffers changed market <article> nodes.
+# Adding or removing whole articles is flagged as a structural change, which
+# makes the Python side fall back to a full extraction.
+# arguments[0]: CSS selector of the market container (falls back to body)
+INSTALL_OBSERVER_SCRIPT = """
+var state = window.__tmpMarketObserver;
+if (state && state.connected) { return false; }
+var target = document.querySelector(arguments[0]) || document.body;
+if (!target) { return false; }
+state = window.__tmpMarketObserver = {changed: new Set(), structural: false, waiters: [], connected: true};
+function touchesArticles(node) {
+    return node.nodeType === 1 && (node.tagName === 'ARTICLE' || node.querySelector('article') !== null);
+}
+state.observer = new MutationObserver(function(records) {
+    for (var r = 0; r < records.length; r++) {
+        var record = records[r];
+        var el = record.target.nodeType === 1 ? record.target : record.target.parentElement;
+        var article = el ? el.closest('article') : null;
+        if (article) { state.changed.add(article); }
+        if (record.type === 'childList') {
+            for (var i = 0; i < record.addedNodes.length; i++) {
+                if (touchesArticles(record.addedNodes[i])) { state.structural = true; }
+            }
+            for (var j = 0; j < record.removedNodes.length; j++) {
+                if (touchesArticles(record.removedNodes[j])) { state.structural = true; }
+            }
+        }
+    }
+    var waiters = state.waiters;
+    state.waiters = [];
+    for (var w = 0; w < waiters.length; w++) { waiters[w](); }
+});
+state.observer.observe(target, {subtree: true, childList: true, characterData: true,
+                                attributes: true, attributeFilter: ['class']});
+return true;
+"""
+
+# Async script: returns the buffered changes, waiting up to arguments[0] ms
+# for the first one. Returns null when the observer is gone (page reloaded).
+DRAIN_CHANGES_SCRIPT = MARKET_JS_HELPERS + """
+var done = arguments[arguments.length - 1];
+var timeoutMs = arguments[0];
+var state = window.__tmpMarketObserver;
+if (!state || !state.connected) { done(null); return; }
+function drain() {
+    var structural = state.structural;
+    var changed = Array.from(state.changed);
+    state.changed.clear();
+    state.structural = false;
+    if (structural) { done({"structural": true, "changes": []}); return; }
+    var changes = [];
+    for (var i = 0; i < changed.length; i++) {
+        var article = changed[i];
+        if (!article.isConnected) { structural = true; break; }
+        changes.push({
+            "market_id": classValue(article, 'Market--Id-'),
+            "market_part": classValue(article, 'Market--Part-'),
+            "market": extractArticle(article)
+        });
+    }
+    done({"structural": structural, "changes": structural ? [] : changes});
+}
+if (state.changed.size || state.structural) { drain(); return; }
+var timer = setTimeout(function() {
+    state.waiters = state.waiters.filter(function(w) { return w !== waiter; });
+    done({"structural": false, "changes": []});
+}, timeoutMs);
+var waiter = function() { clearTimeout(timer); drain(); };
+state.waiters.push(waiter);
+"""
+
+# Finds the element holding the markets: the element matching arguments[0]
+# when a selector is given, otherwise the closest common ancestor of all
+# market articles, so headers, menus and footers are left out.
+MARKET_CONTAINER_HELPERS = """
+function marketContainer(selector) {
+    if (selector) { return document.querySelector(selector); }
+    var articles = document.querySelectorAll('article');
+    if (!articles.length) { return null; }
+    var container = articles[0].parentElement;
+    for (var i = 1; i < articles.length && container; i++) {
+        while (container && !container.contains(articles[i])) { container = container.parentElement; }
+    }
+    return container;
+}
+"""
+
+# innerHTML of the market container, empty while no markets are on the page
+# arguments[0]: CSS selector of the market container, null to detect it
+CONTAINER_HTML_SCRIPT = MARKET_CONTAINER_HELPERS + """
+var container = marketContainer(arguments[0]);
+return container ? container.innerHTML : "";
+"""
+
+# Fingerprints every market article and ships the HTML of changed ones only.
+# Returns one [key, fingerprint] entry per article in page order, with the
+# article's outerHTML appended when the fingerprint differs from the known one.
+# The key is "<market id>|<market part>", suffixed with #n for duplicates.
+# arguments[0]: CSS selector of the market container, null to detect it
+# arguments[1]: known fingerprints by key
+INCREMENTAL_SNAPSHOT_SCRIPT = MARKET_JS_HELPERS + MARKET_CONTAINER_HELPERS + """
+// Two independent 32-bit hashes plus the length: a 32-bit hash alone collides
+// often enough over a long session to keep serving a stale market
+function fingerprint(html) {
+    var h1 = 0x811c9dc5, h2 = 0x9e3779b9;
+    for (var i = 0; i < html.length; i++) {
+        var c = html.charCodeAt(i);
+        h1 = Math.imul(h1 ^ c, 0x01000193);
+        h2 = Math.imul(h2 ^ c, 0x5bd1e995);
+        h2 ^= h2 >>> 15;
+    }
+    return (h1 >>> 0).toString(36) + '.' + (h2 >>> 0).toString(36) + ':' + html.length;
+}
+var container = marketContainer(arguments[0]);
+if (!container) { return []; }
+var known = arguments[1] || {};
+var articles = container.querySelectorAll('article');
+var seen = {};
+var result = [];
+for (var a = 0; a < articles.length; a++) {
+    var article = articles[a];
+    var key = (classValue(article, 'Market--Id-') || '') + '|' + (classValue(article, 'Market--Part-') || '');
+    var n = seen[key] || 0;
+    seen[key] = n + 1;
+    if (n) { key += '#' + n; }
+    var html = article.outerHTML;
+    var fp = fingerprint(html);
+    result.push(known[key] === fp ? [key, fp] : [key, fp, html]);
+}
+return result;
+"""
+
+# Absolute URLs of every link on the page, for live event discovery
+LIST_LINKS_SCRIPT = """
+var links = document.querySelectorAll('a[href]');
+var result = [];
+for (var i = 0; i < links.length; i++) { result.push(links[i].href); }
+return result;
+"""
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from scraper_output import build_snapshot, outcome_index, diff_outcomes
+
+
+class EventSnapshot:
+    """
+    Latest snapshot of one event plus a short history of its changes
+    """
+
+    def __init__(self, history_size):
+        self.version = 0
+        self.document = None
+        self.body = None
+        self.etag = None
+        self.index = {}
+        self.changes = deque(maxlen=history_size)
+
+
+class SnapshotStore:
+    """
+    In-memory store of the latest snapshot per event
+
+    Scrape loops publish() into it; the API server reads from it. Every
+    published snapshot that differs from the previous one bumps the event's
+    version and records the outcome changes, so clients can wait for and
+    fetch only what changed. The snapshot is serialized (and its ETag
+    computed) once per version, not once per request.
+    """
+
+    def __init__(self, history_size=256):
+        """
+        Initialize the store
+
+        Args:
+            history_size (int): Number of change sets kept per event for long-polling clients
+        """
+        self.history_size = history_size
+        self._events = {}
+        self._condition = threading.Condition()
+
+    def publish(self, event_id, data):
+        """
+        Store the newest market data of an event and wake up waiting clients
+
+        Args:
+            event_id (str): Event id
+            data (list): Markets returned by scrape_market_titles
+
+        Returns:
+            int: The event's version after publishing
+        """
+        index = outcome_index(data)
+        with self._condition:
+            event = self._events.get(event_id)
+            if event is None:
+                event = self._events[event_id] = EventSnapshot(self.history_size)
+            changes = diff_outcomes(event.index, index)
+            if event.document is not None and not changes:
+                return event.version
+            event.version += 1
+            event.document = build_snapshot(data)
+            event.body = json.dumps(event.document, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            event.etag = '"' + hashlib.sha1(event.body).hexdigest() + '"'
+            event.index = index
+            event.changes.append((event.version, time.time(), changes))
+            self._condition.notify_all()
+            return event.version
+
+    def remove(self, event_id):
+        """Forget an event"""
+        with self._condition:
+            self._events.pop(event_id, None)
+            self._condition.notify_all()
+
+    def events(self):
+        """
+        Returns:
+            list: Event ids with their current version
+        """
+        with self._condition:
+            return [
+                {"event_id": event_id, "version": event.version, "timestamp": event.document["timestamp"]}
+                for event_id, event in self._events.items()
+            ]
+
+    def snapshot(self, event_id):
+        """
+        Returns:
+            tuple: (version, document), or (None, None) for an unknown event
+        """
+        with self._condition:
+            event = self._events.get(event_id)
+            if event is None:
+                return None, None
+            return event.version, event.document
+
+    def encoded(self, event_id):
+        """
+        Returns:
+            tuple: (version, document, body, etag) with the document serialized as
+                JSON bytes, or (None, None, None, None) for an unknown event
+        """
+        with self._condition:
+            event = self._events.get(event_id)
+            if event is None:
+                return None, None, None, None
+            return event.version, event.document, event.body, event.etag
+
+    def wait_for_changes(self, event_id, since, timeout):
+        """
+        Block until the event has a version newer than since
+
+        Args:
+            event_id (str): Event id
+            since (int): Last version the client has seen
+            timeout (float): Maximum seconds to wait
+
+        Returns:
+            tuple: (version, changes) where changes is None if the history no longer
+                reaches back to since and the client has to reload the full snapshot
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                event = self._events.get(event_id)
+                if event is not None and event.version > since:
+                    break
+                if event is not None and since > event.version:
+                    # Client saw versions from an earlier run of the store
+                    return event.version, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return (event.version if event else None), []
+                self._condition.wait(remaining)
+
+            history = [entry for entry in event.changes if entry[0] > since]
+            if not history or history[0][0] != since + 1:
+                return event.version, None
+            changes = []
+            for version, ts, version_changes in history:
+                for change in version_changes:
+                    changes.append(dict(change, version=version, ts=ts))
+            return event.version, changes
+
+
+def filter_markets(document, market_ids):
+    """Restrict a snapshot document to the given market ids"""
+    return {
+        "timestamp": document["timestamp"],
+        "data": [market for market in document["data"] if market["market_id"] in market_ids]
+    }
+
+
+class SnapshotRequestHandler(BaseHTTPRequestHandler):
+    """
+    Routes:
+        GET /events                          Followed events with their versions
+        GET /events/<id>[?market_id=..]      Latest snapshot, supports ETag/If-None-Match
+        GET /events/<id>/changes?since=<v>   Long-poll for outcome changes after version v
+                                             (&timeout=<seconds>, &market_id=..)
+    """
+
+    server_version = "TippmixProScraperAPI/1.0"
+    max_long_poll = 60
+
+    @property
+    def store(self):
+        return self.server.store
+
+    def log_message(self, format, *args):
+        # Keep the console quiet, clients poll often
+        pass
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        parts = [p for p in parsed.path.split('/') if p]
+        try:
+            route = self.server.routes.get(tuple(parts))
+            if route:
+                route(self, query)
+            elif parts == ["events"]:
+                self._send_json(200, self.store.events())
+            elif len(parts) == 2 and parts[0] == "events":
+                self._handle_snapshot(parts[1], query)
+            elif len(parts) == 3 and parts[0] == "events" and parts[2] == "changes":
+                self._handle_changes(parts[1], query)
+            else:
+                self._send_json(404, {"error": "Not found"})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+
+    def _handle_snapshot(self, event_id, query):
+        version, document, body, etag = self.store.encoded(event_id)
+        if document is None:
+            self._send_json(404, {"error": f"Unknown event: {event_id}"})
+            return
+        market_ids = query.get("market_id")
+        if market_ids:
+            wanted = sorted(set(market_ids))
+            # A filtered body only changes with the snapshot, so its ETag is known before serializing
+            etag = etag[:-1] + "-" + hashlib.sha1(json.dumps(wanted).encode('utf-8')).hexdigest()[:16] + '"'
+        if etag in self.headers.get("If-None-Match", ""):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        if market_ids:
+            body = json.dumps(filter_markets(document, set(wanted)), ensure_ascii=False,
+                              separators=(',', ':')).encode('utf-8')
+        self.send_body(200, body, {"ETag": etag, "X-Snapshot-Version": str(version)})
+
+    def _handle_changes(self, event_id, query):
+        since = int(query.get("since", ["0"])[0])
+        timeout = min(float(query.get("timeout", ["30"])[0]), self.max_long_poll)
+        version, changes = self.store.wait_for_changes(event_id, since, timeout)
+        if version is None:
+            self._send_json(404, {"error": f"Unknown event: {event_id}"})
+            return
+        market_ids = query.get("market_id")
+        if changes and market_ids:
+            wanted = set(market_ids)
+            changes = [change for change in changes if change["market_id"] in wanted]
+        # changes is None when the client fell too far behind: reload the snapshot
+        self._send_json(200, {"version": version, "reset": changes is None, "changes": changes or []})
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.send_body(status, body)
+
+    def send_body(self, status, body, headers=None, content_type="application/json; charset=utf-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class SnapshotServer:
+    """
+    Embedded HTTP server serving a SnapshotStore from memory
+    """
+
+    def __init__(self, store, host="127.0.0.1", port=8765):
+        """
+        Initialize the server
+
+        Args:
+            store (SnapshotStore): Store to serve
+            host (str): Interface to listen on
+            port (int): TCP port, 0 picks a free one
+        """
+        self.store = store
+        self.host = host
+        self.port = port
+        self.httpd = None
+        self.thread = None
+        self.routes = {}
+
+    def add_route(self, path, handler):
+        """
+        Register an extra GET route
+
+        Args:
+            path (str): Exact path, e.g. "/metrics"
+            handler (callable): Called with (request_handler, query)
+        """
+        self.routes[tuple(p for p in path.split('/') if p)] = handler
+
+    def start(self):
+        """Start serving on a background thread"""
+        self.httpd = ThreadingHTTPServer((self.host, self.port), SnapshotRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.store = self.store
+        self.httpd.routes = self.routes
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop serving"""
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+            self.thread = None
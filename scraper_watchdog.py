@@ -0,0 +1,194 @@
+import time
+from scraper_browser import is_driver_alive
+from scraper_schedule import markets_suspended
+
+# Recovery steps, cheapest first
+RECOVERY_STEPS = ("refresh", "new_tab", "relaunch")
+
+
+class Watchdog:
+    """
+    Detect a stalled event page and recover it in place
+
+    The watchdog looks at the result of every scrape cycle. A page is
+    unhealthy when the scrape fails, when it loses all the markets it had,
+    or when its snapshot has not changed for stale_after seconds while the
+    event offers odds (suspended events are expected to sit still).
+
+    Recovery escalates from the cheapest step to the most expensive one:
+    reload the page in its tab, replace the tab, relaunch the browser. A
+    dead browser session goes straight to the relaunch and a crashed
+    renderer straight to a new tab. A scraper on a shared driver never
+    relaunches a live browser, which would reload its neighbours' tabs, and
+    replaces its own tab instead. The escalation only resets once the page
+    delivers markets that differ from the ones it had when the last step
+    was taken. While the page stays unhealthy, the attempts back off
+    exponentially from base_backoff up to max_backoff.
+
+    Downtime runs from the last change of a stale page, or from the first
+    unhealthy cycle otherwise, to the next healthy one.
+    """
+
+    def __init__(self, scraper, stale_after=60, failure_threshold=2, base_backoff=2, max_backoff=60,
+                 log=print, relaunch=None):
+        """
+        Initialize the watchdog
+
+        Args:
+            scraper (TippmixProScraper): Scraper of the watched page
+            stale_after (float): Seconds without any change before a live page counts as stale
+            failure_threshold (int): Consecutive unhealthy cycles before the first recovery
+            base_backoff (float): Seconds before the next recovery attempt, doubled per attempt
+            max_backoff (float): Longest wait between two recovery attempts
+            log (callable): Function receiving log messages
+            relaunch (callable): Relaunches the browser, defaults to scraper.relaunch_browser;
+                scrapers on a shared driver pass the driver owner's relaunch
+        """
+        self.scraper = scraper
+        self.stale_after = stale_after
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.log = log
+        self.relaunch = relaunch or scraper.relaunch_browser
+        self.failures = 0
+        self.level = 0
+        self.attempts = 0
+        self.next_attempt = 0.0
+        self.down_since = None
+        self.downtime = 0.0
+        self.outages = 0
+        self.recoveries = {step: 0 for step in RECOVERY_STEPS}
+        self.last_problem = None
+        self.last_change = time.monotonic()
+        self._last_markets = None
+        self._had_markets = False
+        self._step_markets = None
+
+    def observe(self, markets, error=None):
+        """
+        Check the result of one cycle and recover the page if it is unhealthy and due
+
+        Args:
+            markets (list): The cycle's markets, None if the scrape failed
+            error (Exception): The exception the scrape raised, if any
+
+        Returns:
+            str: The recovery step taken, None if none was taken
+        """
+        now = time.monotonic()
+        problem, since = self._diagnose(markets, error, now)
+        if problem is None:
+            # After a recovery step, only fresh markets prove that the page is back
+            if not self.attempts or (markets and markets != self._step_markets):
+                self._healthy(now)
+            return None
+
+        self.failures += 1
+        self.last_problem = problem
+        self._step_markets = markets
+        if self.down_since is None:
+            self.down_since = since
+            self.outages += 1
+        if self.failures < self.failure_threshold or now < self.next_attempt:
+            return None
+        return self.recover(self._step_for(error))
+
+    def _diagnose(self, markets, error, now):
+        """
+        Describe what is wrong with the page
+
+        Returns:
+            tuple: (problem, since) where problem is None if the page looks healthy
+                and since is when the problem started
+        """
+        if error is not None:
+            return f"scrape failed: {error}", now
+        if markets is None:
+            return "scrape returned nothing", now
+        if not markets:
+            return ("page lost its markets", now) if self._had_markets else (None, None)
+
+        self._had_markets = True
+        if markets != self._last_markets:
+            self._last_markets = markets
+            self.last_change = now
+            return None, None
+        if now - self.last_change >= self.stale_after and not markets_suspended(markets):
+            return f"no change for {now - self.last_change:.0f}s", self.last_change
+        return None, None
+
+    def _healthy(self, now):
+        if self.down_since is not None:
+            outage = now - self.down_since
+            self.downtime += outage
+            self.down_since = None
+            if self.level:
+                self.log(f"Page recovered after {outage:.1f}s")
+        self.failures = 0
+        self.level = 0
+        self.attempts = 0
+        self.next_attempt = 0.0
+        self._step_markets = None
+
+    def _step_for(self, error):
+        """Next recovery step, skipping the steps that cannot help"""
+        level = min(self.level, len(RECOVERY_STEPS) - 1)
+        driver = self.scraper.driver
+        if driver is None or not is_driver_alive(driver):
+            return "relaunch"
+        if error is not None and "crash" in str(error).lower():
+            level = max(level, RECOVERY_STEPS.index("new_tab"))
+        if RECOVERY_STEPS[level] == "relaunch" and not self.scraper.owns_driver:
+            # The browser still runs the other events' tabs
+            return "new_tab"
+        return RECOVERY_STEPS[level]
+
+    def recover(self, step):
+        """
+        Run one recovery step and schedule the next attempt
+
+        Args:
+            step (str): "refresh", "new_tab" or "relaunch"
+
+        Returns:
+            str: The step
+        """
+        self.log(f"Recovering page ({self.last_problem}): {step}")
+        actions = {
+            "refresh": self.scraper.reload_page,
+            "new_tab": self.scraper.reopen_in_new_tab,
+            "relaunch": self.relaunch,
+        }
+        try:
+            actions[step]()
+            self.recoveries[step] += 1
+        except Exception as e:
+            self.log(f"Recovery step {step} failed: {e}")
+
+        # Escalate if the page is still unhealthy at the next attempt
+        self.level = max(self.level, RECOVERY_STEPS.index(step) + 1)
+        self.attempts += 1
+        backoff = min(self.max_backoff, self.base_backoff * 2 ** (self.attempts - 1))
+        self.next_attempt = time.monotonic() + backoff
+        self.failures = 0
+        return step
+
+    def total_downtime(self):
+        """Accumulated downtime in seconds, including an outage still in progress"""
+        if self.down_since is None:
+            return self.downtime
+        return self.downtime + time.monotonic() - self.down_since
+
+    def status(self):
+        """
+        Returns:
+            dict: Downtime, outage and recovery counts and the last problem seen
+        """
+        return {
+            "down": self.down_since is not None,
+            "downtime": self.total_downtime(),
+            "outages": self.outages,
+            "recoveries": dict(self.recoveries),
+            "last_problem": self.last_problem,
+        }
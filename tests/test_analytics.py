@@ -0,0 +1,56 @@
+import pytest
+import scraper_analytics
+from scraper_analytics import OddsAnalytics
+
+pytestmark = pytest.mark.skipif(scraper_analytics.np is None, reason="needs NumPy")
+
+
+def market(market_id, *odds):
+    return {"market_id": market_id, "market_part": "1", "legend": "Match Winner",
+            "outcomes": [{"text": f"Team {chr(65 + i)}", "odds": value} for i, value in enumerate(odds)]}
+
+
+def test_overround_and_implied_probabilities():
+    analytics = OddsAnalytics()
+    analytics.update("e1", [market("1", "2.00", "2.00"), market("2", "1.50", "")])
+    analytics.tick()
+    first, second = analytics.summary("e1")
+    assert first["overround"] == pytest.approx(0.0)
+    assert [outcome["implied"] for outcome in first["outcomes"]] == [0.5, 0.5]
+    # A suspended outcome leaves its market without an overround
+    assert second["overround"] is None and second["outcomes"][1]["odds"] is None
+
+
+def test_moves_over_the_threshold_raise_alerts():
+    analytics = OddsAnalytics(move_threshold=5)
+    received = []
+    analytics.add_alert_callback(received.extend)
+    analytics.update("e1", [market("1", "2.00", "1.80")])
+    assert analytics.tick() == []
+    analytics.update("e1", [market("1", "2.20", "1.82")])
+    alerts = analytics.tick()
+    assert [(a["text"], a["previous"], a["odds"]) for a in alerts] == [("Team A", 2.0, 2.2)]
+    assert alerts[0]["move_pct"] == pytest.approx(10)
+    assert received == alerts and analytics.stats()["alerts"] == 1
+    # Moves are measured tick to tick
+    assert analytics.tick() == []
+
+
+def test_rows_of_dropped_outcomes_and_events_are_reused():
+    analytics = OddsAnalytics(capacity=2)
+    analytics.update("e1", [market("1", "2.00", "2.00"), market("2", "1.50", "2.50")])
+    analytics.update("e1", [market("1", "2.00", "2.00")])
+    assert analytics.stats()["free_rows"] == 2
+    analytics.update("e2", [market("7", "3.00", "1.40")])
+    stats = analytics.stats()
+    assert (stats["rows"], stats["free_rows"], stats["markets"], stats["events"]) == (4, 0, 2, 2)
+
+    analytics.remove_event("e1")
+    analytics.tick()
+    assert analytics.summary("e1") == []
+    assert [m["market_id"] for m in analytics.summary()] == ["7"]
+    assert analytics.stats()["active_rows"] == 2
+    # Freed rows start fresh: no move against the removed event's odds
+    analytics.update("e3", [market("1", "9.00", "9.00")])
+    assert analytics.tick() == []
+    assert analytics.stats()["rows"] == 4
@@ -0,0 +1,41 @@
+import os
+from scraper_cli import build_parser, load_config, main, open_writer, output_targets, scraper_options
+from scraper_output import DeltaJournal
+
+
+def config_for(*argv):
+    return load_config(build_parser().parse_args(list(argv)))
+
+
+def test_one_file_per_event_with_safe_names(tmp_path):
+    target = output_targets(config_for("-d", str(tmp_path)))
+    assert target("279204529400057856") == (str(tmp_path / "TippmixPro_279204529400057856.json"), None)
+    output_file, _ = target("https://example.com/event/live?x=1")
+    assert os.path.dirname(output_file) == str(tmp_path)
+    assert "/" not in os.path.basename(output_file)
+
+
+def test_delta_mode_gives_each_file_one_journal(tmp_path):
+    target = output_targets(config_for("-d", str(tmp_path), "--output-mode", "delta", "--compact-output"))
+    output_file, journal = target("1")
+    assert isinstance(journal, DeltaJournal)
+    assert journal.snapshot_file == output_file and journal.compact
+    assert target("1")[1] is journal
+    assert target("2")[1] is not journal
+
+
+def test_single_event_writes_the_output_file(tmp_path):
+    output_file = str(tmp_path / "out.json")
+    target = output_targets(config_for("-o", output_file), single=True)
+    assert target("1")[0] == target("2")[0] == output_file
+
+
+def test_writer_follows_the_config():
+    writer = open_writer(config_for("--compact-output", "--checkpoint-interval", "5"))
+    assert writer.compact and writer.refresh_interval == 5
+
+
+def test_feed_extraction_mode(capsys):
+    assert scraper_options(config_for("--extraction-mode", "feed"))["extraction_mode"] == "feed"
+    assert main(["--extraction-mode", "feed", "--http", "https://www.tippmixpro.hu/hu/fogadas/e/1/all"]) == 2
+    assert "cannot be combined with --http" in capsys.readouterr().err
@@ -0,0 +1,158 @@
+import threading
+import time
+import pytest
+from benchmarks.replay_server import ReplayServer
+from scraper_cluster import ClusterCoordinator, ClusterWorker
+
+INTERVAL = 0.2
+
+
+def wait_until(predicate, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def server():
+    server = ReplayServer(mutation_rate=0.3)
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def cluster(server):
+    """Coordinator with a results log, and a factory for in-process HTTP workers"""
+    results = []
+    coordinator = ClusterCoordinator(port=0, interval=INTERVAL, heartbeat_timeout=3, rebalance_interval=3600,
+                                     callback=lambda event_id, markets: results.append((event_id, markets)),
+                                     log=lambda message: None)
+    workers = []
+
+    def start_worker(worker_id):
+        worker = ClusterWorker(f"127.0.0.1:{coordinator.port}", worker_id=worker_id, interval=INTERVAL,
+                               use_selenium=False, http_workers=4, heartbeat_interval=0.2, reconnect_delay=0.2,
+                               log=lambda message: None)
+        stop_event = threading.Event()
+        thread = threading.Thread(target=worker.run, args=(stop_event,), daemon=True)
+        thread.start()
+        workers.append((stop_event, thread))
+        assert wait_until(lambda: worker_id in worker_ids(coordinator))
+        return stop_event, thread
+
+    coordinator.start()
+    yield coordinator, results, start_worker
+    coordinator.stop()
+    for stop_event, thread in workers:
+        stop_event.set()
+        thread.join(timeout=10)
+
+
+def worker_ids(coordinator):
+    return [worker["worker_id"] for worker in coordinator.status()["workers"]]
+
+
+def events_of(coordinator, worker_id):
+    for worker in coordinator.status()["workers"]:
+        if worker["worker_id"] == worker_id:
+            return worker["events"]
+    return None
+
+
+def test_events_are_assigned_and_results_stream_back(server, cluster):
+    coordinator, results, start_worker = cluster
+    start_worker("w1")
+    start_worker("w2")
+    for n in range(4):
+        coordinator.add_event(server.url_for("small", str(100 + n)))
+
+    status = coordinator.status()
+    assert not status["unassigned"]
+    assert sorted(len(worker["events"]) for worker in status["workers"]) == [2, 2]
+    assert wait_until(lambda: {event_id for event_id, _ in results} == {"100", "101", "102", "103"})
+    _, markets = results[-1]
+    assert [market["market_id"] for market in markets] == [str(100000 + i) for i in range(10)]
+
+
+def test_events_of_a_lost_worker_fail_over(server, cluster):
+    coordinator, results, start_worker = cluster
+    stop_first, first = start_worker("w1")
+    for n in range(3):
+        coordinator.add_event(server.url_for("small", str(200 + n)))
+    assert events_of(coordinator, "w1") == ["200", "201", "202"]
+    start_worker("w2")
+
+    stop_first.set()
+    first.join(timeout=10)
+    assert wait_until(lambda: events_of(coordinator, "w2") == ["200", "201", "202"])
+    assert not coordinator.status()["unassigned"]
+
+    del results[:]
+    assert wait_until(lambda: {event_id for event_id, _ in results} == {"200", "201", "202"})
+
+
+def test_rebalance_moves_an_event_to_a_new_worker(server, cluster):
+    coordinator, results, start_worker = cluster
+    start_worker("w1")
+    for n in range(4):
+        coordinator.add_event(server.url_for("small", str(300 + n)))
+    start_worker("w2")
+    assert events_of(coordinator, "w2") == []
+
+    assert coordinator.rebalance()
+    assert coordinator.rebalance()
+    assert len(events_of(coordinator, "w1")) == 2
+    moved = events_of(coordinator, "w2")
+    assert len(moved) == 2
+    # Balanced now: nothing left to move
+    assert not coordinator.rebalance()
+
+    # The moved events keep streaming back from their new worker
+    del results[:]
+    assert wait_until(lambda: set(moved) <= {event_id for event_id, _ in results})
+
+
+def test_connections_without_hello_are_closed(cluster):
+    import os
+    import socket
+    coordinator = cluster[0]
+
+    def open_fds():
+        return len(os.listdir("/proc/self/fd"))
+
+    time.sleep(0.2)
+    threads, fds = threading.active_count(), open_fds()
+    for _ in range(20):
+        socket.create_connection(("127.0.0.1", coordinator.port)).close()
+    assert wait_until(lambda: threading.active_count() <= threads and open_fds() <= fds, timeout=5)
+
+    # One that connects and stays silent is dropped after the heartbeat timeout
+    silent = socket.create_connection(("127.0.0.1", coordinator.port))
+    try:
+        assert wait_until(lambda: silent.recv(1) == b"", timeout=10)
+    finally:
+        silent.close()
+
+
+def test_removed_events_leave_the_store_and_analytics(server):
+    from scraper_analytics import OddsAnalytics
+    from scraper_server import SnapshotStore
+
+    store = SnapshotStore()
+    analytics = OddsAnalytics()
+    coordinator = ClusterCoordinator(port=0, store=store, analytics=analytics, log=lambda message: None)
+    coordinator.start([server.url_for("small", "400")])
+    try:
+        markets = [{"market_id": "1", "market_part": "1", "legend": "L", "outcomes": [{"text": "A", "odds": "1.50"}]}]
+        store.publish("400", markets)
+        analytics.update("400", markets)
+        coordinator.remove_event("400")
+        assert store.snapshot("400")[0] is None
+        assert analytics.summary("400") == []
+        assert analytics.stats()["events"] == 0
+    finally:
+        coordinator.stop()
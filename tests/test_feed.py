@@ -0,0 +1,112 @@
+import json
+import pytest
+from benchmarks.fixtures import OddsState, body_inner_html
+from scraper_feed import (FeedCapture, FeedDecoder, MarketTable, PerformanceLogReader, SelectionFeedDecoder,
+                          log_reader_for)
+from scraper_parsers import get_market_parser
+
+
+def test_frames_track_the_rendered_page():
+    state = OddsState(60, seed=7, mutation_rate=0.2)
+    decoder = SelectionFeedDecoder()
+    table = MarketTable()
+    parser = get_market_parser("lxml")
+
+    table.apply(decoder.decode(state.markets_frame()))
+    assert table.snapshot() == parser.parse(body_inner_html(state.render()))
+    for _ in range(10):
+        state.mutate()
+        table.apply(decoder.decode(state.odds_frame()))
+        assert table.snapshot() == parser.parse(body_inner_html(state.render()))
+    assert decoder.unknown_selections == 0
+
+
+def test_socketio_packet_and_suspended_selection():
+    decoder = SelectionFeedDecoder()
+    decoder.decode('{"type": "markets", "markets": [{"id": 5, "part": 1, "name": "Winner", "selections": '
+                   '[{"id": 50, "name": "Team A", "odds": 1.5, "status": "open"}]}]}')
+    updates = decoder.decode('42["odds", {"changes": [{"selectionId": 50, "odds": 1.6, "status": "suspended"}]}]')
+    assert updates == [{"type": "odds", "market_id": "5", "market_part": "1", "text": "Team A", "odds": ""}]
+
+
+def test_unknown_selection_is_counted_not_applied():
+    decoder = SelectionFeedDecoder()
+    assert decoder.decode('{"type": "odds", "changes": [{"selectionId": 1, "odds": 2.0}]}') == []
+    assert decoder.unknown_selections == 1
+
+
+@pytest.mark.parametrize("decoder", [FeedDecoder(), SelectionFeedDecoder()])
+def test_output_schema_messages(decoder):
+    message = ('{"markets": [{"market_id": "1", "market_part": "2", "legend": "L", '
+               '"outcomes": [{"text": "A", "odds": "1.80"}]}], "removed": [{"market_id": "3"}]}')
+    updates = decoder.decode(message)
+    assert [update["type"] for update in updates] == ["market", "remove"]
+
+
+def test_replay_server_serves_frames():
+    import requests
+    from benchmarks.replay_server import ReplayServer
+
+    server = ReplayServer(mutation_rate=0.3)
+    server.start()
+    try:
+        decoder = SelectionFeedDecoder()
+        table = MarketTable()
+        for _ in range(3):
+            table.apply(decoder.decode(requests.get(server.feed_url_for("small", "9"), timeout=5).text))
+        page = server.current_page("small", "9")
+        assert table.snapshot() == get_market_parser("lxml").parse(body_inner_html(page))
+    finally:
+        server.stop()
+
+
+class LogDriver:
+    """Driver stand-in whose performance log is filled by the test"""
+
+    def __init__(self):
+        self.entries = []
+        self.current_window_handle = "tab1"
+
+    def frame(self, webview, payload):
+        self.entries.append({"message": json.dumps({"webview": webview, "message": {
+            "method": "Network.webSocketFrameReceived", "params": {"response": {"payloadData": payload}}}})})
+
+    def get_log(self, kind):
+        entries, self.entries = self.entries, []
+        return entries
+
+
+def test_log_reader_buffers_only_watched_tabs():
+    driver = LogDriver()
+    reader = PerformanceLogReader(driver)
+    reader.watch("tab1")
+    driver.frame("tab1", "a")
+    driver.frame("tab2", "b")
+    reader.read()
+    assert reader.take("tab1") == (["a"], [], 0)
+    assert reader.take("tab2") == ([], [], 0)
+
+    driver.frame("tab1", "c")
+    reader.read()
+    reader.unwatch("tab1")
+    # Closed tab: its unread traffic and later frames are dropped
+    driver.frame("tab1", "d")
+    reader.read()
+    assert reader.take("tab1") == ([], [], 0)
+    assert not reader._frames and not reader._finished
+
+
+def test_log_reader_caps_the_backlog_and_capture_reseeds():
+    driver = LogDriver()
+    capture = FeedCapture(driver, decoder=FeedDecoder())
+    reader = log_reader_for(driver)
+    reader.max_backlog = 3
+    capture.seed([])
+    for n in range(5):
+        driver.frame("tab1", json.dumps({"removed": [{"market_id": str(n)}]}))
+    capture.poll()
+    assert capture.messages == 3 and capture.dropped == 2
+    assert not capture.seeded
+
+    capture.close()
+    assert "tab1" not in reader._frames
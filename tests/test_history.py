@@ -0,0 +1,99 @@
+import threading
+from scraper_history import HistoryStore
+from scraper_output import SnapshotWriter
+
+
+def market(odds_a, odds_b="2.40", market_id="1"):
+    return [{"market_id": market_id, "market_part": "1", "legend": "Match Winner",
+             "outcomes": [{"text": "Team A", "odds": odds_a}, {"text": "Team B", "odds": odds_b}]}]
+
+
+def test_only_moves_are_recorded(tmp_path):
+    history = HistoryStore(str(tmp_path))
+    assert history.record("e1", market("1.50"), timestamp=10) == 2
+    assert history.record("e1", market("1.50"), timestamp=11) == 0
+    assert history.record("e1", market("1.60"), timestamp=12) == 1
+    assert history.record("e1", market(""), timestamp=13) == 1
+    assert history.record("e1", market(""), timestamp=14) == 0
+
+    moves = history.query("e1", text="Team A")
+    assert [(ts, odds) for ts, *_, odds in moves] == [(10, 1.5), (12, 1.6), (13, None)]
+    assert history.last_odds("e1", "1", "1", "Team A", at=12.5) == 1.6
+    assert history.stats() == {"ticks": 4, "series": 2, "blocks": 0}
+    history.close()
+
+
+def test_queries_filter_by_time_and_series_across_blocks(tmp_path):
+    history = HistoryStore(str(tmp_path), block_records=4)
+    for n in range(20):
+        history.record("e1", market(f"{1 + n / 100:.2f}"), timestamp=n)
+        history.record("e2", market(f"{3 + n / 100:.2f}", market_id="9"), timestamp=n)
+    assert history.stats()["blocks"] > 1
+
+    moves = history.query("e2", start=5, end=8)
+    assert [ts for ts, *_ in moves] == [5, 6, 7]
+    assert {event_id for _, event_id, *_ in moves} == {"e2"}
+    assert history.query("e3") == []
+    history.close()
+
+
+def test_history_survives_a_reopen(tmp_path):
+    history = HistoryStore(str(tmp_path), block_records=4)
+    for n in range(10):
+        history.record("e1", market(f"{1 + n / 100:.2f}"), timestamp=n)
+    before = history.query("e1")
+    history.close()
+
+    # A torn last tick, as after a crash mid-write
+    with open(tmp_path / "ticks.dat", "ab") as f:
+        f.write(b"\x00" * 7)
+    reopened = HistoryStore(str(tmp_path), block_records=4)
+    assert reopened.query("e1") == before
+    reopened.record("e1", market("1.09"), timestamp=20)
+    assert reopened.query("e1", text="Team A")[-1][5] == 1.09
+    reopened.close()
+
+
+def test_writer_records_every_move_of_coalesced_snapshots(tmp_path):
+    history = HistoryStore(str(tmp_path / "history"))
+    writer = SnapshotWriter(history=history)
+    target = str(tmp_path / "a.json")
+    # Not started yet: the snapshots coalesce into one file write
+    for odds in ("1.50", "1.60", "1.70", "1.50"):
+        writer.submit(market(odds), target, event_id="e1")
+    assert history.stats()["ticks"] == 0
+    writer.start()
+    writer.flush()
+    writer.stop()
+    assert writer.written == 1
+    assert [odds for *_, odds in history.query("e1", text="Team A")] == [1.5, 1.6, 1.7, 1.5]
+    history.close()
+
+
+def test_recording_does_not_wait_for_a_query_scan(tmp_path, monkeypatch):
+    history = HistoryStore(str(tmp_path))
+    history.record("e1", market("1.50"), timestamp=1)
+    scanning, release = threading.Event(), threading.Event()
+    find = history._find
+
+    def slow_find(*args):
+        scanning.set()
+        release.wait(5)
+        return find(*args)
+
+    monkeypatch.setattr(history, "_find", slow_find)
+    result = []
+    query = threading.Thread(target=lambda: result.extend(history.query("e1", start=0)))
+    query.start()
+    try:
+        assert scanning.wait(5)
+        recorder = threading.Thread(target=history.record, args=("e1", market("1.60"), 2))
+        recorder.start()
+        recorder.join(2)
+        assert not recorder.is_alive()
+    finally:
+        release.set()
+        query.join(5)
+    # The query sees the ticks from when it started
+    assert [odds for *_, odds in result] == [1.5, 2.4]
+    history.close()
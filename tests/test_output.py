@@ -0,0 +1,157 @@
+import json
+import os
+import stat
+from scraper_output import DeltaJournal, SnapshotWriter, atomic_write, write_snapshot
+
+
+def market(odds, legend="Match Winner"):
+    return [{"market_id": "1", "market_part": "1", "legend": legend,
+             "outcomes": [{"text": "Team A", "odds": odds}, {"text": "Team B", "odds": "2.40"}]}]
+
+
+def mode_of(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_atomic_write_replaces_the_file(tmp_path):
+    target = tmp_path / "out.json"
+    atomic_write(str(target), b"first")
+    atomic_write(str(target), b"second")
+    assert target.read_bytes() == b"second"
+    # No temporary files are left behind
+    assert os.listdir(tmp_path) == ["out.json"]
+
+
+def test_atomic_write_uses_the_mode_of_a_plain_open(tmp_path):
+    plain = tmp_path / "plain.json"
+    with open(plain, "w") as f:
+        f.write("[]")
+    write_snapshot(market("1.50"), str(tmp_path / "out.json"))
+    assert mode_of(tmp_path / "out.json") == mode_of(plain)
+
+
+def test_atomic_write_keeps_the_mode_of_the_replaced_file(tmp_path):
+    target = tmp_path / "out.json"
+    write_snapshot(market("1.50"), str(target))
+    os.chmod(target, 0o640)
+    write_snapshot(market("1.60"), str(target))
+    assert mode_of(target) == 0o640
+    assert json.loads(target.read_text())["data"] == market("1.60")
+
+
+def journal_lines(journal):
+    with open(journal.journal_file, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_writer_coalesces_snapshots_per_file(tmp_path):
+    writer = SnapshotWriter(compact=True)
+    first, second = str(tmp_path / "a.json"), str(tmp_path / "b.json")
+    # Not started yet: everything queues up, like behind a slow disk
+    for odds in ("1.50", "1.60", "1.70"):
+        writer.submit(market(odds), first)
+    writer.submit(market("3.00"), second)
+    assert writer.coalesced == 2
+
+    writer.start()
+    writer.flush()
+    writer.stop()
+    assert writer.written == 2
+    assert json.loads(open(first).read())["data"] == market("1.70")
+    assert json.loads(open(second).read())["data"] == market("3.00")
+
+
+def test_writer_skips_unchanged_markets(tmp_path):
+    writer = SnapshotWriter(refresh_interval=None)
+    target = str(tmp_path / "a.json")
+    writer.start()
+    for odds in ("1.50", "1.50", "1.60"):
+        writer.submit(market(odds), target)
+        writer.flush()
+    writer.stop()
+    assert (writer.written, writer.skipped) == (2, 1)
+
+
+def test_writer_writes_files_oldest_first(tmp_path, monkeypatch):
+    writer = SnapshotWriter()
+    order = []
+    monkeypatch.setattr(writer, "_write", lambda data, filename: order.append(filename))
+    for name in ("c", "a", "b"):
+        writer.submit(market("1.50"), name)
+    # Resubmitting keeps the file's place in the queue
+    writer.submit(market("1.60"), "c")
+    writer.start()
+    writer.flush()
+    writer.stop()
+    assert order == ["c", "a", "b"]
+
+
+def test_journal_keeps_every_move_behind_a_slow_writer(tmp_path):
+    target = str(tmp_path / "a.json")
+    journal = DeltaJournal(target)
+    writer = SnapshotWriter()
+    for odds in ("1.50", "1.60", "1.70", "1.50"):
+        writer.submit(market(odds), target, journal=journal)
+    writer.start()
+    writer.flush()
+    writer.stop()
+
+    moves = [(line["op"], line["text"], line.get("prev_odds"), line["odds"]) for line in journal_lines(journal)]
+    assert moves == [
+        ("add", "Team A", None, "1.50"),
+        ("add", "Team B", None, "2.40"),
+        ("change", "Team A", "1.50", "1.60"),
+        ("change", "Team A", "1.60", "1.70"),
+        ("change", "Team A", "1.70", "1.50"),
+    ]
+    assert json.loads(open(target).read())["data"] == market("1.50")
+
+
+def test_journal_checkpoints_after_unwritten_changes(tmp_path):
+    target = str(tmp_path / "a.json")
+    journal = DeltaJournal(target, checkpoint_interval=3600)
+    journal.update(market("1.50"))
+    journal.update(market("1.60"), checkpoint=False)
+    # No change against 1.60, but the file still holds 1.50
+    assert journal.update(market("1.60")) == []
+    assert json.loads(open(target).read())["data"] == market("1.60")
+
+
+def test_journal_records_added_and_removed_outcomes(tmp_path):
+    target = str(tmp_path / "a.json")
+    journal = DeltaJournal(target)
+    journal.update(market("1.50"))
+    changes = journal.update([{"market_id": "2", "market_part": "1", "legend": "Total",
+                               "outcomes": [{"text": "Over", "odds": "1.90"}]}])
+    assert sorted((c["op"], c["market_id"], c["text"]) for c in changes) == [
+        ("add", "2", "Over"), ("remove", "1", "Team A"), ("remove", "1", "Team B")]
+    assert journal.journal_file == str(tmp_path / "a.jsonl")
+    assert all("ts" in line for line in journal_lines(journal))
+    assert journal.update(market("1.50"), checkpoint=False) and len(journal_lines(journal)) == 8
+
+
+def test_unchanged_snapshot_is_rewritten_at_the_checkpoint_interval(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("scraper_output.time.monotonic", lambda: now[0])
+    target = tmp_path / "a.json"
+    journal = DeltaJournal(str(target), checkpoint_interval=60)
+    journal.update(market("1.50"))
+    target.unlink()
+    now[0] += 30
+    journal.update(market("1.50"))
+    assert not target.exists()
+    now[0] += 30
+    journal.update(market("1.50"))
+    assert json.loads(target.read_text())["data"] == market("1.50")
+
+
+def test_journal_rotates_by_size(tmp_path):
+    target = str(tmp_path / "a.json")
+    journal = DeltaJournal(target, max_journal_bytes=200, backup_count=2)
+    for n in range(12):
+        journal.update(market(f"1.{50 + n}"))
+    names = sorted(os.listdir(tmp_path))
+    assert names == ["a.json", "a.jsonl", "a.jsonl.1", "a.jsonl.2"]
+    assert os.path.getsize(tmp_path / "a.jsonl.1") >= 200
+    # The newest moves are in the live journal
+    assert journal_lines(journal)[-1]["odds"] == "1.61"
@@ -0,0 +1,104 @@
+import os
+import shutil
+import pytest
+from benchmarks.fixtures import (FIXTURE_SIZES, _initial_odds, _market_layout, body_inner_html, ensure_fixtures,
+                                 render_page)
+from scraper_model import market_columns
+from scraper_parsers import MarketCache, get_market_parser
+
+ENGINES = ["lxml", "bs4"]
+
+SUSPENDED_PAGE = (
+    "<div class='MarketGroups'>"
+    "<article class='Market Market--Id-7 Market--Part-2'><header><div class='Market__Legend'>"
+    "<span>Total Maps</span></div></header>"
+    "<div class='Market__OddsGroupItem'><button class='OddsButton'><span class='OddsButton__Text'>Over 2.5"
+    "</span><span class='OddsButton__Odds'> 1,85 </span></button></div>"
+    "<div class='Market__OddsGroupItem'><button class='OddsButton'><span class='OddsButton__Text'>Under 2.5"
+    "</span><span class='OddsButton__Odds'></span></button></div>"
+    "<div class='Market__OddsGroupItem'><button class='OddsButton'><span class='OddsButton__Text'>Exactly 2"
+    "</span></button></div></article>"
+    "<article class='Market Market--Id-8 Market--Part-1'><header><div class='Market__Legend'>"
+    "<span>Closed</span></div></header></article>"
+    "</div>"
+)
+
+
+def expected_markets(num_markets, seed=1):
+    """The markets render_page lays out, in the output schema"""
+    layout = _market_layout(num_markets, seed)
+    odds = _initial_odds(layout, seed)
+    return [
+        {
+            "market_id": market_id,
+            "market_part": part,
+            "legend": legend,
+            "outcomes": [{"text": text, "odds": f"{odds[m][o]:.2f}"} for o, text in enumerate(outcomes)],
+        }
+        for m, (market_id, part, legend, outcomes) in enumerate(layout)
+    ]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("fixture", ["small", "medium", "large"])
+def test_fixture_files_parse_to_their_layout(engine, fixture):
+    with open(ensure_fixtures()[fixture], encoding="utf-8") as f:
+        page = f.read()
+    markets = get_market_parser(engine).parse(body_inner_html(page))
+    assert markets == expected_markets(FIXTURE_SIZES[fixture])
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_suspended_odds_and_empty_markets(engine):
+    markets = get_market_parser(engine).parse(SUSPENDED_PAGE)
+    assert markets == [{
+        "market_id": "7",
+        "market_part": "2",
+        "legend": "Total Maps",
+        "outcomes": [{"text": "Over 2.5", "odds": "1,85"}, {"text": "Under 2.5", "odds": ""}],
+    }]
+    odds = market_columns(markets).odds
+    assert odds[0] == 1.85 and odds[1] != odds[1]
+
+
+def test_engines_agree():
+    html = body_inner_html(render_page(40, seed=3))
+    assert get_market_parser("lxml").parse(html) == get_market_parser("bs4").parse(html)
+
+
+def test_market_cache_matches_a_full_parse():
+    parser = get_market_parser("lxml")
+    cache = MarketCache(parser)
+    html = body_inner_html(render_page(8))
+    articles = html.split("<div class='MarketGroupsItem'>")[1:]
+    keys = [str(i) for i in range(len(articles))]
+
+    first = cache.update([[key, "a", article] for key, article in zip(keys, articles)])
+    assert first == parser.parse(html)
+    # Callers get copies: modifying a result does not leak into the next cycle
+    first[0]["outcomes"][0]["odds"] = "99.00"
+    second = cache.update([[key, "a"] for key in keys[1:]])
+    assert second == parser.parse(html)[1:]
+    assert (cache.parsed, cache.hits, cache.evicted) == (8, 7, 1)
+
+
+def test_parse_article_keeps_every_market():
+    html = body_inner_html(render_page(2))
+    article = "<div>" + html[html.index("<article"):html.rindex("</article>") + len("</article>")] + "</div>"
+    assert len(get_market_parser("lxml").parse_article(article)) == 2
+
+
+@pytest.mark.skipif(not any(shutil.which(name) for name in ("google-chrome", "chromium", "chromium-browser")),
+                    reason="needs Chrome")
+@pytest.mark.parametrize("fixture", ["small", "medium"])
+def test_script_extraction_matches_the_parser(fixture):
+    from scraper_core import TippmixProScraper
+
+    scraper = TippmixProScraper(use_selenium=True)
+    if not scraper._setup_selenium_driver():
+        pytest.skip("Chrome could not be started")
+    try:
+        scraper.driver.get("file://" + os.path.abspath(ensure_fixtures()[fixture]))
+        assert scraper.check_script_extraction()
+    finally:
+        scraper.close()
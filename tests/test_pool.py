@@ -0,0 +1,153 @@
+import threading
+import pytest
+from scraper_core import TippmixProScraper
+from scraper_pool import WatcherPool
+
+
+class FakeSwitch:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        if handle not in self.driver.handles:
+            raise Exception(f"no such window: {handle}")
+        self.driver.current = handle
+
+    def new_window(self, kind):
+        if self.driver.current not in self.driver.handles:
+            raise Exception("no such window: current window was closed")
+        self.driver.count += 1
+        handle = f"tab{self.driver.count}"
+        self.driver.handles.append(handle)
+        self.driver.current = handle
+
+
+class FakeDriver:
+    """Just enough of a WebDriver for tab bookkeeping"""
+
+    def __init__(self):
+        self.count = 1
+        self.handles = ["tab1"]
+        self.current = "tab1"
+        self.urls = {}
+        self.switch_to = FakeSwitch(self)
+
+    @property
+    def current_window_handle(self):
+        if self.current not in self.handles:
+            raise Exception("no such window")
+        return self.current
+
+    @property
+    def window_handles(self):
+        return list(self.handles)
+
+    def get(self, url):
+        self.urls[self.current_window_handle] = url
+
+    def close(self):
+        self.handles.remove(self.current_window_handle)
+
+    def quit(self):
+        self.handles = []
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    """Fake browser: url -> callable run while the page loads (may block or raise)"""
+    behaviour = {}
+
+    def setup(scraper):
+        scraper.driver = FakeDriver()
+        scraper.window_handle = scraper.driver.current_window_handle
+        return True
+
+    def open_page(scraper, url):
+        behaviour.get(url, lambda: None)()
+        scraper.driver.get(url)
+        scraper.current_url = url
+        scraper.is_page_open = True
+
+    monkeypatch.setattr(TippmixProScraper, "_setup_selenium_driver", setup)
+    monkeypatch.setattr(TippmixProScraper, "open_page", open_page)
+    return behaviour
+
+
+def url(n):
+    return f"https://www.tippmixpro.hu/hu/fogadas/e/{n}/all"
+
+
+def test_closing_a_shared_tab_leaves_the_driver_on_an_open_window(pages):
+    pool = WatcherPool(None, max_drivers=1, log=lambda message: None)
+    pool.add_event(url(1))
+    pool.add_event(url(2))
+    driver = pool.slots[0].driver
+    pool.remove_event("2")
+    assert driver.current in driver.handles
+    # The next event can open its tab
+    pool.add_event(url(3))
+    assert len(driver.handles) == 2
+
+
+def test_failed_page_load_closes_its_tab(pages):
+    pool = WatcherPool(None, max_drivers=1, log=lambda message: None)
+    pool.add_event(url(1))
+    driver = pool.slots[0].driver
+
+    def fail():
+        raise Exception("page load timed out")
+
+    pages[url(2)] = fail
+    with pytest.raises(Exception, match="timed out"):
+        pool.add_event(url(2))
+    assert driver.handles == ["tab1"] and driver.current == "tab1"
+    assert "2" not in pool.watchers
+    assert [w.event_id for w in pool.slots[0].watchers] == ["1"]
+
+
+def test_failed_first_page_load_keeps_the_driver_alive(pages):
+    pool = WatcherPool(None, max_drivers=1, log=lambda message: None)
+
+    def fail():
+        raise Exception("page load timed out")
+
+    pages[url(1)] = fail
+    with pytest.raises(Exception):
+        pool.add_event(url(1))
+    driver = pool.slots[0].driver
+    assert driver.handles == ["tab1"] and driver.urls["tab1"] == "about:blank"
+    pool.add_event(url(2))
+    assert pool.watchers["2"].scraper.window_handle == "tab1"
+
+
+def test_slow_page_load_does_not_block_the_pool(pages):
+    pool = WatcherPool(None, max_drivers=2, log=lambda message: None)
+    pool.add_event(url(1))
+    pool.add_event(url(2))
+    loading, release = threading.Event(), threading.Event()
+
+    def slow():
+        loading.set()
+        release.wait(10)
+
+    pages[url(3)] = slow
+    adder = threading.Thread(target=pool.add_event, args=(url(3),))
+    adder.start()
+    try:
+        assert loading.wait(5)
+        # Events on the other driver are added and removed while event 3 is still loading
+        done = threading.Event()
+
+        def other_changes():
+            pool.add_event(url(4))
+            pool.remove_event("2")
+            done.set()
+
+        threading.Thread(target=other_changes, daemon=True).start()
+        assert done.wait(5)
+        assert "3" not in pool.watchers
+    finally:
+        release.set()
+        adder.join(5)
+    assert sorted(pool.watchers) == ["1", "3", "4"]
+    assert pool.watchers["3"].scraper.driver is pool.slots[0].driver
@@ -0,0 +1,87 @@
+import json
+import pytest
+from benchmarks.fixtures import body_inner_html, render_page
+from scraper_cli import main
+from scraper_parsers import get_market_parser
+from scraper_recording import SnapshotArchive, SnapshotRecorder, SnapshotReplayer
+
+
+def url(n):
+    return f"https://www.tippmixpro.hu/hu/fogadas/e/{n}/all"
+
+
+def page(seed):
+    return body_inner_html(render_page(4, seed=seed))
+
+
+@pytest.fixture
+def recording(tmp_path):
+    """Archive with two events, three distinct frames each, in several chunks"""
+    filename = str(tmp_path / "session.tmpr")
+    recorder = SnapshotRecorder(filename, chunk_bytes=4096, log=lambda message: None)
+    for n in range(6):
+        for event in ("1", "2"):
+            recorder.record(url(event), page(n // 2 + int(event) * 10), timestamp=100.0 + n)
+    recorder.close()
+    return filename, recorder
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+def test_frames_round_trip(tmp_path, codec):
+    filename = str(tmp_path / "session.tmpr")
+    recorder = SnapshotRecorder(filename, codec=codec, chunk_bytes=1, log=lambda message: None)
+    recorder.record("a", "<p>1</p>", timestamp=1)
+    recorder.record("b", "<p>é</p>", timestamp=2)
+    recorder.close()
+    archive = SnapshotArchive(filename)
+    assert list(archive.frames()) == [(1, "a", "<p>1</p>"), (2, "b", "<p>é</p>")]
+    assert archive.stats()["chunks"] == 2
+
+
+def test_repeated_frames_are_dropped(recording):
+    filename, recorder = recording
+    assert (recorder.frames, recorder.duplicates) == (6, 6)
+    assert recorder.stats()["ratio"] > 1
+    assert len(SnapshotArchive(filename)) == 6
+
+
+def test_frames_seek_by_time_and_key(recording):
+    filename, _ = recording
+    archive = SnapshotArchive(filename)
+    assert archive.stats()["chunks"] > 1
+    assert [(ts, key) for ts, key, _ in archive.frames(start=102, end=104)] == [(102, url(1)), (102, url(2))]
+    assert [ts for ts, _, _ in archive.frames(keys=[url(2)])] == [100, 102, 104]
+
+
+def test_torn_archive_stays_readable_and_appends(recording):
+    filename, _ = recording
+    with open(filename, "ab") as f:
+        f.write(b"\x01\xff\xff\x00")
+    frames = list(SnapshotArchive(filename).frames())
+    assert len(frames) == 6
+
+    recorder = SnapshotRecorder(filename, log=lambda message: None)
+    recorder.record(url(3), page(30), timestamp=200)
+    recorder.close()
+    assert list(SnapshotArchive(filename).frames())[:6] == frames
+    assert list(SnapshotArchive(filename).frames())[-1][:2] == (200, url(3))
+
+
+def test_replay_parses_frames_with_their_event_id(recording):
+    filename, _ = recording
+    results = []
+    replayer = SnapshotReplayer(filename, speed=0, log=lambda message: None)
+    result = replayer.run(lambda event_id, markets: results.append((event_id, markets)))
+    assert result["frames"] == 6 and result["recorded_s"] == 4
+    parser = get_market_parser("lxml")
+    assert results[0] == ("1", parser.parse(page(10)))
+    assert [event_id for event_id, _ in results] == ["1", "2"] * 3
+
+
+def test_cli_replay_writes_the_output_files(recording, tmp_path):
+    filename, _ = recording
+    out = tmp_path / "out"
+    assert main(["--replay", filename, "--replay-speed", "0", "-d", str(out), "--output-mode", "delta"]) == 0
+    written = json.loads((out / "TippmixPro_2.json").read_text())["data"]
+    assert written == get_market_parser("lxml").parse(page(22))
+    assert (out / "TippmixPro_1.jsonl").exists()
@@ -0,0 +1,73 @@
+import pytest
+from scraper_cli import main
+from scraper_schedule import PollSchedule, markets_suspended
+
+
+def market(odds):
+    return [{"market_id": "1", "market_part": "1", "legend": "Match Winner",
+             "outcomes": [{"text": "Team A", "odds": odds}, {"text": "Team B", "odds": odds}]}]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock: set clock.now to move time"""
+    class Clock:
+        now = 100.0
+
+    monkeypatch.setattr("scraper_schedule.time.monotonic", lambda: Clock.now)
+    return Clock
+
+
+def test_deadlines_do_not_drift_by_the_work(clock):
+    schedule = PollSchedule(1.0)
+    assert schedule.due()
+    clock.now += 0.3
+    schedule.complete()
+    assert schedule.next_due == 101.0
+    assert schedule.remaining() == pytest.approx(0.7)
+    clock.now = 101.4
+    schedule.complete()
+    assert schedule.next_due == 102.0 and schedule.skipped == 0
+
+
+def test_overrun_skips_missed_deadlines(clock):
+    schedule = PollSchedule(1.0)
+    clock.now += 3.5
+    schedule.complete()
+    assert schedule.skipped == 3
+    assert schedule.next_due == 104.0 and not schedule.due()
+
+
+def test_adaptive_interval_follows_the_odds(clock):
+    schedule = PollSchedule(1.0, adaptive=True, min_interval=0.5, max_interval=4)
+    schedule.complete(market("1.50"))
+    assert schedule.interval == 0.5
+    schedule.complete(market("1.50"))
+    schedule.complete(market("1.50"))
+    assert schedule.interval == pytest.approx(1.125)
+    schedule.complete(market(""))
+    assert schedule.suspended and schedule.interval == 4
+    schedule.complete(market("1.60"))
+    assert not schedule.suspended and schedule.interval == 1.0
+    # A failed cycle keeps the interval
+    schedule.complete(None)
+    assert schedule.interval == 1.0
+
+
+def test_empty_pages_are_not_suspensions():
+    assert not markets_suspended([])
+    assert markets_suspended(market(""))
+
+
+@pytest.mark.parametrize("interval", [0, -1, float("nan"), float("inf")])
+def test_invalid_intervals_are_rejected(interval):
+    with pytest.raises(ValueError):
+        PollSchedule(interval)
+    with pytest.raises(ValueError):
+        PollSchedule(1.0, adaptive=True, max_interval=interval)
+
+
+@pytest.mark.parametrize("argv", [["-i", "nan"], ["-i", "inf"], ["-i", "0"], ["--max-interval", "nan"]])
+def test_cli_rejects_invalid_intervals(argv, capsys):
+    assert main(argv + ["https://www.tippmixpro.hu/hu/fogadas/e/279204529400057856/all"]) == 2
+    assert "finite number greater than 0" in capsys.readouterr().err
@@ -0,0 +1,112 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import pytest
+import scraper_server
+from scraper_server import SnapshotServer, SnapshotStore
+
+
+def market(odds, legend="Match Winner", market_id="1"):
+    return {"market_id": market_id, "market_part": "1", "legend": legend,
+            "outcomes": [{"text": "Team A", "odds": odds}, {"text": "Team B", "odds": "2.40"}]}
+
+
+@pytest.fixture
+def api():
+    store = SnapshotStore(history_size=4)
+    server = SnapshotServer(store, port=0)
+    server.start()
+
+    def get(path, headers=None):
+        request = urllib.request.Request(f"http://127.0.0.1:{server.port}{path}", headers=headers or {})
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers, e.read()
+
+    yield store, get
+    server.stop()
+
+
+def test_unchanged_snapshots_answer_304(api):
+    store, get = api
+    store.publish("e1", [market("1.50")])
+    status, headers, body = get("/events/e1")
+    assert status == 200 and json.loads(body)["data"] == [market("1.50")]
+    etag = headers["ETag"]
+
+    assert store.publish("e1", [market("1.50")]) == 1
+    status, headers, _ = get("/events/e1", {"If-None-Match": etag})
+    assert status == 304 and headers["ETag"] == etag
+
+    store.publish("e1", [market("1.60")])
+    status, headers, _ = get("/events/e1", {"If-None-Match": etag})
+    assert status == 200 and headers["ETag"] != etag and headers["X-Snapshot-Version"] == "2"
+    assert get("/events/e2")[0] == 404
+
+
+def test_snapshots_are_served_from_the_published_bytes(api, monkeypatch):
+    store, get = api
+    store.publish("e1", [market("1.50")])
+    _, headers, body = get("/events/e1")
+
+    class NoJson:
+        @staticmethod
+        def dumps(*args, **kwargs):
+            raise AssertionError("serialized per request")
+
+    monkeypatch.setattr(scraper_server, "json", NoJson)
+    status, again, cached = get("/events/e1")
+    assert status == 200 and cached == body and again["ETag"] == headers["ETag"]
+
+
+def test_filtered_snapshots_have_their_own_etag(api):
+    store, get = api
+    store.publish("e1", [market("1.50"), market("3.00", market_id="2")])
+    _, full, _ = get("/events/e1")
+    status, headers, body = get("/events/e1?market_id=2")
+    assert [m["market_id"] for m in json.loads(body)["data"]] == ["2"]
+    assert headers["ETag"] != full["ETag"]
+    assert get("/events/e1?market_id=2", {"If-None-Match": headers["ETag"]})[0] == 304
+    assert get("/events/e1?market_id=1", {"If-None-Match": headers["ETag"]})[0] == 200
+
+
+def test_legend_changes_are_published(api):
+    store, get = api
+    store.publish("e1", [market("1.50")])
+    assert store.publish("e1", [market("1.50", legend="Match Winner (incl. OT)")]) == 2
+    _, changes = store.wait_for_changes("e1", 1, timeout=0)
+    assert {(c["text"], c["legend"], c["prev_legend"]) for c in changes} == {
+        ("Team A", "Match Winner (incl. OT)", "Match Winner"),
+        ("Team B", "Match Winner (incl. OT)", "Match Winner"),
+    }
+    assert "prev_odds" not in changes[0]
+    assert json.loads(get("/events/e1")[2])["data"][0]["legend"] == "Match Winner (incl. OT)"
+
+
+def test_long_poll_wakes_on_the_next_change(api):
+    store, get = api
+    store.publish("e1", [market("1.50")])
+    threading.Timer(0.2, store.publish, args=("e1", [market("1.60")])).start()
+    start = time.monotonic()
+    status, _, body = get("/events/e1/changes?since=1&timeout=10")
+    assert time.monotonic() - start < 5
+    payload = json.loads(body)
+    assert payload["version"] == 2 and not payload["reset"]
+    assert [(c["text"], c["prev_odds"], c["odds"]) for c in payload["changes"]] == [("Team A", "1.50", "1.60")]
+
+
+def test_long_poll_times_out_and_resets(api):
+    store, get = api
+    store.publish("e1", [market("1.50")])
+    payload = json.loads(get("/events/e1/changes?since=1&timeout=0.1")[2])
+    assert payload == {"version": 1, "reset": False, "changes": []}
+
+    # The history keeps 4 versions: a client that saw version 1 has to reload
+    for n in range(6):
+        store.publish("e1", [market(f"1.{60 + n}")])
+    payload = json.loads(get("/events/e1/changes?since=1&timeout=0.1")[2])
+    assert payload["version"] == 7 and payload["reset"]
@@ -0,0 +1,136 @@
+import pytest
+from scraper_watchdog import Watchdog
+
+
+def market(odds, other="2.40"):
+    return [{"market_id": "1", "market_part": "1", "legend": "Match Winner",
+             "outcomes": [{"text": "Team A", "odds": odds}, {"text": "Team B", "odds": other}]}]
+
+
+class AliveDriver:
+    current_window_handle = "tab1"
+
+
+class DeadDriver:
+    @property
+    def current_window_handle(self):
+        raise Exception("invalid session id")
+
+
+class FakeScraper:
+    """Records the recovery steps the watchdog takes"""
+
+    def __init__(self, owns_driver=True):
+        self.driver = AliveDriver()
+        self.owns_driver = owns_driver
+        self.steps = []
+
+    def reload_page(self):
+        self.steps.append("refresh")
+
+    def reopen_in_new_tab(self):
+        self.steps.append("new_tab")
+
+    def relaunch_browser(self):
+        self.steps.append("relaunch")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("scraper_watchdog.time.monotonic", lambda: now[0])
+    return now
+
+
+def watchdog_for(scraper, **options):
+    return Watchdog(scraper, log=lambda message: None, **options)
+
+
+def test_recovery_escalates_with_backoff(clock):
+    scraper = FakeScraper()
+    watchdog = watchdog_for(scraper, failure_threshold=2, base_backoff=2, max_backoff=60)
+    watchdog.observe(market("1.50"))
+    assert watchdog.observe(None) is None
+    assert watchdog.observe(None) == "refresh"
+    # Backing off: still failing, but the next step waits
+    assert [watchdog.observe(None) for _ in range(3)] == [None] * 3
+    clock[0] += 2
+    assert watchdog.observe(None) == "new_tab"
+    clock[0] += 4
+    assert [watchdog.observe(None) for _ in range(2)] == [None, "relaunch"]
+    clock[0] += 8
+    assert [watchdog.observe(None) for _ in range(2)] == [None, "relaunch"]
+    assert scraper.steps == ["refresh", "new_tab", "relaunch", "relaunch"]
+
+    clock[0] += 1
+    watchdog.observe(market("1.50"))
+    status = watchdog.status()
+    assert not status["down"] and status["downtime"] == pytest.approx(15)
+    assert status["recoveries"] == {"refresh": 1, "new_tab": 1, "relaunch": 2}
+    assert watchdog.level == 0
+
+
+def test_stale_live_page_is_reloaded_but_suspended_one_is_not(clock):
+    scraper = FakeScraper()
+    watchdog = watchdog_for(scraper, stale_after=60, failure_threshold=1)
+    watchdog.observe(market("1.50"))
+    clock[0] += 59
+    assert watchdog.observe(market("1.50")) is None
+    clock[0] += 1
+    assert watchdog.observe(market("1.50")) == "refresh"
+    # Downtime counts from the last change
+    assert watchdog.down_since == 1000.0
+    # Only markets that differ from the ones at the last step end the outage
+    watchdog.observe(market("1.50"))
+    assert watchdog.status()["down"]
+    clock[0] += 5
+    watchdog.observe(market("1.55"))
+    assert not watchdog.status()["down"] and watchdog.downtime == pytest.approx(65)
+
+    suspended = watchdog_for(FakeScraper(), stale_after=60, failure_threshold=1)
+    suspended.observe(market("", ""))
+    clock[0] += 600
+    assert suspended.observe(market("", "")) is None
+
+
+def test_lost_markets_are_a_problem_but_an_empty_first_page_is_not(clock):
+    watchdog = watchdog_for(FakeScraper(), failure_threshold=1)
+    assert watchdog.observe([]) is None and not watchdog.status()["down"]
+    watchdog.observe(market("1.50"))
+    assert watchdog.observe([]) == "refresh"
+    assert watchdog.status()["last_problem"] == "page lost its markets"
+
+
+def test_steps_that_cannot_help_are_skipped(clock):
+    dead = FakeScraper()
+    dead.driver = DeadDriver()
+    assert watchdog_for(dead, failure_threshold=1).observe(None) == "relaunch"
+
+    crashed = FakeScraper()
+    watchdog = watchdog_for(crashed, failure_threshold=1)
+    assert watchdog.observe(None, error=Exception("tab crashed")) == "new_tab"
+
+
+def test_shared_browser_is_not_relaunched_while_alive(clock):
+    relaunched = []
+    scraper = FakeScraper(owns_driver=False)
+    watchdog = watchdog_for(scraper, failure_threshold=1, base_backoff=0, relaunch=lambda: relaunched.append(1))
+    steps = [watchdog.observe(None) for _ in range(4)]
+    assert steps == ["refresh", "new_tab", "new_tab", "new_tab"]
+    assert not relaunched
+
+    scraper.driver = DeadDriver()
+    assert watchdog.observe(None) == "relaunch" and relaunched == [1]
+
+
+def test_failed_recovery_step_still_escalates(clock):
+    scraper = FakeScraper()
+
+    def fail():
+        raise Exception("page load timed out")
+
+    scraper.reload_page = fail
+    watchdog = watchdog_for(scraper, failure_threshold=1, base_backoff=0)
+    assert watchdog.observe(None) == "refresh"
+    assert watchdog.recoveries["refresh"] == 0
+    assert watchdog.observe(None) == "new_tab"